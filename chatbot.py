@@ -1,7 +1,11 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import logging
+import os
+import hmac
+import json
 from src.agents.agent_orchestrateur import AgentSuperviseur
+from src.rag.generation.ollama_client import ollama_pool_stats
 import uuid
 from datetime import datetime
 
@@ -99,6 +103,43 @@ def get_suggestions(message: str, response: str) -> list:
     
     return SUGGESTIONS_MAP['default']
 
+def _ensure_session(session_id):
+    """Create the session (new id if missing) and return its id"""
+    if not session_id:
+        session_id = str(uuid.uuid4())
+    
+    # Initialize session if new
+    if session_id not in sessions:
+        sessions[session_id] = {
+            'created_at': datetime.now().isoformat(),
+            'messages': []
+        }
+    return session_id
+
+
+def _store_exchange(session_id, message, response):
+    """Store the user message and the assistant response in session history"""
+    sessions[session_id]['messages'].append({
+        'role': 'user',
+        'content': message,
+        'timestamp': datetime.now().isoformat()
+    })
+    sessions[session_id]['messages'].append({
+        'role': 'assistant',
+        'content': response,
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+def _is_form(response):
+    return "nom complet" in response.lower() or "FORMULAIRE" in response.upper()
+
+
+def _sse(event, data):
+    """Format one Server-Sent Event (JSON payload)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Main chat endpoint"""
@@ -110,15 +151,7 @@ def chat():
         if not message:
             return jsonify({'error': 'Message is required'}), 400
         
-        if not session_id:
-            session_id = str(uuid.uuid4())
-        
-        # Initialize session if new
-        if session_id not in sessions:
-            sessions[session_id] = {
-                'created_at': datetime.now().isoformat(),
-                'messages': []
-            }
+        session_id = _ensure_session(session_id)
         
         logger.info(f"📩 Message from session {session_id[:8]}: {message[:100]}")
         
@@ -128,22 +161,12 @@ def chat():
             session_id=session_id
         )
 
-        # Store in session history
-        sessions[session_id]['messages'].append({
-            'role': 'user',
-            'content': message,
-            'timestamp': datetime.now().isoformat()
-        })
-        sessions[session_id]['messages'].append({
-            'role': 'assistant',
-            'content': response,
-            'timestamp': datetime.now().isoformat()
-        })
+        _store_exchange(session_id, message, response)
         
         # Get contextual suggestions
         suggestions = get_suggestions(message, response)
 
-        is_form_detected = "nom complet" in response.lower() or "FORMULAIRE" in response.upper()
+        is_form_detected = _is_form(response)
         
         logger.info(f"✅ Response sent to session {session_id[:8]}")
         
@@ -163,6 +186,55 @@ def chat():
         }), 500
 
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Chat endpoint streaming the answer as Server-Sent Events.
+    
+    Events: session, token (answer fragments), answer (final text, replaces the
+    fragments), sources (cited web URLs), suggestions, done (is_form) or error.
+    """
+    data = request.json or {}
+    message = data.get('message', '').strip()
+    
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    session_id = _ensure_session(data.get('session_id'))
+    logger.info(f"📩 Message from session {session_id[:8]} (stream): {message[:100]}")
+    
+    def events():
+        yield _sse('session', {'session_id': session_id})
+        try:
+            response = ""
+            for event, payload in supervisor.run_stream(message=message, session_id=session_id):
+                if event == 'token':
+                    yield _sse('token', {'text': payload})
+                elif event == 'answer':
+                    yield _sse('answer', {'text': payload})
+                elif event == 'sources':
+                    yield _sse('sources', {'sources': payload})
+                elif event == 'done':
+                    response = payload['response']
+            
+            _store_exchange(session_id, message, response)
+            yield _sse('suggestions', {'suggestions': get_suggestions(message, response)})
+            yield _sse('done', {'is_form': _is_form(response), 'timestamp': datetime.now().isoformat()})
+            logger.info(f"✅ Response streamed to session {session_id[:8]}")
+            
+        except Exception as e:
+            logger.error(f"❌ Error in chat stream endpoint: {e}", exc_info=True)
+            yield _sse('error', {'error': 'Une erreur s\'est produite. Veuillez réessayer.'})
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # nginx: forward events without buffering
+        }
+    )
+
+
 @app.route('/api/session/<session_id>', methods=['GET'])
 def get_session(session_id):
     """Get session history"""
@@ -199,7 +271,9 @@ def stats():
         return jsonify({
             'total_sessions': len(sessions),
             'total_messages': total_messages,
-            'supervisor_stats': supervisor.get_statistics('global')
+            'supervisor_stats': supervisor.get_statistics('global'),
+            'ollama_pools': ollama_pool_stats(),
+            'single_flight': supervisor.get_single_flight_stats()
         })
         
     except Exception as e:
@@ -207,13 +281,44 @@ def stats():
         return jsonify({'error': str(e)}), 500
 
 
+def _admin_denied(token):
+    """Error message if the admin token is missing or wrong, None if access is granted"""
+    admin_token = os.getenv('ADMIN_TOKEN')
+    if not admin_token:
+        return 'Admin endpoints disabled (ADMIN_TOKEN not set)'
+    if not hmac.compare_digest(token, admin_token):
+        return 'Forbidden'
+    return None
+
+
+@app.route('/api/admin/reload-index', methods=['POST'])
+def reload_index():
+    """Load the newly published index version now (hot swap, no restart)"""
+    denied = _admin_denied(request.headers.get('X-Admin-Token', ''))
+    if denied:
+        return jsonify({'error': denied}), 403
+    
+    try:
+        if supervisor.rag is None:
+            return jsonify({'error': 'RAG agent not available'}), 503
+        report = supervisor.rag.reload_index()
+        logger.info(f"🔄 Index reload: {report}")
+        return jsonify(report)
+        
+    except Exception as e:
+        logger.error(f"❌ Error reloading index: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 if __name__ == '__main__':
     logger.info("🚀 Starting Chatbot API Server...")
     logger.info("📝 Endpoints:")
     logger.info("   POST /api/chat - Send message")
+    logger.info("   POST /api/chat/stream - Send message, answer streamed (Server-Sent Events)")
     logger.info("   GET  /api/session/<id> - Get session history")
     logger.info("   GET  /api/health - Health check")
     logger.info("   GET  /api/stats - Statistics")
+    logger.info("   POST /api/admin/reload-index - Hot swap to the published index (X-Admin-Token)")
     
     app.run(
         host='0.0.0.0',
@@ -0,0 +1,197 @@
+"""ASGI version of the chatbot API (same endpoints as chatbot.py).
+
+Each conversation waiting for Ollama is a suspended coroutine instead of a blocked
+thread: a single process holds hundreds of concurrent requests. CPU-bound work
+(embeddings, FAISS search, reranking) runs in a bounded thread pool (CPU_WORKERS).
+
+Run with:
+    uvicorn chatbot_asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from quart import Quart, jsonify, make_response, request
+from quart_cors import cors
+
+from chatbot import (
+    _admin_denied,
+    _ensure_session,
+    _is_form,
+    _sse,
+    _store_exchange,
+    get_suggestions,
+    sessions,
+    supervisor,
+)
+from src.rag.generation.cpu_executor import CPU_WORKERS
+from src.rag.generation.ollama_client import ollama_pool_stats
+
+app = Quart(__name__)
+app = cors(app, allow_origin="*")  # Enable CORS for the widget
+# Generations can take minutes: no server-side response timeout
+app.config['RESPONSE_TIMEOUT'] = None
+
+logger = logging.getLogger(__name__)
+
+
+@app.route('/api/chat', methods=['POST'])
+async def chat():
+    """Main chat endpoint"""
+    try:
+        data = await request.get_json()
+        message = data.get('message', '').strip()
+
+        if not message:
+            return jsonify({'error': 'Message is required'}), 400
+
+        session_id = _ensure_session(data.get('session_id'))
+
+        logger.info(f"📩 Message from session {session_id[:8]}: {message[:100]}")
+
+        # Process message through supervisor
+        response = await supervisor.arun(
+            message=message,
+            session_id=session_id
+        )
+
+        _store_exchange(session_id, message, response)
+
+        # Get contextual suggestions
+        suggestions = get_suggestions(message, response)
+
+        logger.info(f"✅ Response sent to session {session_id[:8]}")
+
+        return jsonify({
+            'session_id': session_id,
+            'message': response,
+            'suggestions': suggestions,
+            'is_form': _is_form(response),
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"❌ Error in chat endpoint: {e}", exc_info=True)
+        return jsonify({
+            'error': 'Une erreur s\'est produite. Veuillez réessayer.',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+async def chat_stream():
+    """Chat endpoint streaming the answer as Server-Sent Events (same events as chatbot.py)"""
+    data = await request.get_json() or {}
+    message = data.get('message', '').strip()
+
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    session_id = _ensure_session(data.get('session_id'))
+    logger.info(f"📩 Message from session {session_id[:8]} (stream): {message[:100]}")
+
+    async def events():
+        yield _sse('session', {'session_id': session_id})
+        try:
+            response = ""
+            async for event, payload in supervisor.arun_stream(message=message, session_id=session_id):
+                if event == 'token':
+                    yield _sse('token', {'text': payload})
+                elif event == 'answer':
+                    yield _sse('answer', {'text': payload})
+                elif event == 'sources':
+                    yield _sse('sources', {'sources': payload})
+                elif event == 'done':
+                    response = payload['response']
+
+            _store_exchange(session_id, message, response)
+            yield _sse('suggestions', {'suggestions': get_suggestions(message, response)})
+            yield _sse('done', {'is_form': _is_form(response), 'timestamp': datetime.now().isoformat()})
+            logger.info(f"✅ Response streamed to session {session_id[:8]}")
+
+        except Exception as e:
+            logger.error(f"❌ Error in chat stream endpoint: {e}", exc_info=True)
+            yield _sse('error', {'error': 'Une erreur s\'est produite. Veuillez réessayer.'})
+
+    response = await make_response(
+        events(),
+        {
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # nginx: forward events without buffering
+        }
+    )
+    response.timeout = None
+    return response
+
+
+@app.route('/api/session/<session_id>', methods=['GET'])
+async def get_session(session_id):
+    """Get session history"""
+    if session_id not in sessions:
+        return jsonify({'error': 'Session not found'}), 404
+
+    return jsonify({
+        'session_id': session_id,
+        'session': sessions[session_id]
+    })
+
+
+@app.route('/api/health', methods=['GET'])
+async def health():
+    """Health check endpoint"""
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'active_sessions': len(sessions)
+    })
+
+
+@app.route('/api/stats', methods=['GET'])
+async def stats():
+    """Get chatbot statistics"""
+    try:
+        total_messages = sum(len(s['messages']) for s in sessions.values())
+
+        return jsonify({
+            'total_sessions': len(sessions),
+            'total_messages': total_messages,
+            'supervisor_stats': supervisor.get_statistics('global'),
+            'ollama_pools': ollama_pool_stats(),
+            'single_flight': supervisor.get_single_flight_stats(),
+            'cpu_workers': CPU_WORKERS
+        })
+
+    except Exception as e:
+        logger.error(f"❌ Error getting stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admin/reload-index', methods=['POST'])
+async def reload_index():
+    """Load the newly published index version now (hot swap, no restart)"""
+    denied = _admin_denied(request.headers.get('X-Admin-Token', ''))
+    if denied:
+        return jsonify({'error': denied}), 403
+
+    try:
+        if supervisor.rag is None:
+            return jsonify({'error': 'RAG agent not available'}), 503
+        # Loading the new version reads files: kept off the event loop
+        report = await asyncio.to_thread(supervisor.rag.reload_index)
+        logger.info(f"🔄 Index reload: {report}")
+        return jsonify(report)
+
+    except Exception as e:
+        logger.error(f"❌ Error reloading index: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    logger.info("🚀 Starting Chatbot API Server (ASGI)...")
+    logger.info(f"   CPU workers: {CPU_WORKERS}")
+    # A single process: sessions and conversation state are kept in memory
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('PORT', '5000')))
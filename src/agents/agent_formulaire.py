@@ -1,10 +1,11 @@
-from langchain_ollama import ChatOllama
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 
 from src.agents.state_manager import state_manager
+from src.rag.generation.ollama_client import OLLAMA_NUM_CTX, keep_alive_for, pooled_chat_ollama
 from src.agents.prompts import prompts, get_field_question, format_confirmation_message
+import asyncio
 import logging
 import re
 import json
@@ -16,12 +17,13 @@ logger = logging.getLogger(__name__)
 
 class AgentFormulaire:
     def __init__(self):
-        self.llm = ChatOllama(
+        self.llm = pooled_chat_ollama(
             model="gemma2:2b", 
             base_url="http://host.docker.internal:11434",
             temperature=0.3,
             num_predict=256,      # Limite tokens générés
-            num_ctx=2048          # Réduit contexte
+            num_ctx=OLLAMA_NUM_CTX,  # Même contexte que les autres agents (pas de rechargement)
+            keep_alive=keep_alive_for("formulaire")
         )
         self.required_fields = ['nom', 'email', 'telephone', 'programme']
         
@@ -119,6 +121,11 @@ Si une information n'est pas présente, utilise null."""),
             }
             return f"Pour continuer, j'aurais besoin de {field_labels[next_field]} :"
     
+    async def arun(self, message: str, session_id: str) -> str:
+        # Pas d'appel au LLM: extraction par regex et écriture du fichier de contacts,
+        # exécutées hors de la boucle d'événements
+        return await asyncio.to_thread(self.run, message, session_id)
+    
     def _extract_info(self, message: str, session_id: str) -> dict:
         extracted = {}
         message_clean = message.strip()
@@ -1,6 +1,6 @@
-from langchain_ollama import ChatOllama
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from src.rag.generation.ollama_client import OLLAMA_NUM_CTX, keep_alive_for, pooled_chat_ollama
 from src.agents.prompts import prompts
 import logging
 
@@ -9,12 +9,13 @@ logger = logging.getLogger(__name__)
 
 class AgentInteraction:
     def __init__(self):
-        self.llm = ChatOllama(
+        self.llm = pooled_chat_ollama(
             model="gemma2:2b", 
             base_url="http://host.docker.internal:11434",
             temperature=0.3,
             num_predict=256,      # Limite tokens générés
-            num_ctx=2048          # Réduit contexte
+            num_ctx=OLLAMA_NUM_CTX,  # Même contexte que les autres agents (pas de rechargement)
+            keep_alive=keep_alive_for("interaction")
         )
         
         self.prompt = ChatPromptTemplate.from_messages([
@@ -38,13 +39,19 @@ class AgentInteraction:
         
         logger.info("Agent Interaction initialisé")
     
-    def run(self, message: str) -> str:
+    def _quick_response(self, message: str):
         message_lower = message.lower().strip()
         
         for keyword, response in self.quick_responses.items():
             if message_lower == keyword or message_lower.startswith(keyword + ' '):
                 logger.info(f"Réponse rapide pour: {keyword}")
                 return response
+        return None
+    
+    def run(self, message: str) -> str:
+        quick = self._quick_response(message)
+        if quick is not None:
+            return quick
         
         try:
             logger.info(f"Génération réponse pour: {message[:50]}...")
@@ -53,4 +60,18 @@ class AgentInteraction:
             return response
         except Exception as e:
             logger.error(f"Erreur Agent Interaction: {e}")
-            return prompts.INTERACTION_CLARIFICATION
\ No newline at end of file
+            return prompts.INTERACTION_CLARIFICATION
+    
+    async def arun(self, message: str) -> str:
+        quick = self._quick_response(message)
+        if quick is not None:
+            return quick
+        
+        try:
+            logger.info(f"Génération réponse pour: {message[:50]}...")
+            response = await self.chain.ainvoke({"message": message})
+            logger.info(f"Réponse générée: {response[:100]}...")
+            return response
+        except Exception as e:
+            logger.error(f"Erreur Agent Interaction: {e}")
+            return prompts.INTERACTION_CLARIFICATION
@@ -1,4 +1,3 @@
-from langchain_ollama import ChatOllama
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
@@ -7,9 +6,14 @@ from src.agents.agent_rag import AgentRAG
 from src.agents.agent_formulaire import AgentFormulaire
 from src.agents.agent_interaction import AgentInteraction
 from src.agents.state_manager import state_manager
+from src.rag.generation.ollama_client import OLLAMA_NUM_CTX, keep_alive_for, pooled_chat_ollama
+from src.rag.generation.single_flight import SingleFlight, normalize_text
 from src.agents.prompts import prompts
 import logging
+import os
+import threading
 import time
+from typing import Any, AsyncIterator, Iterator, Optional, Tuple
 
 logging.basicConfig(
     level=logging.INFO,
@@ -43,11 +47,13 @@ class AgentSuperviseur:
             logger.error(f"Erreur init Agent Interaction: {e}")
             self.interact = None
         
-        self.llm = ChatOllama(
+        self.llm = pooled_chat_ollama(
             model="gemma2:2b", 
             base_url="http://host.docker.internal:11434",
             temperature=0.0,
-            num_predict=10
+            num_predict=10,
+            num_ctx=OLLAMA_NUM_CTX,
+            keep_alive=keep_alive_for("routing")
         )
         
         self.routing_prompt = ChatPromptTemplate.from_messages([
@@ -57,9 +63,34 @@ class AgentSuperviseur:
         
         self.routing_chain = self.routing_prompt | self.llm | StrOutputParser()
         
+        # Messages identiques simultanés (suggestion cliquée par plusieurs visiteurs): un seul appel
+        self.intent_flight = SingleFlight("routing")
+        
+        # Préchauffage en arrière-plan: modèle chargé et préfixes des prompts en cache
+        # avant le premier visiteur, sans retarder le démarrage du serveur
+        if os.getenv("OLLAMA_WARMUP", "1") != "0":
+            threading.Thread(target=self.warm_up, name="ollama-warmup", daemon=True).start()
+        
         logger.info("Superviseur prêt\n")
     
+    def warm_up(self):
+        """Charge le modèle et précalcule les préfixes des prompts RAG et de routage"""
+        if self.rag:
+            self.rag.warm_up()
+        try:
+            start_time = time.time()
+            self.routing_chain.invoke({"message": "Bonjour"})
+            logger.info(f"Routage préchauffé en {time.time() - start_time:.2f}s")
+        except Exception as e:
+            logger.warning(f"Préchauffage du routage impossible: {e}")
+    
     def detect_intent_with_llm(self, message: str) -> str:
+        return self.intent_flight.run(normalize_text(message), self._detect_intent, message)
+    
+    async def adetect_intent_with_llm(self, message: str) -> str:
+        return await self.intent_flight.arun(normalize_text(message), self._adetect_intent, message)
+    
+    def _detect_intent(self, message: str) -> str:
         try:
             logger.info(f"Analyse intention du message: '{message[:60]}...'")
             start_time = time.time()
@@ -70,33 +101,55 @@ class AgentSuperviseur:
             logger.info(f"Réponse brute LLM: '{intent_raw}'")
             logger.info(f"Temps de détection: {elapsed_time:.2f}s")
             
-            intent_word = intent_raw.strip().upper()
-            intent_word = intent_word.split('\n')[0]
-            intent_word = intent_word.split()[0] if intent_word.split() else ""
-            intent_word = intent_word.rstrip('.,!?;:')
+            return self._parse_intent(intent_raw, message)
+        
+        except Exception as e:
+            logger.error(f"Erreur détection LLM: {e}")
+            logger.info("Utilisation du routing par mots-clés (fallback)")
+            return self._fallback_keyword_routing(message)
+    
+    async def _adetect_intent(self, message: str) -> str:
+        try:
+            logger.info(f"Analyse intention du message: '{message[:60]}...'")
+            start_time = time.time()
             
-            logger.info(f"Mot extrait: '{intent_word}'")
+            intent_raw = await self.routing_chain.ainvoke({"message": message})
             
-            valid_intents = {
-                "RAG": "rag",
-                "FORMULAIRE": "formulaire",
-                "MIXED": "mixed",
-                "INTERACTION": "interaction"
-            }
+            elapsed_time = time.time() - start_time
+            logger.info(f"Réponse brute LLM: '{intent_raw}'")
+            logger.info(f"Temps de détection: {elapsed_time:.2f}s")
             
-            if intent_word in valid_intents:
-                detected = valid_intents[intent_word]
-                logger.info(f"Intent final: {detected.upper()}")
-                return detected
-            else:
-                logger.warning(f"Intent invalide '{intent_word}', utilisation du fallback")
-                return self._fallback_keyword_routing(message)
+            return self._parse_intent(intent_raw, message)
         
         except Exception as e:
             logger.error(f"Erreur détection LLM: {e}")
             logger.info("Utilisation du routing par mots-clés (fallback)")
             return self._fallback_keyword_routing(message)
     
+    def _parse_intent(self, intent_raw: str, message: str) -> str:
+        """Intention à partir de la réponse brute du LLM (mots-clés si elle est invalide)"""
+        intent_word = intent_raw.strip().upper()
+        intent_word = intent_word.split('\n')[0]
+        intent_word = intent_word.split()[0] if intent_word.split() else ""
+        intent_word = intent_word.rstrip('.,!?;:')
+        
+        logger.info(f"Mot extrait: '{intent_word}'")
+        
+        valid_intents = {
+            "RAG": "rag",
+            "FORMULAIRE": "formulaire",
+            "MIXED": "mixed",
+            "INTERACTION": "interaction"
+        }
+        
+        if intent_word in valid_intents:
+            detected = valid_intents[intent_word]
+            logger.info(f"Intent final: {detected.upper()}")
+            return detected
+        else:
+            logger.warning(f"Intent invalide '{intent_word}', utilisation du fallback")
+            return self._fallback_keyword_routing(message)
+    
     def _fallback_keyword_routing(self, message: str) -> str:
         logger.info("Fallback: routing par mots-clés")
         
@@ -148,6 +201,19 @@ class AgentSuperviseur:
             return "interaction"
     
     def route(self, message: str, session_id: str) -> str:
+        agent_type = self._route_by_state(message, session_id)
+        if agent_type is not None:
+            return agent_type
+        return self._route_by_intent(self.detect_intent_with_llm(message))
+    
+    async def aroute(self, message: str, session_id: str) -> str:
+        agent_type = self._route_by_state(message, session_id)
+        if agent_type is not None:
+            return agent_type
+        return self._route_by_intent(await self.adetect_intent_with_llm(message))
+    
+    def _route_by_state(self, message: str, session_id: str) -> Optional[str]:
+        """Règles 0 à 3: formulaire en cours (None si l'intention du message doit décider)"""
         logger.info(f"\n{'='*60}")
         logger.info(f"ROUTING - Session: {session_id[:8]}...")
         logger.info(f"{'='*60}")
@@ -192,8 +258,9 @@ class AgentSuperviseur:
             logger.info("RÈGLE 3: Formulaire en cours → continue avec Form Agent")
             return "formulaire"
         
-        intent = self.detect_intent_with_llm(message)
-        
+        return None
+    
+    def _route_by_intent(self, intent: str) -> str:
         if intent == "mixed":
             logger.info("RÈGLE 5: Intent MIXED → RAG d'abord, formulaire ensuite")
             return "rag"
@@ -207,30 +274,114 @@ class AgentSuperviseur:
             logger.info("RÈGLE 5: Intent INTERACTION → Agent Interaction")
             return "interaction"
     
-    def run(self, message: str, session_id: str) -> str:
+    def _start_turn(self, message: str, session_id: str):
+        """Historique, routage et intention d'un nouveau message (communs à run et run_stream)"""
+        session = self._log_new_message(message, session_id)
+        # Intention détectée une seule fois: elle sert au routage et à l'historique
+        intent = self.detect_intent_with_llm(message)
+        agent_type = self._route_by_state(message, session_id) or self._route_by_intent(intent)
+        return self._set_agent(session, agent_type, intent)
+    
+    async def _astart_turn(self, message: str, session_id: str):
+        session = self._log_new_message(message, session_id)
+        intent = await self.adetect_intent_with_llm(message)
+        agent_type = self._route_by_state(message, session_id) or self._route_by_intent(intent)
+        return self._set_agent(session, agent_type, intent)
+    
+    def _log_new_message(self, message: str, session_id: str):
+        logger.info(f"\n{'#'*60}")
+        logger.info(f"NOUVEAU MESSAGE")
+        logger.info(f"   Session: {session_id[:8]}...")
+        logger.info(f"   Message: '{message[:100]}{'...' if len(message) > 100 else ''}'")
+        logger.info(f"{'#'*60}\n")
+        
+        session = state_manager.get_or_create_session(session_id)
+        state_manager.add_to_history(session_id, "user", message)
+        return session
+    
+    def _set_agent(self, session, agent_type: str, intent: str):
+        # Persist the chosen agent type in the conversation session so the UI
+        # and other components can access which agent handled the last request.
         try:
-            logger.info(f"\n{'#'*60}")
-            logger.info(f"NOUVEAU MESSAGE")
-            logger.info(f"   Session: {session_id[:8]}...")
-            logger.info(f"   Message: '{message[:100]}{'...' if len(message) > 100 else ''}'")
-            logger.info(f"{'#'*60}\n")
-            
-            session = state_manager.get_or_create_session(session_id)
-            state_manager.add_to_history(session_id, "user", message)
+            session.current_agent = agent_type
+        except Exception:
+            logger.debug("Impossible de définir 'current_agent' sur la session")
+        is_mixed = (intent == "mixed")
+        
+        logger.info(f"\n{'='*60}")
+        logger.info(f"EXÉCUTION AGENT: {agent_type.upper()}")
+        logger.info(f"{'='*60}\n")
+        return session, agent_type, is_mixed
+    
+    def _mixed_followup(self, session, session_id: str) -> str:
+        """Intent MIXED: active le formulaire après la réponse RAG (texte ajouté à la réponse)"""
+        if state_manager.is_form_active(session_id):
+            return ""
+        logger.info("Intent MIXED détecté → activation du formulaire pour la prochaine interaction")
+        if not session.form_data:
+            session.form_data = {
+                'nom': None,
+                'email': None,
+                'telephone': None,
+                'programme': None,
+                'message': None
+            }
+        return "\n\nJe vois que vous souhaitez également être contacté. Pouvons-nous prendre vos coordonnées ?"
+    
+    def _run_other_agent(self, message: str, session_id: str, session, agent_type: str) -> str:
+        """Agents Formulaire et Interaction (réponses courtes, non streamées)"""
+        if agent_type == "formulaire":
+            if self.form is None:
+                return "Désolé, le service de contact est temporairement indisponible."
+            response = self.form.run(message, session_id)
             
-            agent_type = self.route(message, session_id)
-            # Persist the chosen agent type in the conversation session so the UI
-            # and other components can access which agent handled the last request.
-            try:
-                session.current_agent = agent_type
-            except Exception:
-                logger.debug("Impossible de définir 'current_agent' sur la session")
-            intent = self.detect_intent_with_llm(message)
-            is_mixed = (intent == "mixed")
+            if session.form_completed:
+                logger.info("Formulaire terminé, réinitialisation de l'état")
+                session.form_completed = False
+                session.awaiting_confirmation = False
+            return response
+        
+        if self.interact is None:
+            return "Bonjour ! Comment puis-je vous aider ?"
+        return self.interact.run(message)
+    
+    async def _arun_other_agent(self, message: str, session_id: str, session, agent_type: str) -> str:
+        if agent_type == "formulaire":
+            if self.form is None:
+                return "Désolé, le service de contact est temporairement indisponible."
+            response = await self.form.arun(message, session_id)
             
-            logger.info(f"\n{'='*60}")
-            logger.info(f"EXÉCUTION AGENT: {agent_type.upper()}")
-            logger.info(f"{'='*60}\n")
+            if session.form_completed:
+                logger.info("Formulaire terminé, réinitialisation de l'état")
+                session.form_completed = False
+                session.awaiting_confirmation = False
+            return response
+        
+        if self.interact is None:
+            return "Bonjour ! Comment puis-je vous aider ?"
+        return await self.interact.arun(message)
+    
+    def _end_turn(self, session_id: str, response: str):
+        state_manager.add_to_history(session_id, "assistant", response)
+        
+        logger.info(f"\n{'='*60}")
+        logger.info(f"RÉPONSE GÉNÉRÉE")
+        logger.info(f"   Longueur: {len(response)} caractères")
+        logger.info(f"   Aperçu: '{response[:100]}{'...' if len(response) > 100 else ''}'")
+        logger.info(f"{'='*60}\n")
+    
+    def _log_critical_error(self, e: Exception, message: str, session_id: str):
+        logger.error(f"\n{'!'*60}")
+        logger.error(f"ERREUR CRITIQUE dans run()")
+        logger.error(f"   Exception: {type(e).__name__}")
+        logger.error(f"   Message: {str(e)}")
+        logger.error(f"   Session: {session_id[:8]}...")
+        logger.error(f"   Message: '{message[:100]}{'...' if len(message) > 100 else ''}'")
+        logger.error(f"{'!'*60}\n")
+    
+    def run(self, message: str, session_id: str) -> str:
+        try:
+            session, agent_type, is_mixed = self._start_turn(message, session_id)
             
             if agent_type == "rag":
                 if self.rag is None:
@@ -238,54 +389,134 @@ class AgentSuperviseur:
                 else:
                     response = self.rag.run(message)
                 
-                if is_mixed and not state_manager.is_form_active(session_id):
-                    logger.info("Intent MIXED détecté → activation du formulaire pour la prochaine interaction")
-                    if not session.form_data:
-                        session.form_data = {
-                            'nom': None,
-                            'email': None,
-                            'telephone': None,
-                            'programme': None,
-                            'message': None
-                        }
-                    response += "\n\nJe vois que vous souhaitez également être contacté. Pouvons-nous prendre vos coordonnées ?"
+                if is_mixed:
+                    response += self._mixed_followup(session, session_id)
             
-            elif agent_type == "formulaire":
-                if self.form is None:
-                    response = "Désolé, le service de contact est temporairement indisponible."
-                else:
-                    response = self.form.run(message, session_id)
-                    
-                    if session.form_completed:
-                        logger.info("Formulaire terminé, réinitialisation de l'état")
-                        session.form_completed = False
-                        session.awaiting_confirmation = False
+            else:
+                response = self._run_other_agent(message, session_id, session, agent_type)
             
+            self._end_turn(session_id, response)
+            return response
+        
+        except Exception as e:
+            self._log_critical_error(e, message, session_id)
+            return "Désolé, une erreur s'est produite. Pouvez-vous reformuler votre demande ?"
+    
+    def run_stream(self, message: str, session_id: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Version streaming de run(): la réponse de l'agent RAG est transmise au fil de la
+        génération, celles des autres agents en un seul fragment.
+        
+        Yields:
+            ('token', fragment)..., puis ('answer', texte final qui remplace les fragments),
+            ('sources', URLs web citées) et ('done', {'response': texte identique à run(),
+            'agent': agent ayant répondu})
+        """
+        agent_type = None
+        try:
+            session, agent_type, is_mixed = self._start_turn(message, session_id)
+            sources = []
+            
+            if agent_type == "rag" and self.rag is not None:
+                result = None
+                for event, data in self.rag.run_stream(message):
+                    if event == 'done':
+                        result = data
+                    else:
+                        yield event, data
+                answer, sources, response = result['answer'], result['sources'], result['response']
+                if is_mixed:
+                    followup = self._mixed_followup(session, session_id)
+                    answer += followup
+                    response += followup
             else:
-                if self.interact is None:
-                    response = "Bonjour ! Comment puis-je vous aider ?"
+                if agent_type == "rag":
+                    response = "Désolé, le service de recherche d'information est temporairement indisponible."
                 else:
-                    response = self.interact.run(message)
+                    response = self._run_other_agent(message, session_id, session, agent_type)
+                answer = response
+                yield 'token', response
             
-            state_manager.add_to_history(session_id, "assistant", response)
+            self._end_turn(session_id, response)
+        
+        except Exception as e:
+            self._log_critical_error(e, message, session_id)
+            answer = response = "Désolé, une erreur s'est produite. Pouvez-vous reformuler votre demande ?"
+            sources = []
+        
+        yield 'answer', answer
+        yield 'sources', sources
+        yield 'done', {'response': response, 'agent': agent_type}
+    
+    async def arun(self, message: str, session_id: str) -> str:
+        """Version asynchrone de run(): aucun thread bloqué pendant les appels à Ollama"""
+        try:
+            session, agent_type, is_mixed = await self._astart_turn(message, session_id)
+            
+            if agent_type == "rag":
+                if self.rag is None:
+                    response = "Désolé, le service de recherche d'information est temporairement indisponible."
+                else:
+                    response = await self.rag.arun(message)
+                
+                if is_mixed:
+                    response += self._mixed_followup(session, session_id)
             
-            logger.info(f"\n{'='*60}")
-            logger.info(f"RÉPONSE GÉNÉRÉE")
-            logger.info(f"   Longueur: {len(response)} caractères")
-            logger.info(f"   Aperçu: '{response[:100]}{'...' if len(response) > 100 else ''}'")
-            logger.info(f"{'='*60}\n")
+            else:
+                response = await self._arun_other_agent(message, session_id, session, agent_type)
             
+            self._end_turn(session_id, response)
             return response
         
         except Exception as e:
-            logger.error(f"\n{'!'*60}")
-            logger.error(f"ERREUR CRITIQUE dans run()")
-            logger.error(f"   Exception: {type(e).__name__}")
-            logger.error(f"   Message: {str(e)}")
-            logger.error(f"   Session: {session_id[:8]}...")
-            logger.error(f"   Message: '{message[:100]}{'...' if len(message) > 100 else ''}'")
-            logger.error(f"{'!'*60}\n")
+            self._log_critical_error(e, message, session_id)
             return "Désolé, une erreur s'est produite. Pouvez-vous reformuler votre demande ?"
     
+    async def arun_stream(self, message: str, session_id: str) -> AsyncIterator[Tuple[str, Any]]:
+        """Version asynchrone de run_stream() (mêmes événements)"""
+        agent_type = None
+        try:
+            session, agent_type, is_mixed = await self._astart_turn(message, session_id)
+            sources = []
+            
+            if agent_type == "rag" and self.rag is not None:
+                result = None
+                async for event, data in self.rag.arun_stream(message):
+                    if event == 'done':
+                        result = data
+                    else:
+                        yield event, data
+                answer, sources, response = result['answer'], result['sources'], result['response']
+                if is_mixed:
+                    followup = self._mixed_followup(session, session_id)
+                    answer += followup
+                    response += followup
+            else:
+                if agent_type == "rag":
+                    response = "Désolé, le service de recherche d'information est temporairement indisponible."
+                else:
+                    response = await self._arun_other_agent(message, session_id, session, agent_type)
+                answer = response
+                yield 'token', response
+            
+            self._end_turn(session_id, response)
+        
+        except Exception as e:
+            self._log_critical_error(e, message, session_id)
+            answer = response = "Désolé, une erreur s'est produite. Pouvez-vous reformuler votre demande ?"
+            sources = []
+        
+        yield 'answer', answer
+        yield 'sources', sources
+        yield 'done', {'response': response, 'agent': agent_type}
+    
     def get_statistics(self, session_id: str) -> dict:
-        return state_manager.get_session_summary(session_id)
\ No newline at end of file
+        return state_manager.get_session_summary(session_id)
+    
+    def get_single_flight_stats(self) -> dict:
+        """Appels LLM évités par le dédoublonnage des requêtes identiques simultanées"""
+        rag_pipeline = self.rag.rag_pipeline if self.rag else None
+        return {
+            'routing': self.intent_flight.get_stats(),
+            'rag': rag_pipeline.single_flight.get_stats() if rag_pipeline and rag_pipeline.single_flight else None
+        }
\ No newline at end of file
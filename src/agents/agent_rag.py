@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, List, Tuple
 import logging
 import re
 import os
@@ -6,11 +7,30 @@ import os
 from src.rag.generation.rag_pipeline import RAGPipeline
 from src.rag.generation.retriever_lang import Retriever
 from src.rag.generation.llm_handler import OllamaLLM
+from src.rag.generation.answer_cache import SemanticAnswerCache
 from src.rag.vectorstore.vector_store_lang import VectorStoreManager
 from src.agents.prompts import prompts
 
 logger = logging.getLogger(__name__)
 
+# Citations [1], [2]... retirées de la réponse; en streaming, une citation peut être
+# coupée entre deux fragments ("[" puis "2]"): la fin en attente est retenue
+_CITATION = re.compile(r'\[\d+\]')
+_PENDING_CITATION = re.compile(r'\[\d*$')
+
+
+class _CitationFilter:
+    """Retire les citations d'un flux de fragments de réponse."""
+
+    def __init__(self):
+        self.pending = ""
+
+    def feed(self, fragment: str) -> str:
+        text = _CITATION.sub('', self.pending + fragment)
+        match = _PENDING_CITATION.search(text)
+        self.pending = text[match.start():] if match else ""
+        return text[:match.start()] if match else text
+
 
 class AgentRAG:
     """Agent RAG aligné sur la structure des autres agents.
@@ -29,6 +49,10 @@ class AgentRAG:
         top_k: int = 20,
         final_k: int = 5,
         temperature: float = 0.1,
+        answer_cache_path: str = "data/cache/answer_cache.npz",
+        answer_cache_distance: float = 0.05,
+        mmap_index: bool = True,
+        index_watch_interval: float = float(os.getenv("INDEX_WATCH_INTERVAL", "10")),
     ):
         self.model = model
         if os.path.exists("/app/vector_store_faiss"):
@@ -38,35 +62,55 @@ class AgentRAG:
         self.top_k = top_k
         self.final_k = final_k
         self.temperature = temperature
+        self.answer_cache_path = answer_cache_path
+        self.answer_cache_distance = answer_cache_distance
+        self.mmap_index = mmap_index
+        self.index_watch_interval = index_watch_interval
 
         self.rag_ready = False
         self.rag_pipeline = None
         self.retriever = None
         self.vector_store = None
+        self.answer_cache = None
 
         try:
             logger.info("🔧 Initialisation Agent RAG...")
 
-            # Load FAISS vector store
-            self.vector_store = VectorStoreManager(index_directory=self.index_directory)
+            # Load FAISS vector store (mappé en lecture seule: partagé entre workers)
+            self.vector_store = VectorStoreManager(index_directory=self.index_directory, mmap=self.mmap_index)
             loaded = self.vector_store.load_index()
             if not loaded:
                 logger.warning("⚠️ Vectorstore FAISS non trouvé ou non chargé")
                 return
 
+            # Nouvelles versions de l'index chargées à chaud (chaque worker surveille CURRENT)
+            if self.index_watch_interval > 0:
+                self.vector_store.watch_versions(self.index_watch_interval)
+
             # Init retriever
             self.retriever = Retriever(
                 vector_store_manager=self.vector_store,
                 top_k=self.top_k,
                 final_k=self.final_k,
-                similarity_threshold=0.7,
+                similarity_threshold=0.25,  # Similarité cosinus minimale
             )
 
             # Init LLM handler
             self.llm = OllamaLLM(model=self.model, temperature=self.temperature, max_tokens=1000)
 
+            # Cache sémantique des réponses (persisté dans data/, monté en volume Docker)
+            self.answer_cache = SemanticAnswerCache(
+                path=self.answer_cache_path,
+                max_distance=self.answer_cache_distance,
+            )
+
             # Create RAG pipeline
-            self.rag_pipeline = RAGPipeline(retriever=self.retriever, llm=self.llm, system_prompt=prompts.RAG_SYSTEM_PROMPT)
+            self.rag_pipeline = RAGPipeline(
+                retriever=self.retriever,
+                llm=self.llm,
+                system_prompt=prompts.RAG_SYSTEM_PROMPT,
+                answer_cache=self.answer_cache,
+            )
 
             self.rag_ready = True
             logger.info("✓ Agent RAG initialisé avec succès")
@@ -117,12 +161,7 @@ class AgentRAG:
     def run(self, user_message: str) -> str:
         """Traite une requête utilisateur via la pipeline RAG."""
         if not self.rag_ready or not self.rag_pipeline:
-            return (
-                "Le système de recherche documentaire n'est pas encore configuré.\n\n"
-                "Pour l'activer, indexez vos documents :\n"
-                "python -m src.rag.main_rag_lang index \n\n"
-                "En attendant, **souhaitez-vous être contacté par un conseiller ?**"
-            )
+            return self._not_ready_response()
 
         try:
             logger.info(f"🔍 AgentRAG traitement: {user_message[:120]}")
@@ -134,72 +173,172 @@ class AgentRAG:
                 stream=False, 
                 debug=False
             )
+            answer, web_sources = self._build_answer(result)
+            return self._format_response(answer, web_sources)
 
-            if not result or not result.get("answer"):
-                logger.warning("⚠️ Aucune réponse générée par la pipeline RAG")
-                return self._no_answer_response()
+        except Exception as e:
+            logger.error(f"✗ Erreur Agent RAG lors du run(): {e}")
+            return self._error_response()
 
-            answer = result.get("answer", "")
-            all_sources = result.get("sources", [])
+    def run_stream(self, user_message: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Version streaming de run().
 
-            # Extraire les sources utilisées
-            used_sources = self._extract_used_sources(answer, all_sources)
-            clean_answer = answer
-            
-            # 1. Supprimer les citations numériques [1], [2]
-            clean_answer = re.sub(r'\[\d+\]', '', clean_answer)
-            
-            # 2. Supprimer les URLs complètes (web et chemins de fichiers)
-            clean_answer = re.sub(r'https?://[^\s]+', '', clean_answer)  # URLs web
-            clean_answer = re.sub(r'__https?://[^\s]+__', '', clean_answer)  # URLs en gras markdown
-            clean_answer = re.sub(r'https://data\\[^\s]+', '', clean_answer)  # Chemins data\ 
-            clean_answer = re.sub(r'__https://data\\[^\s]+__', '', clean_answer)  # Chemins data\ en gras
-            
-            # 3. Supprimer les patterns de métadonnées "| Page: X | Pertinence: X.XX"
-            clean_answer = re.sub(r'\|\s*Page:\s*\d+\s*\|\s*Pertinence:\s*[\d.]+', '', clean_answer)
+        Yields:
+            ('token', fragment) au fil de la génération (citations retirées), puis
+            ('done', {'answer', 'sources', 'response'}): réponse nettoyée qui remplace le
+            texte transmis, URLs web citées, et texte complet identique à run()
+        """
+        if not self.rag_ready or not self.rag_pipeline:
+            response = self.run(user_message)
+            yield 'token', response
+            yield 'done', {'answer': response, 'sources': [], 'response': response}
+            return
+
+        try:
+            logger.info(f"🔍 AgentRAG traitement (streaming): {user_message[:120]}")
+            citations = _CitationFilter()
+            result = None
+            for event, data in self.rag_pipeline.query_stream(user_message, return_sources=True, debug=False):
+                if event == 'done':
+                    result = data
+                    continue
+                text = citations.feed(data)
+                if text:
+                    yield 'token', text
+
+            answer, web_sources = self._build_answer(result)
+        except Exception as e:
+            logger.error(f"✗ Erreur Agent RAG lors du run_stream(): {e}")
+            answer, web_sources = self._error_response(), []
+
+        yield 'done', {
+            'answer': answer,
+            'sources': web_sources,
+            'response': self._format_response(answer, web_sources)
+        }
+
+    def _not_ready_response(self) -> str:
+        return (
+            "Le système de recherche documentaire n'est pas encore configuré.\n\n"
+            "Pour l'activer, indexez vos documents :\n"
+            "python -m src.rag.main_rag_lang index \n\n"
+            "En attendant, **souhaitez-vous être contacté par un conseiller ?**"
+        )
+
+    async def arun(self, user_message: str) -> str:
+        """Version asynchrone de run()."""
+        if not self.rag_ready or not self.rag_pipeline:
+            return self._not_ready_response()
+
+        try:
+            logger.info(f"🔍 AgentRAG traitement (async): {user_message[:120]}")
+            result = await self.rag_pipeline.aquery(user_message, return_sources=True, debug=False)
+            answer, web_sources = self._build_answer(result)
+            return self._format_response(answer, web_sources)
+
+        except Exception as e:
+            logger.error(f"✗ Erreur Agent RAG lors du arun(): {e}")
+            return self._error_response()
+
+    async def arun_stream(self, user_message: str) -> AsyncIterator[Tuple[str, Any]]:
+        """Version asynchrone de run_stream() (mêmes événements)."""
+        if not self.rag_ready or not self.rag_pipeline:
+            response = self._not_ready_response()
+            yield 'token', response
+            yield 'done', {'answer': response, 'sources': [], 'response': response}
+            return
+
+        try:
+            logger.info(f"🔍 AgentRAG traitement (async, streaming): {user_message[:120]}")
+            citations = _CitationFilter()
+            result = None
+            async for event, data in self.rag_pipeline.aquery_stream(user_message, return_sources=True, debug=False):
+                if event == 'done':
+                    result = data
+                    continue
+                text = citations.feed(data)
+                if text:
+                    yield 'token', text
+
+            answer, web_sources = self._build_answer(result)
+        except Exception as e:
+            logger.error(f"✗ Erreur Agent RAG lors du arun_stream(): {e}")
+            answer, web_sources = self._error_response(), []
+
+        yield 'done', {
+            'answer': answer,
+            'sources': web_sources,
+            'response': self._format_response(answer, web_sources)
+        }
+
+    def _build_answer(self, result: dict) -> Tuple[str, List[str]]:
+        """Réponse de la pipeline nettoyée (citations, URLs, métadonnées) et URLs web citées."""
+        if not result or not result.get("answer"):
+            logger.warning("⚠️ Aucune réponse générée par la pipeline RAG")
+            return self._no_answer_response(), []
+
+        answer = result.get("answer", "")
+        all_sources = result.get("sources", [])
+
+        # Extraire les sources utilisées
+        used_sources = self._extract_used_sources(answer, all_sources)
+        clean_answer = answer
+        
+        # 1. Supprimer les citations numériques [1], [2]
+        clean_answer = _CITATION.sub('', clean_answer)
+        
+        # 2. Supprimer les URLs complètes (web et chemins de fichiers)
+        clean_answer = re.sub(r'https?://[^\s]+', '', clean_answer)  # URLs web
+        clean_answer = re.sub(r'__https?://[^\s]+__', '', clean_answer)  # URLs en gras markdown
+        clean_answer = re.sub(r'https://data\\[^\s]+', '', clean_answer)  # Chemins data\ 
+        clean_answer = re.sub(r'__https://data\\[^\s]+__', '', clean_answer)  # Chemins data\ en gras
+        
+        # 3. Supprimer les patterns de métadonnées "| Page: X | Pertinence: X.XX"
+        clean_answer = re.sub(r'\|\s*Page:\s*\d+\s*\|\s*Pertinence:\s*[\d.]+', '', clean_answer)
+        
+        # 4. Supprimer les lignes vides multiples et espaces en trop
+        clean_answer = re.sub(r'\n\s*\n\s*\n+', '\n\n', clean_answer)
+        clean_answer = re.sub(r' +', ' ', clean_answer)
+        clean_answer = clean_answer.strip()
+        
+        # Vérifier si la réponse est vide ou générique
+        if not used_sources and clean_answer.lower() in [
+            "je n'ai pas cette information dans ma documentation", 
+            "je n'ai pas trouvé cette information"
+        ]:
+            return self._no_answer_response(), []
+
+        # Filtrer uniquement les URLs web (exclure les PDFs)
+        web_sources = []
+        for src in used_sources:
+            src_name = src.get("source", "")
             
-            # 4. Supprimer les lignes vides multiples et espaces en trop
-            clean_answer = re.sub(r'\n\s*\n\s*\n+', '\n\n', clean_answer)
-            clean_answer = re.sub(r' +', ' ', clean_answer)
-            clean_answer = clean_answer.strip()
+            # Convertir Path en string si nécessaire
+            if isinstance(src_name, Path):
+                src_name = str(src_name)
             
-            # Vérifier si la réponse est vide ou générique
-            if not used_sources and clean_answer.lower() in [
-                "je n'ai pas cette information dans ma documentation", 
-                "je n'ai pas trouvé cette information"
-            ]:
-                return self._no_answer_response()
-
-            # Filtrer uniquement les URLs web (exclure les PDFs)
-            web_sources = []
-            for src in used_sources:
-                src_name = src.get("source", "")
-                
-                # Convertir Path en string si nécessaire
-                if isinstance(src_name, Path):
-                    src_name = str(src_name)
+            # Garder uniquement les sources web
+            if isinstance(src_name, str):
+                is_web_url = (src_name.startswith('http://') or src_name.startswith('https://'))
+                is_not_file_path = 'data\\' not in src_name and '\\pdf\\' not in src_name and '.pdf' not in src_name
                 
-                # Garder uniquement les sources web
-                if isinstance(src_name, str):
-                    is_web_url = (src_name.startswith('http://') or src_name.startswith('https://'))
-                    is_not_file_path = 'data\\' not in src_name and '\\pdf\\' not in src_name and '.pdf' not in src_name
-                    
-                    if is_web_url and is_not_file_path:
-                        if src_name not in web_sources: 
-                            web_sources.append(src_name)
-
-            response = clean_answer
-            
-            if web_sources:
-                response += "\n\n📚 Source" + ("s" if len(web_sources) > 1 else "") + " :\n"
-                for i, url in enumerate(web_sources, start=1):
-                    response += f"{i}. {url}\n"
+                if is_web_url and is_not_file_path:
+                    if src_name not in web_sources: 
+                        web_sources.append(src_name)
 
-            return response
+        return clean_answer, web_sources
 
-        except Exception as e:
-            logger.error(f"✗ Erreur Agent RAG lors du run(): {e}")
-            return self._error_response()
+    def _format_response(self, answer: str, web_sources: List[str]) -> str:
+        """Réponse affichée: texte puis liste des sources web."""
+        response = answer
+        
+        if web_sources:
+            response += "\n\n📚 Source" + ("s" if len(web_sources) > 1 else "") + " :\n"
+            for i, url in enumerate(web_sources, start=1):
+                response += f"{i}. {url}\n"
+
+        return response
 
     def _format_sources_for_llm(self, sources: list) -> str:
         """
@@ -224,6 +363,17 @@ class AgentRAG:
             "Pouvez-vous reformuler votre question ou cliquer sur '📞 Je souhaite être contacté' ?"
         )
 
+    def reload_index(self) -> dict:
+        """Charge immédiatement la version publiée de l'index si elle a changé."""
+        if not self.vector_store or not self.vector_store.vectorstore:
+            return {"swapped": False, "error": "index non chargé"}
+        return self.vector_store.hot_swap()
+
+    def warm_up(self):
+        """Charge le modèle et place le préfixe statique du prompt RAG dans le cache KV d'Ollama."""
+        if self.is_ready():
+            self.rag_pipeline.warm_up()
+
     def is_ready(self) -> bool:
         return self.rag_ready and self.rag_pipeline is not None
 
@@ -233,8 +383,19 @@ class AgentRAG:
                 "status": "ready" if self.is_ready() else "not_ready",
                 "model": self.model,
                 "vectorstore_index": self.index_directory,
+                "index_version": self.vector_store.version if self.vector_store else None,
                 "top_k": self.top_k,
                 "final_k": self.final_k,
+                "query_embedding_cache": (
+                    self.vector_store.query_cache.get_stats() if self.vector_store else None
+                ),
+                "answer_cache": self.answer_cache.get_stats() if self.answer_cache else None,
+                "single_flight": (
+                    self.rag_pipeline.single_flight.get_stats()
+                    if self.rag_pipeline and self.rag_pipeline.single_flight else None
+                ),
+                "index_memory": self.vector_store.memory_report() if self.vector_store else None,
+                "llm_pool": self.llm.get_stats() if self.rag_ready else None,
             }
         except Exception:
             return {"status": "error"}
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Optional
 import re
 import math
 
@@ -6,41 +6,140 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document 
 from pathlib import Path
 
+SEPARATORS = [
+    "\n\n",      # Paragraphes
+    "\n",        # Lignes
+    ". ",        # Phrases
+    "! ",
+    "? ",
+    "; ",
+    ", ",
+    " ",         # Mots
+    ""           # Caractères
+]
+
+
 class OptimalChunker:
     """
     Chunker optimisé pour chatbot RAG.
     Utilise RecursiveCharacterTextSplitter de LangChain pour une découpe intelligente.
+
+    Deux modes:
+    - caractères (par défaut): tokens estimés à caractères / 4
+    - tokenizer (`tokenizer_name`): longueurs mesurées avec le tokenizer du modèle
+      d'embedding, chaque chunk tient dans sa longueur maximale de séquence (aucun
+      texte tronqué à l'embedding). Avec `context_size`, le document est d'abord
+      découpé en spans de contexte (envoyés au LLM, métadonnée `context`), eux-mêmes
+      découpés en chunks embeddés.
     """
     
     def __init__(
         self,
         chunk_size: int = 512,      # Taille cible en tokens
         chunk_overlap: int = 128,   # Overlap en tokens 
+        tokenizer_name: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        context_size: Optional[int] = None
     ):
-
+        """
+        Args:
+            tokenizer_name: Modèle dont le tokenizer mesure les chunks (active le mode tokenizer)
+            max_tokens: Longueur maximale de séquence du modèle d'embedding, tokens spéciaux
+                compris (par défaut celle du tokenizer)
+            context_size: Taille (tokens) des spans de contexte envoyés au LLM; None = le
+                chunk embeddé sert aussi de contexte
+        """
         self.chunk_size_chars = chunk_size * 4
         self.overlap_chars = chunk_overlap * 4
+        self.tokenizer_name = tokenizer_name
+        self.max_tokens = max_tokens
+        self.context_size = context_size
+        # Même proportion de recouvrement en mode tokenizer
+        self.overlap_ratio = chunk_overlap / chunk_size
+        self._tokenizer = None
         
         # Utilisation du RecursiveCharacterTextSplitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size_chars,
-            chunk_overlap=self.overlap_chars,
-            length_function=len,
-            separators=[
-                "\n\n",      # Paragraphes
-                "\n",        # Lignes
-                ". ",        # Phrases
-                "! ",
-                "? ",
-                "; ",
-                ", ",
-                " ",         # Mots
-                ""           # Caractères
-            ],
-            # Conserver le séparateur peut aider le LLM à comprendre la structure
-            keep_separator=False 
+        if tokenizer_name is None:
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_size_chars,
+                chunk_overlap=self.overlap_chars,
+                length_function=len,
+                separators=SEPARATORS,
+                # Conserver le séparateur peut aider le LLM à comprendre la structure
+                keep_separator=False 
+            )
+        else:
+            self.text_splitter = None
+            self.context_splitter = None
+
+    def __getstate__(self):
+        # Le tokenizer est rechargé dans chaque processus de l'indexation parallèle
+        state = self.__dict__.copy()
+        state['_tokenizer'] = None
+        if self.tokenizer_name is not None:
+            state['text_splitter'] = state['context_splitter'] = None
+        return state
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+        return self._tokenizer
+
+    @property
+    def embed_tokens(self) -> int:
+        """Budget de tokens d'un chunk embeddé (hors tokens spéciaux [CLS]/[SEP])"""
+        max_tokens = self.max_tokens or self.tokenizer.model_max_length
+        return max_tokens - self.tokenizer.num_special_tokens_to_add()
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False, verbose=False))
+
+    def _token_splitter(self, size: int, overlap: int) -> RecursiveCharacterTextSplitter:
+        return RecursiveCharacterTextSplitter(
+            chunk_size=size,
+            chunk_overlap=overlap,
+            length_function=self.count_tokens,
+            separators=SEPARATORS,
+            keep_separator=False
         )
 
+    def _splitters(self):
+        if self.text_splitter is None:
+            size = self.embed_tokens
+            self.text_splitter = self._token_splitter(size, int(size * self.overlap_ratio))
+            if self.context_size:
+                self.context_splitter = self._token_splitter(self.context_size, 0)
+        return self.text_splitter, self.context_splitter
+
+    def _fit(self, text: str) -> List[str]:
+        """
+        Garantit qu'aucun morceau ne dépasse le budget de tokens (la fusion des morceaux
+        par le splitter peut le dépasser de quelques tokens): coupe au dernier token admis.
+        """
+        budget = self.embed_tokens
+        pieces = []
+        while True:
+            encoding = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+            if len(encoding['input_ids']) <= budget:
+                pieces.append(text)
+                return pieces
+            cut = encoding['offset_mapping'][budget][0]
+            pieces.append(text[:cut].rstrip())
+            text = text[cut:].lstrip()
+
+    def config(self) -> Dict:
+        """Paramètres de découpage (cf. manifeste de l'index)"""
+        config = {'chunk_size_chars': self.chunk_size_chars, 'chunk_overlap_chars': self.overlap_chars}
+        if self.tokenizer_name is not None:
+            config.update({
+                'tokenizer': self.tokenizer_name,
+                'max_tokens': self.max_tokens,
+                'context_size': self.context_size
+            })
+        return config
+
     def chunk_document(self, document: Document) -> List[Document]:
         """
         Découpe un seul Document LangChain en chunks optimaux.
@@ -49,6 +148,9 @@ class OptimalChunker:
         Returns:
             Liste de chunks (Documents LangChain).
         """
+        if self.tokenizer_name is not None:
+            return self._chunk_document_tokens(document)
+
         chunks = self.text_splitter.split_documents([document])
         
         # Mettre à jour les métadonnées avec les infos de chunking
@@ -69,6 +171,37 @@ class OptimalChunker:
             
         return chunks
     
+    def _chunk_document_tokens(self, document: Document) -> List[Document]:
+        """Mode tokenizer: chunks embeddés ≤ max_tokens, éventuellement rattachés à un span de contexte"""
+        text_splitter, context_splitter = self._splitters()
+        source = document.metadata.get('source', 'unknown')
+
+        spans = []  # (texte embeddé, contexte ou None)
+        contexts = context_splitter.split_text(document.page_content) if context_splitter else [None]
+        for context in contexts:
+            text = document.page_content if context is None else context
+            for split in text_splitter.split_text(text):
+                split = split.replace('content', 'page_content')
+                for piece in self._fit(split):
+                    if piece:
+                        spans.append((piece, context))
+
+        chunks = []
+        total_chunks = len(spans)
+        for i, (text, context) in enumerate(spans):
+            metadata = dict(document.metadata)
+            metadata.update({
+                'chunk_id': f"{Path(source).name}-{document.metadata.get('page', 0)}-{i}",
+                'chunk_index': i,
+                'total_chunks': total_chunks,
+                'chunk_size_chars': len(text),
+                'chunk_tokens': self.count_tokens(text)
+            })
+            if context is not None and context != text:
+                metadata['context'] = context.replace('content', 'page_content')
+            chunks.append(Document(page_content=text, metadata=metadata))
+        return chunks
+    
     def chunk_documents(self, documents: List[Document]) -> List[Document]:
         """Chunke une liste de documents LangChain."""
         all_chunks = []
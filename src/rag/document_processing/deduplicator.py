@@ -0,0 +1,150 @@
+import re
+import zlib
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Nombre premier de Mersenne (2^61 - 1) des permutations universelles de MinHash
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+class ChunkDeduplicator:
+    """
+    Élimination des chunks dupliqués à l'indexation.
+
+    - doublons exacts: empreinte du texte normalisé (casse et espaces ignorés)
+    - quasi-doublons: signatures MinHash des n-grammes de mots, candidats trouvés par
+      LSH (la signature est découpée en bandes, deux chunks qui partagent une bande
+      sont comparés) puis retenus si la similarité de Jaccard estimée dépasse `threshold`
+
+    Chaque chunk retenu est enregistré sous son id: un chunk ultérieur identique ou
+    presque identique est rattaché à ce chunk « canonique » au lieu d'être indexé.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 5,
+        seed: int = 1
+    ):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) doit être un multiple de bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+
+        # Permutations fixées par la graine: les signatures sont stables d'une exécution à l'autre
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self._exact: Dict[str, str] = {}
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        self._entries: Dict[str, Tuple[str, np.ndarray]] = {}
+        self.dropped = {'exact': 0, 'near': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def config(self) -> Dict:
+        """Paramètres qui déterminent le résultat de la déduplication (cf. manifeste)"""
+        return {
+            'threshold': self.threshold,
+            'num_perm': self.num_perm,
+            'bands': self.bands,
+            'shingle_size': self.shingle_size,
+            'seed': self.seed
+        }
+
+    @staticmethod
+    def exact_key(text: str) -> str:
+        normalized = " ".join(text.lower().split())
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+    def signature(self, text: str) -> np.ndarray:
+        """Signature MinHash (num_perm × uint32) des n-grammes de mots du texte"""
+        words = re.findall(r"\w+", text.lower())
+        size = self.shingle_size
+        shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def find(self, text: str, exclude: Optional[Set[str]] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Cherche un chunk enregistré identique ou presque identique au texte.
+
+        Args:
+            exclude: Ids à ignorer (ex: anciens chunks du document en cours de réindexation)
+
+        Returns:
+            (id du chunk canonique, 'exact' ou 'near'), ou (None, None)
+        """
+        exclude = exclude or set()
+        doc_id = self._exact.get(self.exact_key(text))
+        if doc_id is not None and doc_id not in exclude:
+            return doc_id, 'exact'
+
+        signature = self.signature(text)
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+        best_id, best_similarity = None, self.threshold
+        for candidate in candidates - exclude:
+            similarity = float(np.mean(self._entries[candidate][1] == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = candidate, similarity
+        return (best_id, 'near') if best_id is not None else (None, None)
+
+    def check(self, doc_id: str, text: str, exclude: Optional[Set[str]] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        find(), puis enregistre le chunk s'il n'est pas un doublon.
+
+        Returns:
+            (id du chunk canonique, 'exact' ou 'near') si c'est un doublon, sinon (None, None)
+        """
+        canonical_id, kind = self.find(text, exclude)
+        if canonical_id is not None:
+            self.dropped[kind] += 1
+        else:
+            self.add(doc_id, text)
+        return canonical_id, kind
+
+    def add(self, doc_id: str, text: str):
+        """Enregistre un chunk retenu (sans vérification)"""
+        if doc_id in self._entries:
+            return
+        exact_key = self.exact_key(text)
+        signature = self.signature(text)
+        self._exact.setdefault(exact_key, doc_id)
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, set()).add(doc_id)
+        self._entries[doc_id] = (exact_key, signature)
+
+    def remove(self, doc_id: str):
+        """Retire un chunk (ex: supprimé de l'index): il ne sert plus de référence"""
+        entry = self._entries.pop(doc_id, None)
+        if entry is None:
+            return
+        exact_key, signature = entry
+        if self._exact.get(exact_key) == doc_id:
+            del self._exact[exact_key]
+        for band, key in self._band_keys(signature):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(doc_id)
+                if not bucket:
+                    del self._buckets[band][key]
@@ -0,0 +1,68 @@
+"""
+Fonctions exécutées dans les processus de l'indexation parallèle.
+
+Module volontairement léger (ni modèle d'embedding ni FAISS): il est ré-importé
+par chaque processus du pool.
+"""
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document as LCDocument
+
+from src.rag.document_processing.pdf_loader_lang import PDFLoader
+from src.rag.document_processing.chunker_lang import OptimalChunker
+from src.rag.document_processing.text_cleaner import TextCleaner
+
+# Instances propres à chaque processus (cf. init_worker)
+_text_cleaner: Optional[TextCleaner] = None
+_chunker: Optional[OptimalChunker] = None
+_pdf_loader: Optional[PDFLoader] = None
+
+
+def init_worker(text_cleaner: TextCleaner, chunker: OptimalChunker, pdf_loader: Optional[PDFLoader] = None):
+    """Initialise le processus avec la configuration du pipeline (envoyée une seule fois)"""
+    global _text_cleaner, _chunker, _pdf_loader
+    _text_cleaner = text_cleaner
+    _chunker = chunker
+    _pdf_loader = pdf_loader
+
+
+def load_pdf(path: str, file_hash: Optional[str] = None) -> List[LCDocument]:
+    """Parse un PDF (une entrée par page), via le cache des pages du pipeline s'il y en a un"""
+    loader = _pdf_loader or PDFLoader(directory_path=os.path.dirname(path))
+    return loader.load_pdf(path, file_hash)
+
+
+def clean_and_chunk(pages: List[LCDocument]) -> List[LCDocument]:
+    """Nettoie les pages d'un document source puis les découpe en chunks"""
+    for doc, cleaned in zip(pages, _text_cleaner.clean_many([doc.page_content for doc in pages])):
+        doc.page_content = cleaned
+    return _chunker.chunk_documents(pages)
+
+
+def process_source(task: Tuple[str, str, str, object]) -> Tuple[str, str, List[LCDocument], Dict]:
+    """
+    Traite un document source complet: parsing (PDF), nettoyage et découpage.
+
+    Args:
+        task: (clé, empreinte, 'pdf' ou 'web', chemin du PDF ou pages web)
+
+    Returns:
+        (clé, empreinte, chunks, statistiques: pages, durées de chaque étape et
+        lecture du PDF depuis le cache)
+    """
+    key, document_hash, kind, payload = task
+    start = time.perf_counter()
+    cache = _pdf_loader.cache if _pdf_loader is not None else None
+    cache_hits = cache.hits if cache is not None else 0
+    pages = load_pdf(payload, document_hash) if kind == "pdf" else payload
+    parsed = time.perf_counter()
+    chunks = clean_and_chunk(pages)
+    stats = {
+        'pages': len(pages),
+        'parse_seconds': parsed - start if kind == "pdf" else 0.0,
+        'pdf_cached': cache is not None and cache.hits > cache_hits,
+        'chunk_seconds': time.perf_counter() - parsed
+    }
+    return key, document_hash, chunks, stats
@@ -0,0 +1,212 @@
+"""
+Extracteurs de texte PDF interchangeables (cf. PDFLoader(backend=...)) et benchmark.
+
+Seul pypdf fait partie des dépendances du projet; les autres extracteurs sont utilisés
+s'ils sont installés localement (pip install pdfplumber / pymupdf / pdfminer.six).
+"""
+import os
+import re
+import time
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata as package_metadata
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document as LCDocument
+
+
+def _package_version(package: str) -> str:
+    try:
+        return package_metadata.version(package)
+    except package_metadata.PackageNotFoundError:
+        return "absent"
+
+
+class PDFBackend:
+    """
+    Extracteur PDF: une entrée par page, métadonnées `source`, `total_pages` et `page`
+    (numéro à partir de 0, comme PyPDFLoader).
+    """
+
+    name = ""
+    module = ""     # module importé par l'extracteur
+    packages = ()   # distributions dont la version identifie l'extracteur (cache des pages)
+
+    def is_available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+    def version(self) -> str:
+        return f"{self.name}/" + "/".join(f"{package}-{_package_version(package)}" for package in self.packages)
+
+    def extract(self, path: str) -> List[LCDocument]:
+        raise NotImplementedError
+
+    @staticmethod
+    def _pages(path: str, texts: List[str]) -> List[LCDocument]:
+        return [
+            LCDocument(page_content=text, metadata={'source': path, 'total_pages': len(texts), 'page': i})
+            for i, text in enumerate(texts)
+        ]
+
+
+class PyPDFBackend(PDFBackend):
+    """pypdf via PyPDFLoader (extracteur historique, métadonnées du PDF conservées)"""
+
+    name = "pypdf"
+    module = "pypdf"
+    packages = ("pypdf", "langchain-community")
+
+    def version(self) -> str:
+        # Même identifiant qu'avant l'introduction des backends: le cache existant reste valide
+        return "PyPDFLoader/" + "/".join(f"{package}-{_package_version(package)}" for package in self.packages)
+
+    def extract(self, path: str) -> List[LCDocument]:
+        from langchain_community.document_loaders import PyPDFLoader
+        return PyPDFLoader(path).load()
+
+
+class PyPDFLayoutBackend(PyPDFBackend):
+    """pypdf en mode "layout": positions du texte respectées (colonnes des tableaux alignées)"""
+
+    name = "pypdf-layout"
+
+    def version(self) -> str:
+        return PDFBackend.version(self)
+
+    def extract(self, path: str) -> List[LCDocument]:
+        from langchain_community.document_loaders import PyPDFLoader
+        return PyPDFLoader(path, extraction_mode="layout").load()
+
+
+class PdfPlumberBackend(PDFBackend):
+    name = "pdfplumber"
+    module = "pdfplumber"
+    packages = ("pdfplumber", "pdfminer.six")
+
+    def extract(self, path: str) -> List[LCDocument]:
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            texts = [page.extract_text() or "" for page in pdf.pages]
+        return self._pages(path, texts)
+
+
+class PyMuPDFBackend(PDFBackend):
+    name = "pymupdf"
+    module = "fitz"
+    packages = ("pymupdf",)
+
+    def extract(self, path: str) -> List[LCDocument]:
+        import fitz
+        with fitz.open(path) as pdf:
+            texts = [page.get_text("text", sort=True) for page in pdf]
+        return self._pages(path, texts)
+
+
+class PdfMinerBackend(PDFBackend):
+    name = "pdfminer"
+    module = "pdfminer"
+    packages = ("pdfminer.six",)
+
+    def extract(self, path: str) -> List[LCDocument]:
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer
+        texts = [
+            "".join(element.get_text() for element in page if isinstance(element, LTTextContainer))
+            for page in extract_pages(path)
+        ]
+        return self._pages(path, texts)
+
+
+PDF_BACKENDS = {
+    backend.name: backend
+    for backend in (PyPDFBackend, PyPDFLayoutBackend, PdfPlumberBackend, PyMuPDFBackend, PdfMinerBackend)
+}
+
+
+def get_pdf_backend(name: str) -> PDFBackend:
+    if name not in PDF_BACKENDS:
+        raise ValueError(f"Extracteur PDF inconnu: {name} (disponibles: {', '.join(PDF_BACKENDS)})")
+    return PDF_BACKENDS[name]()
+
+
+# Séparateur de cellules: tabulations ou 2 espaces ou plus
+_CELL_SEPARATOR = re.compile(r"\t+| {2,}")
+
+
+def _is_column_line(line: str) -> bool:
+    """Ligne "en colonnes" (au moins 3 cellules): indice d'un tableau resté aligné"""
+    return len(_CELL_SEPARATOR.split(line.strip())) >= 3
+
+
+def _benchmark_backend(name: str, paths: List[str], output_dir: Optional[str]) -> Dict:
+    """Exécuté dans un processus neuf: le pic de mémoire mesuré est celui de cet extracteur seul"""
+    try:
+        import resource  # Unix uniquement
+    except ImportError:
+        resource = None
+    backend = get_pdf_backend(name)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+    pages, chars, column_lines, errors = 0, 0, 0, []
+    start = time.perf_counter()
+    for path in paths:
+        try:
+            documents = backend.extract(path)
+        except Exception as e:
+            errors.append(f"{os.path.basename(path)}: {e}")
+            continue
+        pages += len(documents)
+        text = "\n".join(doc.page_content for doc in documents)
+        chars += len(text)
+        column_lines += sum(1 for line in text.splitlines() if _is_column_line(line))
+        if output_dir:
+            # Texte extrait, pour vérifier à l'œil la lisibilité des tableaux
+            target = os.path.join(output_dir, name, f"{os.path.splitext(os.path.basename(path))[0]}.txt")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "w", encoding="utf-8") as f:
+                f.write("\n\f".join(doc.page_content for doc in documents))
+    seconds = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+
+    return {
+        "backend": name,
+        "version": backend.version(),
+        "pages": pages,
+        "pages_per_s": round(pages / seconds, 1) if seconds > 0 else 0.0,
+        "chars": chars,
+        "column_lines": column_lines,
+        # Mémoire non mesurée sans le module resource (Windows)
+        "peak_mb": round(peak_kb / 1024, 1) if resource else "-",
+        "extra_mb": round((peak_kb - baseline_kb) / 1024, 1) if resource else "-",
+        "seconds": round(seconds, 2),
+        "errors": errors,
+    }
+
+
+def benchmark_pdf_backends(
+    paths: List[str],
+    backends: Optional[List[str]] = None,
+    output_dir: Optional[str] = None
+) -> List[Dict]:
+    """
+    Compare les extracteurs installés sur une liste de PDFs: pages/s, mémoire, caractères extraits
+    et lignes en colonnes (indicateur de tableaux restés lisibles).
+
+    Args:
+        paths: PDFs à extraire
+        backends: Extracteurs à comparer (défaut: tous ceux qui sont installés)
+        output_dir: Dossier où écrire le texte extrait par chaque extracteur (None = pas d'export)
+
+    Returns:
+        Une ligne de rapport par extracteur
+    """
+    names = backends or [name for name, backend in PDF_BACKENDS.items() if backend().is_available()]
+    report = []
+    for name in names:
+        if not get_pdf_backend(name).is_available():
+            report.append({"backend": name, "errors": [f"non installé ({PDF_BACKENDS[name].module})"]})
+            continue
+        # Un processus par extracteur: mémoire mesurée sans les allocations des précédents
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            report.append(pool.submit(_benchmark_backend, name, paths, output_dir).result())
+    return report
@@ -11,11 +11,15 @@ logger = logging.getLogger(__name__)
 import os
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
 from langchain_core.documents import Document as LCDocument # Renommé pour plus de clarté
 
+from src.rag.document_processing.pdf_backends import get_pdf_backend
+from src.rag.document_processing.pdf_page_cache import PDFPageCache
+from src.rag.generation.index_manifest import hash_file
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,14 +29,19 @@ class PDFLoader:
     et PyPDFLoader. Chaque Document de LangChain représente généralement une page de PDF.
     """
     
-    def __init__(self, directory_path: str = "data/pdf"):
+    def __init__(self, directory_path: str = "data/pdf", cache_dir: Optional[str] = None, backend: str = "pypdf"):
         """
         Initialise le chargeur de PDF.
         Args:
             directory_path: Chemin du répertoire contenant les fichiers PDF.
+            cache_dir: Cache des pages extraites (clé: empreinte du fichier + version de
+                l'extracteur); None pour le désactiver.
+            backend: Extracteur de texte (cf. pdf_backends.PDF_BACKENDS)
         """
         self.directory_path = directory_path
         self.loader = None
+        self.backend = get_pdf_backend(backend)
+        self.cache = PDFPageCache(cache_dir) if cache_dir else None
 
     def load_all_pdfs(self) -> List[LCDocument]:
         """
@@ -48,6 +57,12 @@ class PDFLoader:
             logger.warning(f"Directory not found: {self.directory_path}. Returning empty list.")
             return []
 
+        if self.cache is not None or self.backend.name != "pypdf":
+            docs = [page for path in self.list_pdfs() for page in self.load_pdf(path)]
+            cache_stats = f" (cache: {self.cache.get_stats()})" if self.cache is not None else ""
+            logger.info(f" Total documents (pages) loaded with {self.backend.name}: {len(docs)}{cache_stats}")
+            return docs
+
         logger.info(f"Using DirectoryLoader to find and load PDFs from: {self.directory_path}")
         
         # 1. Créer le DirectoryLoader
@@ -63,4 +78,38 @@ class PDFLoader:
         
         logger.info(f" Total documents (pages) loaded: {len(docs)}")
                     
-        return docs
\ No newline at end of file
+        return docs
+
+    def list_pdfs(self) -> List[str]:
+        """Chemins des PDFs du répertoire (même parcours et même forme de chemin que DirectoryLoader)"""
+        if not os.path.isdir(self.directory_path):
+            logger.warning(f"Directory not found: {self.directory_path}. Returning empty list.")
+            return []
+        return sorted(str(path) for path in Path(self.directory_path).glob("**/*.pdf") if path.is_file())
+
+    @property
+    def extractor_version(self) -> str:
+        """Identifiant de l'extracteur: toute nouvelle version invalide le cache des pages"""
+        return self.backend.version()
+
+    def load_pdf(self, path: str, file_hash: Optional[str] = None) -> List[LCDocument]:
+        """
+        Charge les pages d'un seul PDF (depuis le cache si le fichier n'a pas changé)
+
+        Args:
+            file_hash: Empreinte du fichier si elle est déjà connue (cf. index_manifest.hash_file)
+        """
+        if self.cache is None:
+            return self._extract(path)
+
+        if file_hash is None:
+            file_hash = hash_file(path)
+        extractor = self.extractor_version
+        pages = self.cache.get(file_hash, extractor, path)
+        if pages is None:
+            pages = self._extract(path)
+            self.cache.put(file_hash, extractor, pages)
+        return pages
+
+    def _extract(self, path: str) -> List[LCDocument]:
+        return self.backend.extract(path)
@@ -0,0 +1,74 @@
+import os
+import gzip
+import json
+import hashlib
+import logging
+from typing import List, Optional
+
+from langchain_core.documents import Document as LCDocument
+
+logger = logging.getLogger(__name__)
+
+
+class PDFPageCache:
+    """
+    Cache disque des pages extraites des PDFs, clé = (empreinte du fichier, version de l'extracteur).
+
+    Une entrée par fichier: `<empreinte>.<version>.json.gz`, JSON compressé contenant le
+    texte et les métadonnées de chaque page. Le chemin du fichier (`source`) n'est pas
+    stocké (seule sa place parmi les clés l'est): un PDF déplacé ou renommé est servi
+    depuis le cache sous son nouveau chemin.
+    Changer d'extracteur (ou de version) invalide les entrées sans les écraser.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, file_hash: str, extractor: str) -> str:
+        extractor_key = hashlib.sha1(extractor.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.directory, f"{file_hash}.{extractor_key}.json.gz")
+
+    def get(self, file_hash: str, extractor: str, source: str) -> Optional[List[LCDocument]]:
+        path = self._path(file_hash, extractor)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrée du cache PDF illisible ignorée ({path}): {e}")
+            self.misses += 1
+            return None
+        if entry.get("extractor") != extractor:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        pages = []
+        for text, metadata in entry["pages"]:
+            if 'source' in metadata:
+                metadata['source'] = source
+            pages.append(LCDocument(page_content=text, metadata=metadata))
+        return pages
+
+    def put(self, file_hash: str, extractor: str, pages: List[LCDocument]):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(file_hash, extractor)
+        entry = {
+            "extractor": extractor,
+            "pages": [
+                [page.page_content, {k: (None if k == 'source' else v) for k, v in page.metadata.items()}]
+                for page in pages
+            ]
+        }
+        # Écriture puis renommage: plusieurs processus peuvent remplir le cache en parallèle
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+    def get_stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
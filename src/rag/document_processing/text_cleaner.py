@@ -1,34 +1,96 @@
 import re
+import time
 import logging
+from typing import Dict, List
 
 logger = logging.getLogger(__name__)
 
+# Sauts de ligne excessifs (3+ → 2) et espaces multiples (2+ → 1), en une seule passe:
+# le groupe qui n'a pas participé à la correspondance est remplacé par une chaîne vide
+_WHITESPACE_RUNS = re.compile(r'(\n\n)\n+|( ) +')
+_WHITESPACE_REPLACEMENT = r'\1\2'
+
+# Caractères de contrôle supprimés (hors \t, \n et \r)
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]')
+
+# Remplacements caractère pour caractère: tabulations et tirets
+_REPLACEMENTS = (('\t', ' '), ('–', '-'), ('—', '-'))
+
 
 class TextCleaner:
-    """Nettoie et normalise le texte extrait des PDFs"""
-    
+    """
+    Nettoie et normalise le texte extrait des PDFs.
+
+    Résultat identique à l'enchaînement historique (cf. _reference_clean): les blancs sont
+    réduits *avant* la conversion des tabulations et la suppression des caractères de
+    contrôle, qui ne créent donc pas de nouvelles séquences à réduire. La réduction des
+    blancs (une seule expression) n'est lancée que si le texte contient une séquence à
+    réduire, test de sous-chaîne bien plus rapide qu'un parcours par expression régulière.
+    L'instance ne contient que des objets compilés: elle se transmet telle quelle aux
+    processus de l'indexation parallèle.
+    """
+
+    def __init__(self):
+        self._collapse = _WHITESPACE_RUNS.sub
+        self._remove_controls = _CONTROL_CHARS.sub
+
     def clean(self, text: str) -> str:
         """Nettoie le texte"""
-        
         if not text:
             return ""
-        
-        # Supprimer les sauts de ligne excessifs
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        
-        # Supprimer les espaces multiples
-        text = re.sub(r' {2,}', ' ', text)
-        
-        # Supprimer les tabulations
-        text = text.replace('\t', ' ')
-        
-        # Normaliser les tirets
-        text = text.replace('–', '-').replace('—', '-')
-        
-        # Supprimer les caractères de contrôle
-        text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-        
-        # Strip les espaces en début et fin
-        text = text.strip()
-        
-        return text
\ No newline at end of file
+        if '  ' in text or '\n\n\n' in text:
+            text = self._collapse(_WHITESPACE_REPLACEMENT, text)
+        for old, new in _REPLACEMENTS:
+            text = text.replace(old, new)
+        return self._remove_controls('', text).strip()
+
+    def clean_many(self, texts: List[str]) -> List[str]:
+        """Nettoie un lot de textes (même résultat que clean() sur chacun)"""
+        clean = self.clean
+        return [clean(text) for text in texts]
+
+
+def _reference_clean(text: str) -> str:
+    """Nettoyage historique (une passe par règle), conservé comme référence du benchmark"""
+    if not text:
+        return ""
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = re.sub(r' {2,}', ' ', text)
+    text = text.replace('\t', ' ')
+    text = text.replace('–', '-').replace('—', '-')
+    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
+    return text.strip()
+
+
+def benchmark_text_cleaner(texts: List[str], repeat: int = 5) -> Dict:
+    """
+    Compare le nettoyeur compilé au nettoyage historique sur un corpus.
+
+    Returns:
+        Durées (meilleure de `repeat` exécutions), accélération et nombre de textes
+        dont le résultat diffère (doit être 0)
+    """
+    cleaner = TextCleaner()
+
+    def best_of(function) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    reference_seconds = best_of(lambda: [_reference_clean(text) for text in texts])
+    clean_seconds = best_of(lambda: [cleaner.clean(text) for text in texts])
+    batch_seconds = best_of(lambda: cleaner.clean_many(texts))
+    mismatches = sum(1 for text, cleaned in zip(texts, cleaner.clean_many(texts)) if cleaned != _reference_clean(text))
+
+    return {
+        'texts': len(texts),
+        'chars': sum(len(text) for text in texts),
+        'reference_s': round(reference_seconds, 4),
+        'clean_s': round(clean_seconds, 4),
+        'clean_many_s': round(batch_seconds, 4),
+        'speedup': round(reference_seconds / batch_seconds, 2) if batch_seconds > 0 else None,
+        'mismatches': mismatches
+    }
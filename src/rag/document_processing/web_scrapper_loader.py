@@ -1,6 +1,6 @@
 import json
 from pathlib import Path
-from typing import List
+from typing import Iterator, List
 from langchain_core.documents import Document as LCDocument
 
 class WebScraperLoader:
@@ -120,6 +120,17 @@ class WebScraperLoader:
         print(f" Chargé {len(documents)} pages web depuis {txt_file}")
         return documents
     
+    def iter_scraped_files(self) -> Iterator[List[LCDocument]]:
+        """
+        Charge les fichiers JSON puis TXT un par un (les pages d'un seul fichier
+        sont en mémoire à la fois). Fichiers triés par nom décroissant: les
+        exports horodatés les plus récents d'abord.
+        """
+        for json_file in sorted(self.data_folder.glob('*.json'), reverse=True):
+            yield self.load_json_scraped_data(json_file.name)
+        for txt_file in sorted(self.data_folder.glob('*.txt'), reverse=True):
+            yield self.load_txt_scraped_data(txt_file.name)
+    
     def load_all_scraped_data(self) -> List[LCDocument]:
         """
         Charge TOUS les fichiers JSON et TXT du dossier data/scraping
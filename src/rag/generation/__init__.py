@@ -3,4 +3,4 @@
 Avoid importing submodules at package import time. Import needed submodules explicitly
 where necessary to prevent heavy imports during module discovery.
 """
-__all__ = ["IndexingPipeline", "Retriever", "OllamaLLM", "RAGPipeline"]
+__all__ = ["IndexingPipeline", "Retriever", "OllamaLLM", "RAGPipeline", "BatchReranker"]
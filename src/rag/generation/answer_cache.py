@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou inter-processus (un seul worker par fichier)
+    fcntl = None
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    Cache sémantique des réponses de la pipeline RAG.
+
+    Une question dont l'embedding est à une distance cosinus <= `max_distance`
+    d'une question déjà traitée (avec la même version d'index) reçoit la réponse
+    et les sources mémorisées, sans retrieval ni génération.
+    Éviction par taille (LRU) et par TTL, persistance optionnelle sur disque.
+
+    Persistance hors du chemin des requêtes: store() ne fait que marquer le cache modifié,
+    un thread l'écrit au plus toutes les `save_interval` secondes (et à l'arrêt du
+    processus). Plusieurs workers peuvent partager le fichier: chaque écriture relit le
+    fichier sous verrou (fcntl), fusionne ses entrées avec celles des autres processus puis
+    le remplace; le cache en mémoire adopte le résultat fusionné. Sans fcntl (Windows), un
+    seul processus doit utiliser un fichier donné.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_distance: float = 0.05,
+        max_size: int = 500,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        save_interval: float = 5.0
+    ):
+        """
+        Args:
+            path: Fichier .npz de persistance (None = cache uniquement en mémoire)
+            max_distance: Distance cosinus maximale (1 - similarité) pour réutiliser une réponse
+            max_size: Nombre maximum de réponses conservées
+            ttl_seconds: Durée de vie d'une réponse (None = pas d'expiration)
+            save_interval: Délai maximal (s) entre une insertion et son écriture sur disque
+        """
+        self.path = path
+        self.max_distance = max_distance
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.save_interval = save_interval
+
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        self._entries: List[Dict] = []
+        self._vectors: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+
+        if self.path:
+            self._load()
+            atexit.register(self.flush)
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _is_valid(self, entry: Dict, index_version: str, now: float) -> bool:
+        if entry['index_version'] != index_version:
+            return False
+        return self.ttl_seconds is None or now - entry['created_at'] < self.ttl_seconds
+
+    def lookup(self, vector: np.ndarray, index_version: str) -> Optional[Dict]:
+        """
+        Cherche une réponse pour une question proche.
+
+        Returns:
+            Copie de la réponse mémorisée (avec 'cached_question'), ou None
+        """
+        query = self._unit(vector)
+        now = time.time()
+
+        with self._lock:
+            if self._entries:
+                valid = np.array([self._is_valid(e, index_version, now) for e in self._entries])
+                similarities = np.where(valid, self._vectors @ query, -np.inf)
+                best = int(np.argmax(similarities))
+                if valid[best] and 1.0 - similarities[best] <= self.max_distance:
+                    entry = self._entries[best]
+                    entry['last_used'] = now
+                    self.hits += 1
+                    response = dict(entry['response'])
+                    response['cached_question'] = entry['question']
+                    return response
+            self.misses += 1
+            return None
+
+    def store(self, question: str, vector: np.ndarray, response: Dict, index_version: str):
+        """Mémorise une réponse, puis applique l'éviction (TTL, version d'index, LRU)"""
+        now = time.time()
+        entry = {
+            'question': question,
+            'response': response,
+            'index_version': index_version,
+            'created_at': now,
+            'last_used': now
+        }
+
+        with self._lock:
+            vector = self._unit(vector)[None, :]
+            self._entries.append(entry)
+            self._vectors = vector if self._vectors is None else np.vstack([self._vectors, vector])
+
+            keep = [i for i, e in enumerate(self._entries) if self._is_valid(e, index_version, now)]
+            self._keep(self._lru(keep, self._entries))
+
+            if self.path:
+                self._dirty = True
+                self._schedule_save()
+
+    def _lru(self, keep: List[int], entries: List[Dict]) -> List[int]:
+        """Positions conservées (ordre d'origine), au plus `max_size` les plus récemment utilisées"""
+        if len(keep) > self.max_size:
+            keep.sort(key=lambda i: entries[i]['last_used'])
+            keep = sorted(keep[-self.max_size:])
+        return keep
+
+    def _keep(self, keep: List[int]):
+        self._entries = [self._entries[i] for i in keep]
+        self._vectors = self._vectors[keep] if self._vectors is not None and keep else None
+
+    def _schedule_save(self):
+        """Programme une écriture différée (appelé sous le verrou)"""
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_interval, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Écrit les insertions en attente (fusionnées avec le fichier des autres processus)"""
+        with self._lock:
+            self._save_timer = None
+            if not self.path or not self._dirty:
+                return
+            try:
+                self._save()
+                self._dirty = False
+            except OSError as e:
+                logger.warning(f"Écriture du cache de réponses impossible ({self.path}): {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._vectors = None
+            self._dirty = False
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'max_distance': self.max_distance,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Verrou exclusif inter-processus sur le fichier du cache (aucun sans fcntl)"""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self):
+        """
+        Fusion avec le fichier (entrées des autres processus) puis écriture atomique
+        (fichier temporaire puis remplacement), sous verrou de fichier
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._file_lock():
+            self._merge(*self._read_file())
+            metadata = json.dumps(self._entries, ensure_ascii=False, default=str).encode('utf-8')
+            vectors = self._vectors if self._vectors is not None else np.zeros((0, 0), dtype=np.float32)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, vectors=vectors, metadata=np.frombuffer(metadata, dtype=np.uint8))
+            os.replace(tmp_path, self.path)
+
+    def _merge(self, entries: List[Dict], vectors: Optional[np.ndarray]):
+        """
+        Ajoute les entrées du fichier absentes de la mémoire (même question et même version
+        d'index: la plus récemment utilisée est gardée), puis applique TTL et LRU
+        """
+        if not entries:
+            return
+        position_of = {(e['question'], e['index_version']): i for i, e in enumerate(self._entries)}
+        added = []
+        for i, entry in enumerate(entries):
+            own = position_of.get((entry['question'], entry['index_version']))
+            if own is None:
+                added.append(i)
+            elif entry['last_used'] > self._entries[own]['last_used']:
+                self._entries[own]['last_used'] = entry['last_used']
+        if added:
+            self._entries = self._entries + [entries[i] for i in added]
+            self._vectors = vectors[added] if self._vectors is None else np.vstack([self._vectors, vectors[added]])
+
+        now = time.time()
+        keep = [
+            i for i, e in enumerate(self._entries)
+            if self.ttl_seconds is None or now - e['created_at'] < self.ttl_seconds
+        ]
+        self._keep(self._lru(keep, self._entries))
+
+    def _read_file(self) -> Tuple[List[Dict], Optional[np.ndarray]]:
+        if not os.path.exists(self.path):
+            return [], None
+        try:
+            with np.load(self.path) as data:
+                entries = json.loads(data['metadata'].tobytes().decode('utf-8'))
+                vectors = data['vectors']
+            if len(entries) != len(vectors):
+                raise ValueError("nombre d'entrées et de vecteurs différent")
+            return entries, (vectors if entries else None)
+        except Exception as e:
+            logger.warning(f"Cache de réponses illisible, ignoré ({self.path}): {e}")
+            return [], None
+
+    def _load(self):
+        entries, vectors = self._read_file()
+        if entries:
+            self._entries, self._vectors = entries, vectors
+            logger.info(f"Cache de réponses chargé: {len(entries)} entrées ({self.path})")
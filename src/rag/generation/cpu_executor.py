@@ -0,0 +1,31 @@
+"""
+Exécuteur borné du travail CPU (embeddings, recherche FAISS, reranking) pour le chemin
+asynchrone: la boucle d'événements ne fait qu'attendre, quelques threads calculent.
+"""
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+# Threads de calcul (0 = min(4, nombre de cœurs)): numpy, FAISS et torch libèrent le GIL
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def cpu_executor() -> ThreadPoolExecutor:
+    """Exécuteur partagé du processus (créé au premier usage)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="rag-cpu")
+        return _executor
+
+
+async def run_cpu(func: Callable, *args, **kwargs) -> Any:
+    """Exécute `func` dans l'exécuteur borné; les appels en surnombre attendent leur tour"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor(), functools.partial(func, *args, **kwargs))
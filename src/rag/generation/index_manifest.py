@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from langchain_core.documents import Document as LCDocument
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_FORMAT = 1
+
+# Métadonnées qui changent à chaque scraping sans que le contenu change
+VOLATILE_METADATA = ('scraped_at',)
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    """Empreinte du contenu d'un fichier (sans le parser)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_documents(documents: Iterable[LCDocument]) -> str:
+    """Empreinte d'un document source (texte + métadonnées stables de chacune de ses pages)"""
+    digest = hashlib.sha256()
+    for doc in documents:
+        metadata = {k: v for k, v in doc.metadata.items() if k not in VOLATILE_METADATA}
+        digest.update(json.dumps(metadata, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(doc.page_content.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def hash_chunk(text: str) -> str:
+    """Empreinte d'un chunk: seul le texte détermine son embedding"""
+    return hash_bytes(text.encode('utf-8'))
+
+
+class IndexManifest:
+    """
+    Manifeste de l'index (manifest.json à côté de index.faiss).
+
+    Pour chaque document source (fichier PDF ou URL scrapée): l'empreinte de son
+    contenu et la liste de ses chunks (id du docstore + empreinte du texte).
+    Un chunk écarté comme doublon est noté `duplicate` avec l'id du chunk indexé
+    qu'il rejoint: un chunk reste dans l'index tant qu'un document y fait référence.
+    `config` décrit tout ce qui, s'il change, impose une reconstruction complète
+    (modèle d'embedding, découpage, type d'index).
+    """
+
+    def __init__(self, config: Dict, documents: Optional[Dict[str, Dict]] = None):
+        self.config = config
+        self.documents: Dict[str, Dict] = documents or {}
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["IndexManifest"]:
+        path = os.path.join(directory, MANIFEST_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format_version') != MANIFEST_FORMAT:
+            return None
+        return cls(config=data['config'], documents=data['documents'])
+
+    def save(self, directory: str):
+        """Écriture atomique (le manifeste doit toujours décrire l'index sur disque)"""
+        path = os.path.join(directory, MANIFEST_FILENAME)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'format_version': MANIFEST_FORMAT,
+                'updated_at': datetime.now().isoformat(),
+                'config': self.config,
+                'documents': self.documents
+            }, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+    def document_hash(self, key: str) -> Optional[str]:
+        entry = self.documents.get(key)
+        return entry['hash'] if entry else None
+
+    def chunks_by_hash(self, key: str) -> Dict[str, List[str]]:
+        """Ids des chunks existants d'un document (hors doublons), groupés par empreinte de texte"""
+        by_hash: Dict[str, List[str]] = {}
+        for chunk in self.documents.get(key, {}).get('chunks', []):
+            if not chunk.get('duplicate'):
+                by_hash.setdefault(chunk['hash'], []).append(chunk['id'])
+        return by_hash
+
+    def owned_ids(self, key: str) -> List[str]:
+        """Ids des chunks indexés pour ce document (hors doublons)"""
+        entry = self.documents.get(key)
+        return [chunk['id'] for chunk in entry['chunks'] if not chunk.get('duplicate')] if entry else []
+
+    def live_ids(self) -> Set[str]:
+        """Ids de tous les chunks auxquels un document fait référence"""
+        return {chunk['id'] for entry in self.documents.values() for chunk in entry['chunks']}
+
+    def set_document(self, key: str, document_hash: str, chunks: List[LCDocument], duplicates: Iterable[LCDocument] = ()):
+        """
+        Args:
+            chunks: Chunks indexés du document (avec leur id)
+            duplicates: Chunks écartés, avec l'id du chunk indexé qu'ils dupliquent
+        """
+        entries = [{'id': chunk.id, 'hash': hash_chunk(chunk.page_content)} for chunk in chunks]
+        entries += [{'id': chunk.id, 'hash': hash_chunk(chunk.page_content), 'duplicate': True} for chunk in duplicates]
+        self.documents[key] = {'hash': document_hash, 'chunks': entries}
+
+    def remove_document(self, key: str):
+        self.documents.pop(key, None)
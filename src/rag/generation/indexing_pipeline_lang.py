@@ -1,74 +1,387 @@
 from src.rag.document_processing.pdf_loader_lang import PDFLoader
 from src.rag.document_processing.chunker_lang import OptimalChunker
 from src.rag.document_processing.text_cleaner import TextCleaner
+from src.rag.document_processing.deduplicator import ChunkDeduplicator
 
-from src.rag.vectorstore.vector_store_lang import VectorStoreManager # Votre nouvelle classe FAISS
+from src.rag.vectorstore.vector_store_lang import VectorStoreManager, EMBEDDING_MODEL_NAME # Votre nouvelle classe FAISS
 from src.rag.document_processing.web_scrapper_loader import WebScraperLoader
+from src.rag.document_processing import parallel_workers
+from src.rag.generation.index_manifest import IndexManifest, hash_chunk, hash_documents, hash_file
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import multiprocessing
+import os
+import time
+import uuid
+
+from langchain_core.documents import Document as LCDocument
 
 class IndexingPipeline:
-    def __init__(self, pdf_directory: str, web_data_directory: str = "data/scraping"):
+    def __init__(
+        self,
+        pdf_directory: str,
+        web_data_directory: str = "data/scraping",
+        index_type: str = "flat",
+        index_params: Optional[Dict] = None,
+        workers: int = 1,
+        embedding_batch_size: int = 256,
+        embedding_cache_dir: Optional[str] = "data/cache/embeddings",
+        dedup_threshold: Optional[float] = 0.85,
+        token_chunking: bool = False,
+        context_tokens: Optional[int] = None,
+        pdf_cache_dir: Optional[str] = "data/cache/pdf_pages",
+        pdf_backend: str = "pypdf"
+    ):
+        """
+        Args:
+            workers: Nombre de processus pour le parsing PDF et le nettoyage/découpage
+                (1 = tout dans le processus courant, 0 = un par cœur)
+            embedding_batch_size: Nombre de chunks envoyés au modèle d'embedding par lot
+                (c'est aussi la taille des lots du pipeline en flux)
+            embedding_cache_dir: Cache disque des embeddings (modèle, empreinte du texte);
+                None pour le désactiver
+            dedup_threshold: Similarité de Jaccard (MinHash) à partir de laquelle un chunk
+                est écarté comme quasi-doublon; None désactive la déduplication
+            token_chunking: Découper avec le tokenizer du modèle d'embedding, en chunks qui
+                tiennent dans sa longueur maximale de séquence
+            context_tokens: En mode tokenizer, taille des spans de contexte envoyés au LLM
+                (les chunks embeddés en sont des sous-parties); None = pas de span séparé
+            pdf_cache_dir: Cache des pages extraites des PDFs (empreinte du fichier + version
+                de l'extracteur); None pour le désactiver
+            pdf_backend: Extracteur de texte PDF (cf. pdf_backends.PDF_BACKENDS)
+        """
         self.pdf_directory = pdf_directory
         self.web_data_directory = web_data_directory
-        self.pdf_loader = PDFLoader(directory_path=pdf_directory)
+        self.index_type = index_type
+        self.index_params = index_params
+        self.pdf_loader = PDFLoader(directory_path=pdf_directory, cache_dir=pdf_cache_dir, backend=pdf_backend)
         self.web_loader = WebScraperLoader(data_folder=web_data_directory)
         self.text_cleaner = TextCleaner()
-        self.chunker = OptimalChunker()
-        self.vector_store = VectorStoreManager()
-        
-    def run_indexing(self):
-        """Traite tous les PDFs et données web, puis les indexe"""
-        
-        all_documents_lc = []
-        
-        # 1. CHARGEMENT DES PDFs
-        print(f"\n> Phase 1a: Chargement et nettoyage des PDFs dans {self.pdf_directory}...")
-        
-        pdf_documents_lc = self.pdf_loader.load_all_pdfs()
-        
-        # Nettoyage des PDFs
-        for doc in pdf_documents_lc:
-            doc.page_content = self.text_cleaner.clean(doc.page_content)
-        
-        print(f"   - {len(pdf_documents_lc)} pages PDF chargées et nettoyées")
-        all_documents_lc.extend(pdf_documents_lc)
-        
-        # 2. CHARGEMENT DES DONNÉES WEB SCRAPÉES 
-        print(f"\n> Phase 1b: Chargement des données web scrapées dans {self.web_data_directory}...")
-        
-        web_documents_lc = self.web_loader.load_all_scraped_data()
-        
-        # Nettoyage des données web
-        for doc in web_documents_lc:
-            doc.page_content = self.text_cleaner.clean(doc.page_content)
-        
-        print(f"   - {len(web_documents_lc)} pages web chargées et nettoyées")
-        all_documents_lc.extend(web_documents_lc)
-        
-        # RÉSUMÉ DU CHARGEMENT
-        print(f"\n> Total documents chargés: {len(all_documents_lc)}")
-        print(f"   - PDFs: {len(pdf_documents_lc)}")
-        print(f"   - Web: {len(web_documents_lc)}")
-        
-        # 3. CHUNKING
-        print("\n> Phase 2: Découpage en chunks...")
-        all_chunks_lc = self.chunker.chunk_documents(all_documents_lc)
-        print(f"   - {len(all_chunks_lc)} chunks créés au total")
-        
-        # STATISTIQUES PAR TYPE
-        pdf_chunks = [c for c in all_chunks_lc if c.metadata.get('type') != 'web_scraped']
-        web_chunks = [c for c in all_chunks_lc if c.metadata.get('type') == 'web_scraped']
-        print(f"   - Chunks PDF: {len(pdf_chunks)}")
-        print(f"   - Chunks Web: {len(web_chunks)}")
-        
-        # 4. INDEXATION FAISS
-        print("\n> Phase 3: Indexation dans FAISS...")
-        
-        self.vector_store.create_and_save_index(all_chunks_lc)
-        
-        if self.vector_store.vectorstore:
-            print(f"\nIndexation terminée. Index FAISS sauvegardé localement.")
-            print(f"  Total chunks indexés: {len(all_chunks_lc)}")
+        self.embedding_batch_size = embedding_batch_size
+        self.vector_store = VectorStoreManager(
+            embedding_batch_size=embedding_batch_size,
+            embedding_cache_dir=embedding_cache_dir
+        )
+        if token_chunking:
+            self.chunker = OptimalChunker(
+                tokenizer_name=self.vector_store.embedding_model_name,
+                max_tokens=self.vector_store.max_seq_length,
+                context_size=context_tokens
+            )
+        else:
+            self.chunker = OptimalChunker()
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.dedup_threshold = dedup_threshold
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.phase_stats: Dict[str, Dict] = {}
+        self.max_buffered_chunks = 0
+
+    def _imap(self, function: Callable, items: Iterable) -> Iterator:
+        """
+        map() paresseux, dans l'ordre, sur le pool de processus (ou dans le processus
+        courant si workers == 1). Au plus 2 tâches par processus sont en attente:
+        les sources ne sont lues qu'au rythme où les résultats sont consommés.
+        """
+        if self._pool is None:
+            yield from map(function, items)
+            return
+
+        pending = deque()
+        for item in items:
+            pending.append(self._pool.submit(function, item))
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def _add_phase(self, name: str, count: int, unit: str, seconds: float):
+        """Cumule le volume et la durée d'une phase (appelée à chaque lot)"""
+        stats = self.phase_stats.setdefault(name, {'phase': name, 'count': 0, 'unit': unit, 'seconds': 0.0})
+        stats['count'] += count
+        stats['seconds'] += seconds
+
+    def _print_phase_report(self):
+        print("\n> Débit par phase:")
+        for stats in self.phase_stats.values():
+            seconds = stats['seconds']
+            rate = f"{stats['count'] / seconds:.1f} {stats['unit']}/s" if seconds > 0 else "-"
+            print(f"   - {stats['phase']:<22} {stats['count']:>7} {stats['unit']:<7} {seconds:>8.2f}s  {rate}")
+        if self._pool is not None or self.workers > 1:
+            print("     (parsing et découpage: temps cumulé des processus)")
+
+        try:
+            import resource  # Unix uniquement
+        except ImportError:
+            return
+        # Pic de mémoire résidente (ru_maxrss est en Ko sous Linux)
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"\n> Mémoire: pic {peak_mb:.0f} Mo (processus principal), "
+              f"au plus {self.max_buffered_chunks} chunks en attente d'embedding")
+        if self.workers > 1:
+            workers_peak_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+            print(f"   - Pic d'un processus de travail: {workers_peak_mb:.0f} Mo")
+
+    def _config(self) -> Dict:
+        """Paramètres dont tout changement impose une reconstruction complète"""
+        return {
+            'embedding_model': EMBEDDING_MODEL_NAME,
+            **self.chunker.config(),
+            'index_type': self.index_type,
+            'index_params': self.index_params or {},
+            'dedup': self._new_deduplicator().config() if self.dedup_threshold is not None else None
+        }
+
+    def _new_deduplicator(self) -> ChunkDeduplicator:
+        return ChunkDeduplicator(threshold=self.dedup_threshold)
+
+    def _load_deduplicator(self, incremental: bool) -> Optional[ChunkDeduplicator]:
+        """Déduplicateur, initialisé avec les chunks de l'index existant en mode incrémental"""
+        if self.dedup_threshold is None:
+            return None
+        deduplicator = self._new_deduplicator()
+        if incremental:
+            phase_start = time.perf_counter()
+            docstore = self.vector_store.vectorstore.docstore
+            doc_ids = self.vector_store._ordered_doc_ids()
+            for doc_id in doc_ids:
+                deduplicator.add(doc_id, docstore.search(doc_id).page_content)
+            self._add_phase("Déduplication", len(doc_ids), "chunks", time.perf_counter() - phase_start)
+        return deduplicator
+
+    def _load_manifest(self, full: bool) -> Optional[IndexManifest]:
+        """Manifeste de l'index existant, ou None si une reconstruction complète est nécessaire"""
+        if full:
+            return None
+        manifest = IndexManifest.load(self.vector_store.index_directory)
+        if manifest is None:
+            print("   - Pas de manifeste: reconstruction complète")
+            return None
+        if manifest.config != self._config():
+            print("   - Configuration modifiée (modèle, découpage ou type d'index): reconstruction complète")
+            return None
+        if self.index_type == "ivf_pq":
+            print("   - Index ivf_pq: reconstruction complète")
+            return None
+        if not self.vector_store.load_index():
+            print("   - Index existant illisible: reconstruction complète")
+            return None
+        return manifest
+
+    def _iter_sources(self, manifest: IndexManifest, current_keys: Set[str]) -> Iterator[Tuple[str, str, str, object]]:
+        """
+        Parcourt les documents sources et produit, à la demande, une tâche par document
+        nouveau ou modifié: (clé, empreinte, 'pdf' ou 'web', chemin du PDF ou pages web).
+        `current_keys` reçoit les clés de tous les documents présents.
+        """
+        # 1. PDFs: l'empreinte du fichier suffit, le parsing se fait dans la tâche
+        for path in self.pdf_loader.list_pdfs():
+            key = f"pdf:{path}"
+            current_keys.add(key)
+            file_hash = hash_file(path)
+            if manifest.document_hash(key) != file_hash:
+                yield key, file_hash, "pdf", path
+
+        # 2. DONNÉES WEB SCRAPÉES: un fichier à la fois, une entrée par URL
+        for documents in self.web_loader.iter_scraped_files():
+            pages_by_url: Dict[str, List[LCDocument]] = {}
+            for doc in documents:
+                pages_by_url.setdefault(f"web:{doc.metadata.get('source', 'unknown')}", []).append(doc)
+
+            for key, pages in pages_by_url.items():
+                if key in current_keys:
+                    # URL déjà vue dans un export plus récent
+                    continue
+                current_keys.add(key)
+                page_hash = hash_documents(pages)
+                if manifest.document_hash(key) != page_hash:
+                    yield key, page_hash, "web", pages
+
+    def run_indexing(self, full: bool = False):
+        """
+        Indexe les PDFs et données web, en flux et par lots de taille fixe.
+
+        Incrémental par défaut: grâce au manifeste (empreintes des documents sources et
+        des chunks), seuls les documents nouveaux ou modifiés sont parsés, découpés et
+        embeddés, et les chunks des documents supprimés sont retirés de l'index.
+
+        Chaque document traverse parsing → nettoyage → découpage → embedding sans
+        que le corpus soit chargé en entier: au plus `embedding_batch_size` chunks
+        attendent l'embedding, et les textes sont écrits directement sur disque.
+
+        Args:
+            full: Forcer la reconstruction complète de l'index
+        """
+        start = time.perf_counter()
+        self.phase_stats = {}
+        self.max_buffered_chunks = 0
+        parallel_workers.init_worker(self.text_cleaner, self.chunker, self.pdf_loader)
+        if self.workers > 1:
+            print(f"   - Mode parallèle: {self.workers} processus")
+            # 'spawn': les processus n'héritent pas de l'état du modèle d'embedding déjà chargé
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=parallel_workers.init_worker,
+                initargs=(self.text_cleaner, self.chunker, self.pdf_loader)
+            )
+        try:
+            self._run_indexing(full, start)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _embed_batch(self, writer, chunks: List[LCDocument]):
+        """Embedding d'un lot de chunks et écriture dans le nouvel index"""
+        self.max_buffered_chunks = max(self.max_buffered_chunks, len(chunks))
+        documents = self.vector_store.with_ids(chunks)
+        vectors = self.vector_store.embed_documents([doc.page_content for doc in documents])
+        writer.add(documents, vectors)
+
+        embedding = self.vector_store.last_embedding_stats
+        self._add_phase("Embedding", embedding['chunks'], "chunks", embedding['seconds'])
+        self.embedding_totals['cached'] += embedding['cached']
+        self.embedding_totals['embedded'] += embedding['embedded']
+
+    def _run_indexing(self, full: bool, start: float):
+        manifest = self._load_manifest(full)
+        incremental = manifest is not None
+        if not incremental:
+            manifest = IndexManifest(config=self._config())
+
+        # 1-3. CHARGEMENT, NETTOYAGE, CHUNKING ET EMBEDDING EN FLUX
+        print(f"\n> Phases 1-3: Chargement, nettoyage, découpage et embedding par lots de {self.embedding_batch_size}...")
+        print(f"   - PDFs: {self.pdf_directory}")
+        print(f"   - Web: {self.web_data_directory}")
+        writer = self.vector_store.index_writer(self.index_type, self.index_params)
+        self.embedding_totals = {'cached': 0, 'embedded': 0}
+
+        current_keys: Set[str] = set()
+        n_changed = 0
+        chunk_counts = {'pdf': 0, 'web': 0}
+        buffer: List[LCDocument] = []
+        metadata_updates: Dict[str, Dict] = {}
+        deduplicator = None
+
+        try:
+            tasks = self._iter_sources(manifest, current_keys)
+            for key, document_hash, chunks, stats in self._imap(parallel_workers.process_source, tasks):
+                n_changed += 1
+                if stats['pdf_cached']:
+                    self._add_phase("PDF (cache)", stats['pages'], "pages", stats['parse_seconds'])
+                elif stats['parse_seconds']:
+                    self._add_phase("Parsing PDF", stats['pages'], "pages", stats['parse_seconds'])
+                self._add_phase("Nettoyage + découpage", len(chunks), "chunks", stats['chunk_seconds'])
+
+                if deduplicator is None:
+                    deduplicator = self._load_deduplicator(incremental)
+
+                # Un chunk dont le texte existe déjà dans ce document garde son id et son vecteur;
+                # les anciens chunks non réutilisés ne servent pas de référence aux doublons
+                previous = manifest.chunks_by_hash(key)
+                stale = set(manifest.owned_ids(key))
+                indexed, duplicates = [], []
+                phase_start = time.perf_counter()
+                for chunk in chunks:
+                    reusable = previous.get(hash_chunk(chunk.page_content))
+                    if reusable:
+                        chunk.id = reusable.pop(0)
+                        stale.discard(chunk.id)
+                        metadata_updates[chunk.id] = chunk.metadata
+                        indexed.append(chunk)
+                        continue
+
+                    chunk.id = str(uuid.uuid4())
+                    if deduplicator is not None:
+                        canonical_id, _ = deduplicator.check(chunk.id, chunk.page_content, exclude=stale)
+                        if canonical_id is not None:
+                            chunk.id = canonical_id
+                            duplicates.append(chunk)
+                            continue
+                    indexed.append(chunk)
+                    buffer.append(chunk)
+                    chunk_counts[key.split(":", 1)[0]] += 1
+                if deduplicator is not None:
+                    for doc_id in stale:
+                        deduplicator.remove(doc_id)
+                    self._add_phase("Déduplication", len(chunks), "chunks", time.perf_counter() - phase_start)
+                manifest.set_document(key, document_hash, indexed, duplicates)
+
+                if len(buffer) >= self.embedding_batch_size:
+                    self._embed_batch(writer, buffer[:self.embedding_batch_size])
+                    buffer = buffer[self.embedding_batch_size:]
+            if buffer:
+                self._embed_batch(writer, buffer)
+                buffer = []
+
+            removed = [key for key in manifest.documents if key not in current_keys]
+            for key in removed:
+                manifest.remove_document(key)
+
+            # Un chunk est supprimé quand plus aucun document n'y fait référence
+            live_ids = manifest.live_ids()
+            old_ids = self.vector_store._ordered_doc_ids() if incremental else []
+            kept_ids = [doc_id for doc_id in old_ids if doc_id in live_ids]
+            n_deleted = len(old_ids) - len(kept_ids)
+
+            # RÉSUMÉ
+            print(f"\n> Documents sources: {len(current_keys)}")
+            print(f"   - Nouveaux ou modifiés: {n_changed}")
+            print(f"   - Supprimés: {len(removed)}")
+            print(f"   - {chunk_counts['pdf'] + chunk_counts['web']} chunks embeddés")
+            print(f"      - Chunks PDF: {chunk_counts['pdf']}")
+            print(f"      - Chunks Web: {chunk_counts['web']}")
+            if self.embedding_totals['cached']:
+                print(f"      - {self.embedding_totals['cached']} embeddings lus dans le cache, "
+                      f"{self.embedding_totals['embedded']} calculés")
+            if deduplicator is not None:
+                dropped = deduplicator.dropped
+                print(f"   - {dropped['exact'] + dropped['near']} chunks dupliqués écartés "
+                      f"({dropped['exact']} exacts, {dropped['near']} quasi-doublons)")
+            print(f"   - {len(metadata_updates)} chunks inchangés réutilisés")
+            print(f"   - {n_deleted} chunks à supprimer")
+
+            # 4. INDEXATION FAISS
+            print(f"\n> Phase 4: Indexation dans FAISS ({self.index_type}{', incrémentale' if incremental else ''})...")
+            if incremental:
+                if not len(writer) and not n_deleted and not metadata_updates:
+                    writer.abort()
+                    print(f"\nIndex déjà à jour ({time.perf_counter() - start:.1f}s).")
+                    self._print_phase_report()
+                    return
+                n_added = len(writer)
+                writer.add_existing(kept_ids, metadata_updates)
+                print(f"   - {n_added} ajoutés, {n_deleted} supprimés, {len(kept_ids)} conservés")
+
+            phase_start = time.perf_counter()
+            n_chunks = len(writer)
+            writer.commit()
+            self._add_phase("Index FAISS", n_chunks, "chunks", time.perf_counter() - phase_start)
+
+            # 5. INDEX LEXICAL (tokens précalculés pour le reranking)
+            print("\n> Phase 5: Construction de l'index lexical...")
+            phase_start = time.perf_counter()
+            lexical_index = self.vector_store.build_lexical_index()
+            self._add_phase("Index lexical", len(lexical_index), "chunks", time.perf_counter() - phase_start)
+            print(f"   - {len(lexical_index)} chunks, {len(lexical_index.vocab)} tokens distincts")
+
+            # Le manifeste n'est écrit qu'une fois l'index sauvegardé
+            manifest.save(self.vector_store.index_directory)
+            # Publication: les processus qui servent l'index basculent sur cette version
+            version = self.vector_store.publish()
+            if version is None:
+                writer.abort()
+        except BaseException:
+            # Version en construction supprimée (jamais une version déjà publiée)
+            writer.abort()
+            raise
+
+        if version is not None:
+            print(f"   - Version publiée: {version}")
+            self._print_phase_report()
+            print(f"\nIndexation terminée en {time.perf_counter() - start:.1f}s. Index FAISS sauvegardé localement.")
+            print(f"  Total chunks indexés: {self.vector_store.vectorstore.index.ntotal}")
         else:
             print("\n Indexation échouée.")
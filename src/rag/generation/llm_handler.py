@@ -1,10 +1,15 @@
-import requests
 import json
 import os
+import time
+from typing import AsyncIterator, Iterator, Optional, Union
+
+import httpx
+
+from src.rag.generation.ollama_client import OLLAMA_NUM_CTX, get_ollama_pool, keep_alive_for
 
 class OllamaLLM:
     """
-    Interface pour communiquer avec Ollama
+    Interface pour communiquer avec Ollama (connexions keep-alive partagées, cf. OllamaPool)
     """
     
     def __init__(
@@ -12,7 +17,9 @@ class OllamaLLM:
         model: str = "gemma2:2b",
         base_url = os.getenv("OLLAMA_BASE_URL", "http://host.docker.internal:11434"),
         temperature: float = 0.3,
-        max_tokens: int = 1000
+        max_tokens: int = 1000,
+        num_ctx: int = OLLAMA_NUM_CTX,
+        keep_alive: Optional[Union[int, str]] = None
     ):
         """
         Args:
@@ -20,11 +27,19 @@ class OllamaLLM:
             base_url: URL de l'API Ollama
             temperature: Créativité (0-1, bas = factuel)
             max_tokens: Longueur max de la réponse
+            num_ctx: Taille du contexte (identique pour tous les agents du même modèle)
+            keep_alive: Maintien du modèle en mémoire (None = politique de l'agent RAG)
         """
         self.model = model
         self.base_url = base_url
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive if keep_alive is not None else keep_alive_for("rag")
+        self.pool = get_ollama_pool(base_url)
+        self.client = self.pool.client
+        self.last_latency = None
+        self.last_first_token_latency = None
         
         # Vérifier qu'Ollama est running
         self._check_ollama_status()
@@ -32,7 +47,7 @@ class OllamaLLM:
     def _check_ollama_status(self):
         """Vérifie qu'Ollama est accessible"""
         try:
-            response = requests.get(f"{self.base_url}/api/tags")
+            response = self.client.get("/api/tags")
             if response.status_code == 200:
                 available_models = [m['name'] for m in response.json().get('models', [])]
                 print(f"   Ollama connecté. Modèles disponibles: {available_models}")
@@ -42,9 +57,73 @@ class OllamaLLM:
                     print(f"   ollama pull {self.model}")
             else:
                 print("   Ollama non accessible")
-        except requests.exceptions.ConnectionError:
+        except httpx.TransportError:
             print("   Ollama non démarré. Lancez: ollama serve")
     
+    def _payload(self, prompt: str, stream: bool, max_tokens: Optional[int] = None) -> dict:
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {
+                "temperature": self.temperature,
+                "num_predict": self.max_tokens if max_tokens is None else max_tokens,
+                "num_ctx": self.num_ctx
+            }
+        }
+    
+    def warm_up(self, prompt: str = "") -> Optional[float]:
+        """
+        Charge le modèle et précalcule le cache KV de `prompt` (préfixe commun des prompts):
+        les premières requêtes ne paient ni le chargement ni le prefill de ce préfixe.
+        Mêmes options que les requêtes (un num_ctx différent rechargerait le modèle).
+        
+        Returns:
+            Durée de l'appel en secondes, ou None si Ollama n'a pas répondu
+        """
+        start = time.perf_counter()
+        try:
+            response = self.client.post("/api/generate", json=self._payload(prompt, False, max_tokens=1))
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"   Préchauffage Ollama impossible: {e}")
+            return None
+        elapsed = time.perf_counter() - start
+        print(f"   Modèle {self.model} préchauffé en {elapsed:.2f}s (keep_alive={self.keep_alive})")
+        return elapsed
+    
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        """
+        Génère une réponse token par token (chaque fragment dès qu'Ollama le produit)
+        Args:
+            prompt: Prompt complet avec contexte
+        Yields:
+            Fragments de la réponse
+        Raises:
+            httpx.HTTPError, RuntimeError: Ollama injoignable ou en erreur
+        """
+        start = time.perf_counter()
+        self.last_first_token_latency = None
+        try:
+            with self.client.stream("POST", "/api/generate", json=self._payload(prompt, True)) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    json_response = json.loads(line)
+                    if json_response.get('error'):
+                        raise RuntimeError(json_response['error'])
+                    chunk = json_response.get('response', '')
+                    if chunk:
+                        if self.last_first_token_latency is None:
+                            self.last_first_token_latency = time.perf_counter() - start
+                        yield chunk
+                    if json_response.get('done'):
+                        break
+        finally:
+            self.last_latency = time.perf_counter() - start
+    
     def generate(self, prompt: str, stream: bool = False) -> str:
         """
         Génère une réponse avec Ollama
@@ -54,37 +133,65 @@ class OllamaLLM:
         Returns:
             Réponse générée
         """
-        url = f"{self.base_url}/api/generate"
-        
-        payload = {
-            "model": self.model,
-            "prompt": prompt,
-            "stream": stream,
-            "options": {
-                "temperature": self.temperature,
-                "num_predict": self.max_tokens
-            }
-        }
-        
+        start = time.perf_counter()
         try:
-            response = requests.post(url, json=payload, stream=stream)
-            print(f"   Statut Ollama: {response.status_code}")
             if stream:
-                # Mode streaming
+                # Mode streaming (affichage au fil de l'eau)
                 full_response = ""
-                for line in response.iter_lines():
-                    if line:
-                        json_response = json.loads(line)
-                        chunk = json_response.get('response', '')
-                        full_response += chunk
-                        print(chunk, end='', flush=True)
+                for chunk in self.generate_stream(prompt):
+                    full_response += chunk
+                    print(chunk, end='', flush=True)
                 print()
                 return full_response
             else:
                 # Mode non-streaming
+                response = self.client.post("/api/generate", json=self._payload(prompt, False))
+                print(f"   Statut Ollama: {response.status_code}")
                 result = response.json()
                 return result.get('response', '')
                 
         except Exception as e:
             print(f" Erreur Ollama: {e}")
-            return f"Erreur: {str(e)}"
\ No newline at end of file
+            return f"Erreur: {str(e)}"
+        finally:
+            self.last_latency = time.perf_counter() - start
+    
+    async def agenerate_stream(self, prompt: str) -> AsyncIterator[str]:
+        """Version asynchrone de generate_stream (aucun thread bloqué pendant la génération)"""
+        start = time.perf_counter()
+        self.last_first_token_latency = None
+        try:
+            async with self.pool.async_client.stream("POST", "/api/generate", json=self._payload(prompt, True)) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    json_response = json.loads(line)
+                    if json_response.get('error'):
+                        raise RuntimeError(json_response['error'])
+                    chunk = json_response.get('response', '')
+                    if chunk:
+                        if self.last_first_token_latency is None:
+                            self.last_first_token_latency = time.perf_counter() - start
+                        yield chunk
+                    if json_response.get('done'):
+                        break
+        finally:
+            self.last_latency = time.perf_counter() - start
+    
+    async def agenerate(self, prompt: str) -> str:
+        """Version asynchrone de generate (sans streaming)"""
+        start = time.perf_counter()
+        try:
+            response = await self.pool.async_client.post("/api/generate", json=self._payload(prompt, False))
+            print(f"   Statut Ollama: {response.status_code}")
+            return response.json().get('response', '')
+        except Exception as e:
+            print(f" Erreur Ollama: {e}")
+            return f"Erreur: {str(e)}"
+        finally:
+            self.last_latency = time.perf_counter() - start
+    
+    def get_stats(self) -> dict:
+        """Appels, erreurs et latences du pool de connexions vers Ollama"""
+        return self.pool.get_stats()
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+Client HTTP partagé vers Ollama: un pool de connexions keep-alive par serveur, utilisé par
+OllamaLLM (agent RAG) et par les ChatOllama des agents (cf. pooled_chat_ollama).
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, Optional, Union
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Paramètres par défaut (surchargés par variables d'environnement)
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "10"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+# Lecture: délai maximal entre deux blocs reçus. Une réponse complète (sans streaming)
+# prend plusieurs minutes sur CPU (cf. evaluation_results.csv): 10 min la couvrent, et un
+# Ollama bloqué ne retient jamais un worker indéfiniment. En streaming, le délai s'applique
+# à chaque token: les générations lentes passent par query_stream
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "600"))
+# Écriture: envoi du prompt (quelques Ko sur une connexion locale)
+OLLAMA_WRITE_TIMEOUT = float(os.getenv("OLLAMA_WRITE_TIMEOUT", "30"))
+# Attente d'une connexion libre du pool quand `pool_size` appels sont déjà en cours
+OLLAMA_POOL_TIMEOUT = float(os.getenv("OLLAMA_POOL_TIMEOUT", "600")) or None
+OLLAMA_RETRIES = int(os.getenv("OLLAMA_RETRIES", "2"))
+OLLAMA_RETRY_BACKOFF = float(os.getenv("OLLAMA_RETRY_BACKOFF", "0.25"))
+
+# Taille de contexte commune à tous les appels du modèle: Ollama recharge le modèle quand
+# num_ctx change d'une requête à l'autre (plusieurs secondes, cache KV perdu)
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))
+
+# Durée de maintien en mémoire du modèle après un appel, par agent (OLLAMA_KEEP_ALIVE_<AGENT>
+# pour surcharger, OLLAMA_KEEP_ALIVE pour tous): durée Ollama ("30m", "2h") ou secondes, -1 = toujours
+KEEP_ALIVE_POLICIES = {
+    "routing": "2h",      # chaque message passe par le routage
+    "rag": "2h",          # chemin principal, prompt long: rechargement et prefill coûteux
+    "interaction": "30m",
+    "formulaire": "30m",
+}
+
+# Erreurs réessayées: la requête n'a pas atteint Ollama (aucune génération en double)
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+_LATENCY_WINDOW = 1000
+
+
+class _RetryTransport(httpx.BaseTransport):
+    """Transport httpx: réessais avec jitter sur erreur de connexion, latence de chaque appel"""
+
+    def __init__(self, pool: "OllamaPool", transport: httpx.BaseTransport):
+        self.pool = pool
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = request.url.path
+        for attempt in range(self.pool.retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.transport.handle_request(request)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.pool.retries:
+                    self.pool.record(endpoint, time.perf_counter() - start, error=True)
+                    raise
+                delay = self.pool.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"Ollama injoignable ({type(e).__name__}), nouvel essai dans {delay:.2f}s")
+                self.pool.record_retry()
+                time.sleep(delay)
+                continue
+            # Latence jusqu'aux en-têtes: durée de la génération hors streaming
+            self.pool.record(endpoint, time.perf_counter() - start, error=response.status_code >= 500)
+            return response
+
+    def close(self):
+        self.transport.close()
+
+
+class _AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """Équivalent asynchrone de _RetryTransport (attente entre essais sans bloquer la boucle)"""
+
+    def __init__(self, pool: "OllamaPool", transport: httpx.AsyncBaseTransport):
+        self.pool = pool
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = request.url.path
+        for attempt in range(self.pool.retries + 1):
+            start = time.perf_counter()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.pool.retries:
+                    self.pool.record(endpoint, time.perf_counter() - start, error=True)
+                    raise
+                delay = self.pool.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"Ollama injoignable ({type(e).__name__}), nouvel essai dans {delay:.2f}s")
+                self.pool.record_retry()
+                await asyncio.sleep(delay)
+                continue
+            self.pool.record(endpoint, time.perf_counter() - start, error=response.status_code >= 500)
+            return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class OllamaPool:
+    """
+    Connexions keep-alive vers un serveur Ollama, partagées par tous les clients du processus.
+
+    - `client`: client httpx (base_url = serveur Ollama) utilisé par OllamaLLM
+    - `transport`: même pool, à passer aux clients `ollama` des ChatOllama
+    - `async_client` / `async_transport`: équivalents asynchrones (chemin ASGI), pool
+      distinct créé au premier usage, lié à la boucle d'événements du serveur
+
+    Les délais séparent connexion (serveur arrêté: échec rapide), lecture (génération
+    longue, 10 min par défaut), écriture (envoi du prompt) et attente d'une connexion libre; seules les erreurs de
+    connexion sont réessayées, avec un délai exponentiel aléatoire (jitter) pour ne pas
+    relancer tous les workers en même temps. Au-delà de `pool_size` appels simultanés, les
+    suivants attendent une connexion libre (au plus `pool_timeout`): Ollama ne traite de
+    toute façon que quelques générations à la fois.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int = OLLAMA_POOL_SIZE,
+        connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+        read_timeout: float = OLLAMA_READ_TIMEOUT,
+        write_timeout: float = OLLAMA_WRITE_TIMEOUT,
+        pool_timeout: Optional[float] = OLLAMA_POOL_TIMEOUT,
+        retries: int = OLLAMA_RETRIES,
+        backoff: float = OLLAMA_RETRY_BACKOFF
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        # Connexion: échec rapide; lecture: durée d'une génération; écriture: envoi du prompt;
+        # pool: file d'attente
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout, read=read_timeout, write=write_timeout, pool=pool_timeout
+        )
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.transport = _RetryTransport(self, httpx.HTTPTransport(limits=self.limits))
+        self.client = httpx.Client(base_url=self.base_url, transport=self.transport, timeout=self.timeout)
+        self._async_transport: Optional[_AsyncRetryTransport] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, deque] = {}
+        self._calls: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self.retried = 0
+
+    @property
+    def async_transport(self) -> _AsyncRetryTransport:
+        if self._async_transport is None:
+            self._async_transport = _AsyncRetryTransport(self, httpx.AsyncHTTPTransport(limits=self.limits))
+        return self._async_transport
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url, transport=self.async_transport, timeout=self.timeout
+            )
+        return self._async_client
+
+    def record(self, endpoint: str, seconds: float, error: bool = False):
+        with self._lock:
+            self._latencies.setdefault(endpoint, deque(maxlen=_LATENCY_WINDOW)).append(seconds)
+            self._calls[endpoint] = self._calls.get(endpoint, 0) + 1
+            if error:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retried += 1
+
+    def get_stats(self) -> Dict:
+        """Appels, erreurs et latences (p50/p95 sur les derniers appels) par endpoint"""
+        with self._lock:
+            endpoints = {}
+            for endpoint, latencies in self._latencies.items():
+                ordered = sorted(latencies)
+                endpoints[endpoint] = {
+                    'calls': self._calls[endpoint],
+                    'errors': self._errors.get(endpoint, 0),
+                    'p50_ms': round(ordered[len(ordered) // 2] * 1000, 1),
+                    'p95_ms': round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 1),
+                    'max_ms': round(ordered[-1] * 1000, 1)
+                }
+            return {
+                'base_url': self.base_url,
+                'pool_size': self.pool_size,
+                'retries': self.retried,
+                'endpoints': endpoints
+            }
+
+    def close(self):
+        self.client.close()
+
+
+def keep_alive_for(agent: str) -> Union[int, str]:
+    """Valeur `keep_alive` des appels de l'agent (entier pour -1 ou un nombre de secondes)"""
+    value = os.getenv(f"OLLAMA_KEEP_ALIVE_{agent.upper()}") or os.getenv("OLLAMA_KEEP_ALIVE") \
+        or KEEP_ALIVE_POLICIES.get(agent, "30m")
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+_pools: Dict[str, OllamaPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_ollama_pool(base_url: str) -> OllamaPool:
+    """Pool partagé du serveur Ollama `base_url` (créé au premier appel)"""
+    key = base_url.rstrip("/")
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = OllamaPool(key)
+        return pool
+
+
+def pooled_chat_ollama(base_url: str, **kwargs):
+    """
+    ChatOllama dont le client HTTP utilise le pool partagé du serveur (au lieu d'un
+    client httpx propre à chaque instance)
+    """
+    from langchain_ollama import ChatOllama
+    from ollama import AsyncClient, Client
+
+    pool = get_ollama_pool(base_url)
+    llm = ChatOllama(base_url=base_url, **kwargs)
+    llm._client = Client(host=pool.base_url, transport=pool.transport, timeout=pool.timeout)
+    # ainvoke / astream (chemin ASGI)
+    llm._async_client = AsyncClient(host=pool.base_url, transport=pool.async_transport, timeout=pool.timeout)
+    return llm
+
+
+def ollama_pool_stats(base_url: Optional[str] = None) -> Dict:
+    """Statistiques d'un pool, ou de tous les pools créés"""
+    with _pools_lock:
+        pools = dict(_pools)
+    if base_url is not None:
+        pool = pools.get(base_url.rstrip("/"))
+        return pool.get_stats() if pool else {}
+    return {url: pool.get_stats() for url, pool in pools.items()}
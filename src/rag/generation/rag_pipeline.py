@@ -1,28 +1,62 @@
-from typing import List, Dict, Optional
+import os
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from src.rag.generation.llm_handler import OllamaLLM
 from src.rag.generation.retriever_lang import Retriever
+from src.rag.generation.answer_cache import SemanticAnswerCache
+from src.rag.generation.cpu_executor import run_cpu
+from src.rag.generation.single_flight import SingleFlight, normalize_text
+
+# Disposition du prompt: "prefix" (préfixe statique réutilisable par le cache KV d'Ollama)
+# ou "classic" (template formaté en entier à chaque requête)
+RAG_PROMPT_LAYOUT = os.getenv("RAG_PROMPT_LAYOUT", "prefix")
+# Documents dans un ordre stable et sans score (désactivé par défaut, cf. RAGPipeline)
+RAG_STABLE_DOCUMENT_ORDER = os.getenv("RAG_STABLE_DOCUMENT_ORDER", "0") == "1"
 
 class RAGPipeline:
     """
     Pipeline RAG complet: Retrieval + Generation
+    
+    Disposition "prefix" du prompt: Ollama réutilise le cache KV du plus long préfixe commun
+    avec une requête précédente. Les instructions (tout ce qui précède {context}) sont
+    formatées une seule fois et forment un préfixe identique octet pour octet d'une requête
+    à l'autre; les documents suivent par ordre de pertinence, avec leur score, puis la question.
+    
+    `stable_document_order` prolonge ce préfixe commun: documents triés par (source, page,
+    position) et sans score, deux questions qui retrouvent les mêmes premiers documents
+    partagent aussi ce début de contexte. Contrepartie: le LLM ne voit plus le document le
+    plus pertinent en premier ni aucun signal de pertinence, ce qui peut dégrader les
+    réponses; option désactivée par défaut, à n'activer qu'après évaluation.
     """
     
     def __init__(
         self,
         retriever: Retriever,
         llm: OllamaLLM,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        single_flight: bool = True,
+        prompt_layout: str = RAG_PROMPT_LAYOUT,
+        stable_document_order: bool = RAG_STABLE_DOCUMENT_ORDER
     ):
         """
         Args:
             retriever: Système de récupération
             llm: Modèle de langage Ollama
             system_prompt: Instructions système personnalisées
+            answer_cache: Cache sémantique des réponses (optionnel)
+            single_flight: Une seule exécution pour les questions identiques simultanées
+            prompt_layout: "prefix" (préfixe stable, cache KV) ou "classic"
+            stable_document_order: Documents triés par source et sans score (cf. contrepartie)
         """
         self.retriever = retriever
         self.llm = llm
+        self.answer_cache = answer_cache
+        self.single_flight = SingleFlight("rag") if single_flight else None
         
         self.system_prompt = system_prompt or self._default_system_prompt()
+        self.prompt_layout = prompt_layout
+        self.stable_document_order = stable_document_order
+        self.prompt_prefix, self._prompt_body = self._split_prompt(self.system_prompt)
     
 
     def _default_system_prompt(self) -> str:
@@ -103,6 +137,53 @@ QUESTION: {query}
 
 RÉPONSE:"""
     
+    def _split_prompt(self, template: str) -> Tuple[str, str]:
+        """
+        Sépare le template en préfixe statique déjà formaté (instructions avant {context})
+        et partie variable; préfixe vide en disposition "classic"
+        """
+        position = template.find("{context}")
+        if self.prompt_layout != "prefix" or position < 0:
+            return "", template
+        try:
+            return template[:position].format(), template[position:]
+        except (KeyError, IndexError):
+            # {query} avant {context}: aucun préfixe statique possible
+            return "", template
+    
+    @staticmethod
+    def _stable_order(chunks: List[Dict]) -> List[Dict]:
+        """Chunks dans un ordre indépendant de la question (source, page, position)"""
+        def key(chunk: Dict) -> Tuple:
+            metadata = chunk['metadata']
+            return (
+                str(metadata.get('source', '')),
+                str(metadata.get('page', '')),
+                metadata.get('chunk_index', 0),
+                chunk['content']
+            )
+        return sorted(chunks, key=key)
+    
+    @staticmethod
+    def _chunk_context(chunk: Dict) -> str:
+        """Texte du chunk pour le LLM (span de contexte s'il a été découpé au tokenizer)"""
+        return (chunk['metadata'].get('context') or chunk['content']).strip()
+    
+    def _unique_contexts(self, chunks: List[Dict]) -> List[Dict]:
+        """
+        Un seul chunk par span de contexte (le premier): plusieurs chunks d'un même span
+        n'ajouteraient que des doublons. La liste sert au contexte *et* aux sources, pour que
+        la citation [n] désigne toujours sources[n-1].
+        """
+        seen_contexts = set()
+        unique = []
+        for chunk in chunks:
+            content = self._chunk_context(chunk)
+            if content not in seen_contexts:
+                seen_contexts.add(content)
+                unique.append(chunk)
+        return unique
+    
     def _format_context(self, chunks: List[Dict]) -> str:
         """
         Formate les chunks récupérés en contexte structuré pour le LLM
@@ -118,7 +199,7 @@ RÉPONSE:"""
         
         context_parts = []
         
-        for i, chunk in enumerate(chunks, 1):
+        for number, chunk in enumerate(chunks, start=1):
             # Récupération des métadonnées
             source = chunk['metadata'].get('source', 'Document inconnu')
             page = chunk['metadata'].get('page', 'N/A')
@@ -126,41 +207,47 @@ RÉPONSE:"""
             # Récupération du score final 
             final_score = chunk['scores']['final']
             
-            # Nettoyage du contenu
-            content = chunk['content'].strip()
+            # Nettoyage du contenu (span de contexte, cf. _unique_contexts)
+            content = self._chunk_context(chunk)
             
-            # Format clair et structuré
+            # Format clair et structuré (sans score en ordre stable: le même document
+            # produit alors le même texte quelle que soit la question)
+            header = f"Source: {source} | Page: {page}"
+            if not self.stable_document_order:
+                header += f" | Pertinence: {final_score:.2f}"
             context_parts.append(
-                f"--- DOCUMENT {i} ---\n"
-                f"Source: {source} | Page: {page} | Pertinence: {final_score:.2f}\n\n"
+                f"--- DOCUMENT {number} ---\n"
+                f"{header}\n\n"
                 f"{content}\n"
             )
         
         return "\n".join(context_parts)
     
-    def query(
-        self,
-        user_query: str,
-        return_sources: bool = True,
-        stream: bool = False,
-        debug: bool = False
-    ) -> Dict:
+    def _prepare(self, user_query: str, return_sources: bool, debug: bool) -> Dict:
         """
-        Exécute une requête RAG complète
+        Étapes avant la génération: cache sémantique, retrieval et construction du prompt
         
-        Args:
-            user_query: Question de l'utilisateur
-            return_sources: Retourner les sources utilisées
-            stream: Streaming de la réponse
-            debug: Afficher le contexte envoyé au LLM
-            
         Returns:
-            Dictionnaire avec réponse et métadonnées
+            {'response': ...} si la réponse est déjà connue (cache, aucun document),
+            sinon {'prompt', 'chunks', 'query_vector', 'index_version'}
         """
         print(f"\n{'='*60}")
         print(f"  Question: {user_query}")
         print(f"{'='*60}\n")
         
+        # 0. CACHE SÉMANTIQUE: question proche déjà traitée avec le même index
+        query_vector = None
+        index_version = getattr(self.retriever.vector_store, 'index_version', None)
+        if self.answer_cache is not None:
+            query_vector = self.retriever.embed_query(user_query)
+            cached = self.answer_cache.lookup(query_vector, index_version)
+            if cached is not None:
+                print(f"Réponse servie depuis le cache (question proche: '{cached['cached_question']}')")
+                if not return_sources:
+                    cached.pop('sources', None)
+                cached['cached'] = True
+                return {'response': cached}
+        
         # 1. RETRIEVAL: Récupérer les chunks pertinents
         print("Phase 1: Récupération des documents...")
         retrieved_chunks = self.retriever.retrieve_with_reranking(
@@ -169,14 +256,18 @@ RÉPONSE:"""
         )
         
         if not retrieved_chunks:
-            return {
+            return {'response': {
                 'answer': "Je n'ai trouvé aucune information pertinente pour répondre à votre question.",
                 'sources': [],
-                'num_chunks_used': 0
-            }
+                'num_chunks_used': 0,
+                'cached': False
+            }}
         
-        # 2. FORMATTING: Créer le contexte structuré
+        # 2. FORMATTING: Créer le contexte structuré (numéros [n] et sources dans le même ordre)
         print("Phase 2: Formatage du contexte...")
+        retrieved_chunks = self._unique_contexts(retrieved_chunks)
+        if self.stable_document_order:
+            retrieved_chunks = self._stable_order(retrieved_chunks)
         context = self._format_context(retrieved_chunks)
         
         # Debug: afficher le contexte exact envoyé au LLM
@@ -187,37 +278,257 @@ RÉPONSE:"""
       #  print(context)
       #  print("="*60 + "\n")
         
-        # Construire le prompt complet
-        prompt = self.system_prompt.format(
+        # Construire le prompt complet (préfixe statique réutilisé tel quel)
+        prompt = self.prompt_prefix + self._prompt_body.format(
             context=context,
             query=user_query
         )
-        
-        # 3. GENERATION: Générer la réponse
-        print("Phase 3: Génération de la réponse...\n")
-        answer = self.llm.generate(prompt, stream=stream)
+        return {
+            'prompt': prompt,
+            'chunks': retrieved_chunks,
+            'query_vector': query_vector,
+            'index_version': index_version
+        }
+    
+    def _finalize(self, user_query: str, answer: str, prepared: Dict, return_sources: bool) -> Dict:
+        """Réponse finale (sources, mise en cache) à partir du texte généré"""
+        retrieved_chunks = prepared['chunks']
         
         # 4. FORMAT RESPONSE
         response = {
             'answer': answer.strip(),
-            'num_chunks_used': len(retrieved_chunks)
+            'num_chunks_used': len(retrieved_chunks),
+            'cached': False
         }
         
+        sources = [
+            {
+                'source': chunk['metadata'].get('source', 'Inconnu'),
+                'page': chunk['metadata'].get('page', 'N/A'),
+                'final_score': chunk['scores']['final'],
+                'vector_score': chunk['scores']['vector'],
+                'lexical_score': chunk['scores']['lexical'],
+                'preview': chunk['content'][:250] + "..." if len(chunk['content']) > 250 else chunk['content']
+            }
+            for chunk in retrieved_chunks
+        ]
         if return_sources:
-            response['sources'] = [
-                {
-                    'source': chunk['metadata'].get('source', 'Inconnu'),
-                    'page': chunk['metadata'].get('page', 'N/A'),
-                    'final_score': chunk['scores']['final'],
-                    'vector_score': chunk['scores']['vector'],
-                    'lexical_score': chunk['scores']['lexical'],
-                    'preview': chunk['content'][:250] + "..." if len(chunk['content']) > 250 else chunk['content']
-                }
-                for chunk in retrieved_chunks
-            ]
+            response['sources'] = sources
+        
+        # Mise en cache des réponses effectivement générées (pas des erreurs Ollama)
+        if self.answer_cache is not None and response['answer'] and not answer.startswith("Erreur:"):
+            self.answer_cache.store(
+                user_query,
+                prepared['query_vector'],
+                {'answer': response['answer'], 'num_chunks_used': len(retrieved_chunks), 'sources': sources},
+                prepared['index_version']
+            )
         
         return response
+    
+    def _flight_key(self, user_query: str, return_sources: bool) -> Tuple:
+        """Clé du single flight: question normalisée, version de l'index, sources demandées"""
+        index_version = getattr(self.retriever.vector_store, 'index_version', None)
+        return normalize_text(user_query), index_version, return_sources
+    
+    def query(
+        self,
+        user_query: str,
+        return_sources: bool = True,
+        stream: bool = False,
+        debug: bool = False
+    ) -> Dict:
+        """
+        Exécute une requête RAG complète
+        
+        Les requêtes identiques simultanées (même question normalisée, même index) attendent
+        la première et partagent sa réponse (cf. SingleFlight).
+        
+        Args:
+            user_query: Question de l'utilisateur
+            return_sources: Retourner les sources utilisées
+            stream: Streaming de la réponse
+            debug: Afficher le contexte envoyé au LLM
+            
+        Returns:
+            Dictionnaire avec réponse et métadonnées
+        """
+        if self.single_flight is None or stream or debug:
+            return self._query(user_query, return_sources, stream, debug)
+        return self.single_flight.run(
+            self._flight_key(user_query, return_sources),
+            self._query, user_query, return_sources, stream, debug
+        )
+    
+    def _query(self, user_query: str, return_sources: bool, stream: bool, debug: bool) -> Dict:
+        prepared = self._prepare(user_query, return_sources, debug)
+        if 'response' in prepared:
+            return prepared['response']
+        
+        # 3. GENERATION: Générer la réponse
+        print("Phase 3: Génération de la réponse...\n")
+        answer = self.llm.generate(prepared['prompt'], stream=stream)
+        
+        return self._finalize(user_query, answer, prepared, return_sources)
+    
+    def query_stream(
+        self,
+        user_query: str,
+        return_sources: bool = True,
+        debug: bool = False
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Requête RAG dont la réponse est transmise au fil de la génération
+        
+        Une requête identique déjà en cours est attendue: sa réponse est alors transmise
+        en un seul fragment, comme une réponse du cache.
+        
+        Args:
+            user_query: Question de l'utilisateur
+            return_sources: Retourner les sources utilisées
+            debug: Afficher le contexte envoyé au LLM
+            
+        Yields:
+            ('token', fragment) au fil de la génération, puis ('done', réponse) avec le
+            même dictionnaire que query()
+        """
+        if self.single_flight is None or debug:
+            yield from self._query_stream(user_query, return_sources, debug)
+            return
+        
+        key = self._flight_key(user_query, return_sources)
+        call, leader = self.single_flight.join(key)
+        if not leader:
+            ok, response = self.single_flight.wait(call)
+            if ok:
+                print("Réponse partagée avec une requête identique en cours")
+                yield 'token', response['answer']
+                yield 'done', response
+            else:
+                yield from self._query_stream(user_query, return_sources, debug)
+            return
+        
+        # Leader: résultat publié dès l'événement 'done'; flux abandonné = échec
+        finished = False
+        try:
+            for event, payload in self._query_stream(user_query, return_sources, debug):
+                if event == 'done':
+                    self.single_flight.finish(key, call, payload)
+                    finished = True
+                yield event, payload
+        finally:
+            if not finished:
+                self.single_flight.finish(key, call, failed=True)
+    
+    def _query_stream(self, user_query: str, return_sources: bool, debug: bool) -> Iterator[Tuple[str, Any]]:
+        prepared = self._prepare(user_query, return_sources, debug)
+        if 'response' in prepared:
+            yield 'token', prepared['response']['answer']
+            yield 'done', prepared['response']
+            return
+        
+        # 3. GENERATION: chaque fragment est transmis dès sa réception
+        print("Phase 3: Génération de la réponse (streaming)...\n")
+        fragments = []
+        try:
+            for fragment in self.llm.generate_stream(prepared['prompt']):
+                fragments.append(fragment)
+                yield 'token', fragment
+            answer = "".join(fragments)
+        except Exception as e:
+            # Même réponse que generate() en cas d'erreur (jamais mise en cache)
+            print(f" Erreur Ollama: {e}")
+            answer = f"Erreur: {str(e)}"
+        
+        yield 'done', self._finalize(user_query, answer, prepared, return_sources)
+        
+    async def aquery(
+        self,
+        user_query: str,
+        return_sources: bool = True,
+        debug: bool = False
+    ) -> Dict:
+        """
+        Version asynchrone de query(): embedding, recherche et reranking dans l'exécuteur
+        borné (cf. run_cpu), génération sans bloquer de thread
+        """
+        if self.single_flight is None or debug:
+            return await self._aquery(user_query, return_sources, debug)
+        return await self.single_flight.arun(
+            self._flight_key(user_query, return_sources),
+            self._aquery, user_query, return_sources, debug
+        )
+    
+    async def _aquery(self, user_query: str, return_sources: bool, debug: bool) -> Dict:
+        prepared = await run_cpu(self._prepare, user_query, return_sources, debug)
+        if 'response' in prepared:
+            return prepared['response']
         
+        print("Phase 3: Génération de la réponse...\n")
+        answer = await self.llm.agenerate(prepared['prompt'])
+        
+        return await run_cpu(self._finalize, user_query, answer, prepared, return_sources)
+    
+    async def aquery_stream(
+        self,
+        user_query: str,
+        return_sources: bool = True,
+        debug: bool = False
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Version asynchrone de query_stream() (mêmes événements, même dédoublonnage)"""
+        if self.single_flight is None or debug:
+            async for event in self._aquery_stream(user_query, return_sources, debug):
+                yield event
+            return
+        
+        key = self._flight_key(user_query, return_sources)
+        call, leader = self.single_flight.join(key)
+        if not leader:
+            ok, response = await self.single_flight.await_call(call)
+            if ok:
+                print("Réponse partagée avec une requête identique en cours")
+                yield 'token', response['answer']
+                yield 'done', response
+            else:
+                async for event in self._aquery_stream(user_query, return_sources, debug):
+                    yield event
+            return
+        
+        finished = False
+        try:
+            async for event, payload in self._aquery_stream(user_query, return_sources, debug):
+                if event == 'done':
+                    self.single_flight.finish(key, call, payload)
+                    finished = True
+                yield event, payload
+        finally:
+            if not finished:
+                self.single_flight.finish(key, call, failed=True)
+    
+    async def _aquery_stream(self, user_query: str, return_sources: bool, debug: bool) -> AsyncIterator[Tuple[str, Any]]:
+        prepared = await run_cpu(self._prepare, user_query, return_sources, debug)
+        if 'response' in prepared:
+            yield 'token', prepared['response']['answer']
+            yield 'done', prepared['response']
+            return
+        
+        print("Phase 3: Génération de la réponse (streaming)...\n")
+        fragments = []
+        try:
+            async for fragment in self.llm.agenerate_stream(prepared['prompt']):
+                fragments.append(fragment)
+                yield 'token', fragment
+            answer = "".join(fragments)
+        except Exception as e:
+            print(f" Erreur Ollama: {e}")
+            answer = f"Erreur: {str(e)}"
+        
+        yield 'done', await run_cpu(self._finalize, user_query, answer, prepared, return_sources)
+    
+    def warm_up(self) -> Optional[float]:
+        """Charge le modèle et place le préfixe statique du prompt dans le cache KV d'Ollama"""
+        return self.llm.warm_up(self.prompt_prefix)
+    
     def interactive_chat(self, debug: bool = False):
         """Mode chat interactif"""
         print("\n" + "="*60)
@@ -0,0 +1,224 @@
+from collections import defaultdict
+from typing import Dict, List, Sequence
+import re
+
+import numpy as np
+
+# Ponctuation supprimée par la normalisation (identique à Retriever._normalize_text)
+PUNCTUATION_RE = re.compile(r'[?!.,;:\'\"]+')
+
+
+def split_words(words: Sequence[str]) -> List[List[str]]:
+    """
+    Découpe des mots (en minuscules, sans espace) en tokens normalisés sans ponctuation.
+    Une seule substitution regex est faite pour l'ensemble des mots.
+    """
+    pieces = PUNCTUATION_RE.sub(' ', '\n'.join(words)).split('\n')
+    return [piece.split() for piece in pieces] if words else []
+
+
+def ragged_gather(flat: np.ndarray, offsets: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Concatène flat[offsets[r]:offsets[r+1]] pour chaque r de `rows`"""
+    lengths = offsets[rows + 1] - offsets[rows]
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=flat.dtype)
+    ends = np.cumsum(lengths)
+    shift = np.repeat(offsets[rows] - (ends - lengths), lengths)
+    return flat[np.arange(total) + shift]
+
+
+def _segment_sums(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Somme de `values` (axe 0) sur chaque segment [offsets[i], offsets[i+1])"""
+    cumulative = np.zeros((len(values) + 1,) + values.shape[1:], dtype=np.int64)
+    np.cumsum(values, axis=0, out=cumulative[1:])
+    return cumulative[offsets[1:]] - cumulative[offsets[:-1]]
+
+
+class CandidateBatch:
+    """
+    Candidats tokenisés une seule fois et concaténés pour le scoring vectorisé.
+
+    Le texte de chaque candidat est représenté par une suite de tokens normalisés
+    (minuscules, sans ponctuation). Chaque mot "lexical" (découpage sur les espaces)
+    correspond à une plage contiguë, éventuellement vide, de cette suite.
+    """
+
+    def __init__(
+        self,
+        vocab: List[str],
+        token_ids: np.ndarray,
+        word_bounds: np.ndarray,
+        word_offsets: np.ndarray
+    ):
+        """
+        Args:
+            vocab: Tokens normalisés du lot (l'identifiant d'un token est sa position)
+            token_ids: Identifiants concaténés des tokens normalisés de tous les candidats
+            word_bounds: Début de chaque mot lexical dans token_ids (taille nb_mots+1)
+            word_offsets: Bornes des candidats dans la liste des mots (taille n+1)
+        """
+        self.vocab = vocab
+        self.token_ids = token_ids
+        self.word_bounds = word_bounds
+        self.word_offsets = word_offsets
+
+    def __len__(self) -> int:
+        return len(self.word_offsets) - 1
+
+    @property
+    def word_counts(self) -> np.ndarray:
+        """Nombre de mots de chaque candidat (équivalent à len(content.split()))"""
+        return np.diff(self.word_offsets)
+
+    @property
+    def token_offsets(self) -> np.ndarray:
+        """Bornes des candidats dans token_ids (taille n+1)"""
+        return self.word_bounds[self.word_offsets]
+
+    @classmethod
+    def from_texts(cls, texts: Sequence[str]) -> "CandidateBatch":
+        """Tokenise chaque texte une seule fois et construit le lot"""
+        # Identifiants des mots lexicaux distincts (mapping en C via defaultdict)
+        words = defaultdict()
+        words.default_factory = words.__len__
+        word_ids: List[int] = []
+        word_offsets = [0]
+        for text in texts:
+            word_ids.extend(map(words.__getitem__, text.lower().split()))
+            word_offsets.append(len(word_ids))
+
+        # Découpage de chaque mot distinct en tokens normalisés (une seule fois)
+        vocab = defaultdict()
+        vocab.default_factory = vocab.__len__
+        word_parts = split_words(list(words))
+        parts = list(map(vocab.__getitem__, [t for tokens in word_parts for t in tokens]))
+        parts_offsets = np.zeros(len(word_parts) + 1, dtype=np.int64)
+        np.cumsum([len(tokens) for tokens in word_parts], out=parts_offsets[1:])
+
+        word_ids = np.asarray(word_ids, dtype=np.int64)
+        word_bounds = np.zeros(len(word_ids) + 1, dtype=np.int64)
+        np.cumsum(parts_offsets[word_ids + 1] - parts_offsets[word_ids], out=word_bounds[1:])
+
+        return cls(
+            vocab=list(vocab),
+            token_ids=ragged_gather(np.asarray(parts, dtype=np.int64), parts_offsets, word_ids),
+            word_bounds=word_bounds,
+            word_offsets=np.asarray(word_offsets, dtype=np.int64)
+        )
+
+    def term_matches(self, query_terms: Sequence[str]) -> np.ndarray:
+        """
+        Matrice booléenne (vocabulaire × termes): le terme est-il contenu dans le token ?
+        Chaque token distinct n'est testé qu'une fois pour tout le lot.
+        """
+        matches = np.zeros((len(self.vocab), len(query_terms)), dtype=bool)
+        for j, term in enumerate(query_terms):
+            matches[:, j] = [term in token for token in self.vocab]
+        return matches
+
+
+class BatchReranker:
+    """
+    Moteur de reranking vectorisé: calcule les scores lexical, densité, longueur
+    et le bonus "tous les mots-clés" pour tous les candidats en une passe NumPy.
+
+    Reproduit exactement l'ancien scoring scalaire du Retriever (référence conservée
+    dans tests/test_reranker.py).
+    """
+
+    TERM_CAP = 3           # Occurrences max comptées par terme
+    ALL_TERMS_BONUS = 1.1  # Boost si tous les mots-clés sont présents
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+
+    def lexical_scores(self, token_hits: np.ndarray, batch: CandidateBatch) -> np.ndarray:
+        """Correspondance lexicale avec TF plafonnée, normalisée par le nombre de termes"""
+        n_terms = token_hits.shape[1]
+        if n_terms == 0:
+            return np.zeros(len(batch))
+        # Un mot lexical contient le terme si l'un de ses tokens normalisés le contient
+        word_hits = _segment_sums(token_hits, batch.word_bounds) > 0
+        counts = _segment_sums(word_hits, batch.word_offsets)
+        return np.minimum(counts, self.TERM_CAP).sum(axis=1) / (n_terms * self.TERM_CAP)
+
+    def density_scores(self, token_hits: np.ndarray, batch: CandidateBatch) -> np.ndarray:
+        """Concentration des tokens contenant au moins un terme de la requête"""
+        hit_positions = np.flatnonzero(token_hits.any(axis=1))
+        token_offsets = batch.token_offsets
+
+        starts = np.searchsorted(hit_positions, token_offsets[:-1])
+        ends = np.searchsorted(hit_positions, token_offsets[1:])
+        n_hits = ends - starts
+
+        spans = np.ones(len(batch), dtype=np.int64)
+        multi = n_hits >= 2
+        if multi.any():
+            spans[multi] = hit_positions[ends[multi] - 1] - hit_positions[starts[multi]] + 1
+
+        return np.where(multi, np.minimum(n_hits / spans, 1.0), n_hits.astype(float))
+
+    def length_scores(self, word_counts: np.ndarray, query_length: int) -> np.ndarray:
+        """Score de longueur autour d'une zone idéale dépendant de la requête"""
+        ideal_min = max(40, query_length * 8)
+        ideal_max = max(100, query_length * 15)
+        lengths = word_counts.astype(float)
+
+        too_long = np.maximum(0.5, 1.0 - ((lengths - ideal_max) / ideal_max) * 0.5)
+        scores = np.where(lengths < ideal_min, 0.5 + (lengths / ideal_min) * 0.5, too_long)
+        scores = np.where((lengths >= ideal_min) & (lengths <= ideal_max), 1.0, scores)
+        return np.where(lengths < 15, 0.3, scores)
+
+    def all_terms_present(self, token_hits: np.ndarray, batch: CandidateBatch) -> np.ndarray:
+        """True si chaque terme apparaît dans au moins un token du candidat"""
+        if token_hits.shape[1] == 0:
+            return np.zeros(len(batch), dtype=bool)
+        presence = _segment_sums(token_hits, batch.token_offsets)
+        return (presence > 0).all(axis=1)
+
+    def score(
+        self,
+        query_terms: Sequence[str],
+        query_length: int,
+        batch: CandidateBatch,
+        vector_scores: np.ndarray,
+        matches: np.ndarray = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Calcule tous les scores du lot.
+
+        Args:
+            query_terms: Mots-clés de la requête
+            query_length: Nombre de mots de la requête brute
+            batch: Candidats tokenisés
+            vector_scores: Score vectoriel de chaque candidat
+            matches: Matrice vocabulaire × termes précalculée (optionnelle)
+
+        Returns:
+            Dictionnaire de tableaux {'vector', 'lexical', 'density', 'length', 'final'}
+        """
+        query_terms = list(query_terms)
+        if matches is None:
+            matches = batch.term_matches(query_terms)
+        token_hits = matches[batch.token_ids]
+
+        lexical = self.lexical_scores(token_hits, batch)
+        density = self.density_scores(token_hits, batch)
+        length = self.length_scores(batch.word_counts, query_length)
+
+        final = (
+            vector_scores * self.weights['vector'] +
+            lexical * self.weights['lexical'] +
+            density * self.weights['density'] +
+            length * self.weights['length']
+        )
+        final = np.where(self.all_terms_present(token_hits, batch), final * self.ALL_TERMS_BONUS, final)
+
+        return {
+            'vector': vector_scores,
+            'lexical': lexical,
+            'density': density,
+            'length': length,
+            'final': final
+        }
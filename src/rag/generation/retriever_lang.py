@@ -1,6 +1,9 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import re
+import numpy as np
 from src.rag.vectorstore.vector_store_lang import VectorStoreManager 
+from src.rag.generation.reranker import BatchReranker, CandidateBatch
 from langchain_core.documents import Document as LCDocument
 
 class Retriever:
@@ -15,20 +18,30 @@ class Retriever:
         final_k: int = 5,
         similarity_threshold: float = 0.0,
         # Poids configurables pour le reranking
-        weights: Optional[Dict[str, float]] = None
+        weights: Optional[Dict[str, float]] = None,
+        hybrid: bool = True,
+        rrf_k: int = 60
     ):
         """
         Args:
             vector_store_manager: Base vectorielle LangChain (FAISS)
             top_k: Nombre de chunks à récupérer pour le reranking
             final_k: Nombre final de chunks à retourner
-            similarity_threshold: Seuil minimum de similarité (0.0-1.0)
+            similarity_threshold: Seuil minimum de similarité cosinus (0.0-1.0),
+                appliqué avant le reranking
             weights: Poids personnalisés {'vector': 0.6, 'lexical': 0.25, ...}
+            hybrid: Fusionne la recherche FAISS avec la recherche BM25 (si disponible)
+            rrf_k: Constante de la reciprocal rank fusion
         """
         self.vector_store = vector_store_manager 
         self.top_k = top_k
         self.final_k = final_k
         self.similarity_threshold = similarity_threshold
+        self.hybrid = hybrid
+        self.rrf_k = rrf_k
+        
+        # FAISS et BM25 sont interrogés en parallèle
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="faiss-search") if hybrid else None
         
         self.weights = weights or {
             'vector': 0.55,    # Sémantique prioritaire mais équilibrée
@@ -41,6 +54,8 @@ class Retriever:
         total = sum(self.weights.values())
         if abs(total - 1.0) > 0.01:
             raise ValueError(f"Les poids doivent sommer à 1.0 (actuellement: {total})")
+        
+        self.reranker = BatchReranker(self.weights)
     
     def _normalize_text(self, text: str) -> str:
         """
@@ -66,80 +81,146 @@ class Retriever:
         words = self._normalize_text(text).split()
         return {w for w in words if len(w) > 3 and w not in stopwords}
     
-    def _calculate_vector_score(self, rank: int) -> float:
+    def _calculate_vector_score(self, similarities: np.ndarray) -> np.ndarray:
         """
-        Score basé sur le rang FAISS (décroissance non-linéaire)
+        Score vectoriel = similarité cosinus FAISS ramenée dans [0, 1]
         """
-        return 1.0 / (1.0 + rank * 0.1)  # Décroissance plus douce
+        return np.clip(similarities, 0.0, 1.0)
+    
+    @staticmethod
+    def _document_key(doc: LCDocument) -> str:
+        """Identité d'un chunk dans les fusions: id du docstore, ou texte s'il n'a pas d'id"""
+        return getattr(doc, 'id', None) or doc.page_content
     
-    def _calculate_lexical_score(self, query_terms: set, content: str) -> float:
+    def _reciprocal_rank_fusion(self, rankings: List[List[LCDocument]]) -> List[LCDocument]:
         """
-        Score de correspondance lexicale avec pondération TF
+        Fusionne plusieurs classements par reciprocal rank fusion: score = Σ 1 / (k + rang)
         """
-        content_lower = content.lower()
-        content_words = content_lower.split()
+        fused: Dict[str, float] = {}
+        documents: Dict[str, LCDocument] = {}
         
-        # Comptage des occurrences
-        matches = 0
-        for term in query_terms:
-            # Compte les occurrences partielles (ex: "program" match "programmation")
-            term_count = sum(1 for word in content_words if term in word)
-            matches += min(term_count, 3)  # Cap à 3 pour éviter sur-pondération
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking, 1):
+                key = self._document_key(doc)
+                fused[key] = fused.get(key, 0.0) + 1.0 / (self.rrf_k + rank)
+                documents.setdefault(key, doc)
         
-        # Normalisation
-        max_score = len(query_terms) * 3
-        return matches / max_score if max_score > 0 else 0
+        ordered = sorted(fused, key=fused.get, reverse=True)
+        return [documents[key] for key in ordered]
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embedding de la requête tel qu'utilisé pour la recherche (partage le cache)"""
+        return self.vector_store.embed_query(self._normalize_text(query))
+    
+    def _vector_search(self, query: str) -> Tuple[np.ndarray, List[Tuple[LCDocument, float]]]:
+        query_vector = self.vector_store.embed_query(query)
+        return query_vector, self.vector_store.search_by_vector(query_vector, top_k=self.top_k)
+    
+    def _vector_search_many(self, queries: List[str]) -> Tuple[np.ndarray, List[List[Tuple[LCDocument, float]]]]:
+        query_vectors = self.vector_store.embed_queries(queries)
+        return query_vectors, self.vector_store.search_by_vectors(query_vectors, top_k=self.top_k)
+    
+    def _use_hybrid(self) -> bool:
+        return self.hybrid and getattr(self.vector_store, 'bm25_index', None) is not None
+    
+    def _fuse(
+        self,
+        query_vector: np.ndarray,
+        vector_results: List[Tuple[LCDocument, float]],
+        bm25_documents: List[LCDocument]
+    ) -> List[Tuple[LCDocument, float]]:
+        """Fusion RRF des résultats FAISS et BM25, avec la similarité cosinus de chaque chunk"""
+        retrieved_documents = self._reciprocal_rank_fusion(
+            [[doc for doc, _ in vector_results], bm25_documents]
+        )[:self.top_k]
+        
+        # Similarité des chunks trouvés uniquement par BM25
+        key = self._document_key
+        similarity_of = {key(doc): score for doc, score in vector_results}
+        missing = [doc for doc in retrieved_documents if key(doc) not in similarity_of]
+        similarity_of.update(
+            zip((key(doc) for doc in missing), self.vector_store.similarities(query_vector, missing))
+        )
+        return [(doc, similarity_of[key(doc)]) for doc in retrieved_documents]
     
-    def _calculate_density_score(self, query_terms: set, content: str) -> float:
+    def retrieve_with_scores(self, query: str) -> List[Tuple[LCDocument, float]]:
         """
-        Densité des termes de requête (concentration dans le texte)
+        Récupère les chunks les plus pertinents avec leur similarité cosinus:
+        recherche vectorielle FAISS, fusionnée avec la recherche BM25 quand
+        l'index lexical est disponible
         """
-        content_words = self._normalize_text(content).split()
+        # Une même version de l'index sert toute la requête (cf. VectorStoreManager.hot_swap)
+        with self.vector_store.reading():
+            return self._retrieve_with_scores(query)
+    
+    def _retrieve_with_scores(self, query: str) -> List[Tuple[LCDocument, float]]:
+        normalized_query = self._normalize_text(query)
         
-        term_positions = []
-        for i, word in enumerate(content_words):
-            if any(term in word for term in query_terms):
-                term_positions.append(i)
+        if not self._use_hybrid():
+            _, retrieved = self._vector_search(normalized_query)
+            print(f"   📝 Requête normalisée: '{normalized_query}'")
+            print(f"   🔍 {len(retrieved)} documents récupérés")
+            return retrieved
         
-        if len(term_positions) < 2:
-            return len(term_positions)
+        vector_future = self._executor.submit(self._vector_search, normalized_query)
+        bm25_documents = self.vector_store.search_bm25(normalized_query, top_k=self.top_k)
+        query_vector, vector_results = vector_future.result()
+        retrieved = self._fuse(query_vector, vector_results, bm25_documents)
         
-        term_positions.sort()
-        span = term_positions[-1] - term_positions[0] + 1
-        return min(len(term_positions) / span, 1.0)
+        print(f"   📝 Requête normalisée: '{normalized_query}'")
+        print(f"   🔍 {len(retrieved)} documents récupérés "
+              f"(FAISS: {len(vector_results)}, BM25: {len(bm25_documents)})")
+        return retrieved
     
-    def _calculate_length_score(self, chunk_length: int, query_length: int) -> float:
+    def retrieve_many_with_scores(self, queries: List[str]) -> List[List[Tuple[LCDocument, float]]]:
         """
-        Score de longueur avec courbe gaussienne autour d'une longueur idéale
+        Version groupée de retrieve_with_scores: toutes les requêtes sont encodées
+        en un seul passage du modèle et cherchées en une seule recherche FAISS
         """
-        ideal_min = max(40, query_length * 8)
-        ideal_max = max(100, query_length * 15)
-        ideal_mid = (ideal_min + ideal_max) / 2
+        if not queries:
+            return []
+        with self.vector_store.reading():
+            return self._retrieve_many_with_scores(queries)
+    
+    def _retrieve_many_with_scores(self, queries: List[str]) -> List[List[Tuple[LCDocument, float]]]:
+        normalized_queries = [self._normalize_text(query) for query in queries]
         
-        if chunk_length < 15:  # Trop court
-            return 0.3
-        elif ideal_min <= chunk_length <= ideal_max:  # Zone idéale
-            return 1.0
-        elif chunk_length < ideal_min:  # Un peu court
-            return 0.5 + (chunk_length / ideal_min) * 0.5
-        else:  # Trop long (décroissance douce)
-            excess = chunk_length - ideal_max
-            return max(0.5, 1.0 - (excess / ideal_max) * 0.5)
+        if not self._use_hybrid():
+            _, retrieved = self._vector_search_many(normalized_queries)
+        else:
+            vector_future = self._executor.submit(self._vector_search_many, normalized_queries)
+            bm25_results = [
+                self.vector_store.search_bm25(query, top_k=self.top_k) for query in normalized_queries
+            ]
+            query_vectors, vector_results = vector_future.result()
+            retrieved = [
+                self._fuse(query_vector, results, bm25_documents)
+                for query_vector, results, bm25_documents in zip(query_vectors, vector_results, bm25_results)
+            ]
+        
+        print(f"   🔍 {len(queries)} requêtes traitées en lot "
+              f"({sum(len(r) for r in retrieved)} documents récupérés)")
+        return retrieved
     
     def retrieve(self, query: str) -> List[LCDocument]: 
         """
-        Récupère les chunks les plus pertinents avec recherche vectorielle
+        Récupère les chunks les plus pertinents (sans les scores)
         """
-        normalized_query = self._normalize_text(query)
-        
-        retrieved_documents = self.vector_store.search(
-            query=normalized_query,
-            top_k=self.top_k
-        )
+        return [doc for doc, _ in self.retrieve_with_scores(query)]
+
+    def _candidate_batch(self, docs: List[LCDocument], query_terms: List[str]):
+        """
+        Tokens des candidats et matrice de correspondance des termes.
+        Utilise l'index lexical persisté; sinon tokenise le texte des chunks.
+        """
+        lexical_index = getattr(self.vector_store, 'lexical_index', None)
+        if lexical_index is not None:
+            rows = lexical_index.rows_for([getattr(doc, 'id', None) for doc in docs])
+            if rows is not None:
+                return lexical_index.batch(rows), lexical_index.term_matches(query_terms)
         
-        print(f"   📝 Requête normalisée: '{normalized_query}'")
-        print(f"   🔍 {len(retrieved_documents)} documents récupérés")
-        return retrieved_documents
+        batch = CandidateBatch.from_texts([doc.page_content for doc in docs])
+        return batch, batch.term_matches(query_terms)
 
     def retrieve_with_reranking(self, query: str, debug: bool = True) -> List[Dict]:
         """
@@ -152,8 +233,43 @@ class Retriever:
         Returns:
             Liste de chunks scorés et triés
         """
-        # 1. RETRIEVAL VECTORIEL
-        retrieved_docs = self.retrieve(query)
+        with self.vector_store.reading():
+            # 1. RETRIEVAL VECTORIEL
+            retrieved = self.retrieve_with_scores(query)
+            return self._rerank(query, retrieved, debug=debug)
+    
+    def retrieve_many(self, queries: List[str], debug: bool = False) -> List[List[Dict]]:
+        """
+        Récupération groupée avec re-ranking: un embedding et une recherche FAISS
+        pour l'ensemble des requêtes, puis reranking de chaque liste de résultats
+        
+        Args:
+            queries: Questions des utilisateurs
+            debug: Active les logs détaillés
+            
+        Returns:
+            Pour chaque requête, liste de chunks scorés et triés
+        """
+        with self.vector_store.reading():
+            retrieved_lists = self.retrieve_many_with_scores(queries)
+            return [
+                self._rerank(query, retrieved, debug=debug)
+                for query, retrieved in zip(queries, retrieved_lists)
+            ]
+    
+    def _rerank(self, query: str, retrieved: List[Tuple[LCDocument, float]], debug: bool) -> List[Dict]:
+        """Re-ranking hybride multi-critères d'une liste de chunks (Document, similarité)"""
+        # Filtrage par seuil de similarité avant tout scoring
+        kept = [
+            rank for rank, (_, similarity) in enumerate(retrieved)
+            if similarity >= self.similarity_threshold
+        ]
+        retrieved_docs = [retrieved[rank][0] for rank in kept]
+        similarities = np.array([retrieved[rank][1] for rank in kept])
+        
+        if len(retrieved_docs) < len(retrieved):
+            print(f"   ✂️ {len(retrieved) - len(retrieved_docs)} chunks sous le seuil "
+                  f"de similarité ({self.similarity_threshold})")
         
         if not retrieved_docs:
             return []
@@ -165,59 +281,36 @@ class Retriever:
         if debug:
             print(f"\n   🔑 Mots-clés extraits: {query_keywords}")
         
-        # 3. SCORING HYBRIDE
-        chunks_scored = []
+        # 3. SCORING HYBRIDE (vectorisé, à partir des tokens précalculés si disponibles)
+        query_terms = sorted(query_keywords)
+        batch, matches = self._candidate_batch(retrieved_docs, query_terms)
+        vector_scores = self._calculate_vector_score(similarities)
+        scores = self.reranker.score(query_terms, query_length, batch, vector_scores, matches)
+        chunk_lengths = batch.word_counts
         
-        for rank, doc in enumerate(retrieved_docs):
-            content = doc.page_content
-            chunk_length = len(content.split())
-            
-            # Calcul des 4 scores
-            vector_score = self._calculate_vector_score(rank)
-            lexical_score = self._calculate_lexical_score(query_keywords, content)
-            density_score = self._calculate_density_score(query_keywords, content)
-            length_score = self._calculate_length_score(chunk_length, query_length)
-            
-            # Score final pondéré
-            final_score = (
-                vector_score * self.weights['vector'] +
-                lexical_score * self.weights['lexical'] +
-                density_score * self.weights['density'] +
-                length_score * self.weights['length']
-            )
-            
-            # Filtrage par seuil minimal
-            if vector_score < self.similarity_threshold:
-                continue
-            
-            # Bonus si le chunk contient TOUS les mots-clés principaux
-            if query_keywords and all(
-                any(kw in word for word in self._normalize_text(content).split()) 
-                for kw in query_keywords
-            ):
-                final_score *= 1.1  # Boost de 10%
-            
-            chunk_data = {
-                'content': content,
+        # 4. TRI ET SÉLECTION FINALE (tri stable sur le score final arrondi)
+        rounded_final = {i: round(float(scores['final'][i]), 4) for i in range(len(retrieved_docs))}
+        ranking = sorted(rounded_final, key=rounded_final.get, reverse=True)
+        
+        final_chunks = []
+        for i in ranking[:self.final_k]:
+            doc = retrieved_docs[i]
+            final_chunks.append({
+                'content': doc.page_content,
                 'metadata': doc.metadata,
                 'scores': {
-                    'vector': round(vector_score, 4),
-                    'lexical': round(lexical_score, 4),
-                    'density': round(density_score, 4),
-                    'length': round(length_score, 4),
-                    'final': round(final_score, 4)
+                    'vector': round(float(scores['vector'][i]), 4),
+                    'lexical': round(float(scores['lexical'][i]), 4),
+                    'density': round(float(scores['density'][i]), 4),
+                    'length': round(float(scores['length'][i]), 4),
+                    'final': rounded_final[i]
                 },
-                'chunk_length': chunk_length,
-                'initial_rank': rank + 1
-            }
-            chunks_scored.append(chunk_data)
-        
-        # 4. TRI ET SÉLECTION FINALE
-        chunks_scored.sort(key=lambda x: x['scores']['final'], reverse=True)
-        final_chunks = chunks_scored[:self.final_k]
+                'chunk_length': int(chunk_lengths[i]),
+                'initial_rank': kept[i] + 1
+            })
         
         # 5. LOGS
-        print(f"   ✅ Reranking: {len(retrieved_docs)} → {len(final_chunks)} chunks")
+        print(f"   ✅ Reranking: {len(retrieved)} → {len(final_chunks)} chunks")
         
         if debug:
             print(f"\n   📊 Top {len(final_chunks)} chunks:")
@@ -0,0 +1,148 @@
+"""
+Dédoublonnage des calculs identiques en cours (« single flight »): quand plusieurs requêtes
+posent la même question en même temps, une seule exécute retrieval et génération, les
+autres attendent et reçoivent une copie de son résultat. Rien n'est conservé après la fin
+du calcul (cf. SemanticAnswerCache pour la réutilisation dans la durée).
+"""
+import copy
+import asyncio
+import logging
+import threading
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ponctuation et blancs ignorés en fin de question ("Frais ?" == "frais")
+_TRAILING = " \t\n?!.;,:"
+
+
+def normalize_text(text: str) -> str:
+    """Forme canonique d'une question: Unicode NFKC, casse ignorée, blancs réduits"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(text.split()).strip(_TRAILING)
+
+
+class _Call:
+    """Calcul en cours: résultat partagé et attentes (threads ou coroutines)"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.failed = False
+        self.followers = 0
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """
+    Un calcul à la fois par clé. Le premier appelant (leader) exécute la fonction; les
+    appelants suivants avec la même clé, threads (Flask) comme coroutines (ASGI), attendent
+    sa fin et reçoivent une copie du résultat.
+
+    Si le leader échoue ou abandonne (client déconnecté pendant le streaming), les appelants
+    en attente exécutent le calcul eux-mêmes: une erreur n'est jamais partagée.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def join(self, key: Hashable) -> Tuple[_Call, bool]:
+        """Rejoint le calcul en cours pour `key`, ou le crée (True: l'appelant en est le leader)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            self.leaders += 1
+            return call, True
+
+    def finish(self, key: Hashable, call: _Call, result: Any = None, failed: bool = False):
+        """Publie le résultat du leader (ou son échec) et réveille les appelants en attente"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            # Copie figée avant le retour au leader, qui peut ensuite modifier son résultat
+            call.result = copy.deepcopy(result) if call.followers and not failed else None
+            call.failed = failed
+            if not failed:
+                self.shared += call.followers
+            call.done.set()
+            waiters, call.waiters = call.waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def wait(self, call: _Call) -> Tuple[bool, Any]:
+        """Attend le leader: (True, copie du résultat), ou (False, None) s'il a échoué"""
+        call.done.wait()
+        return (False, None) if call.failed else (True, copy.deepcopy(call.result))
+
+    async def await_call(self, call: _Call) -> Tuple[bool, Any]:
+        """Équivalent de wait() sans bloquer la boucle d'événements"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not call.done.is_set():
+                future = loop.create_future()
+                call.waiters.append((loop, future))
+            else:
+                future = None
+        if future is not None:
+            await future
+        return (False, None) if call.failed else (True, copy.deepcopy(call.result))
+
+    def run(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """Exécute `func(*args, **kwargs)`, ou partage le résultat d'un appel identique en cours"""
+        call, leader = self.join(key)
+        if not leader:
+            ok, result = self.wait(call)
+            if ok:
+                return result
+            logger.info(f"Single flight {self.name}: leader en échec, calcul relancé")
+            return func(*args, **kwargs)
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            self.finish(key, call, failed=True)
+            raise
+        self.finish(key, call, result)
+        return result
+
+    async def arun(self, key: Hashable, func: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """Version asynchrone de run() (`func` est une fonction coroutine)"""
+        call, leader = self.join(key)
+        if not leader:
+            ok, result = await self.await_call(call)
+            if ok:
+                return result
+            logger.info(f"Single flight {self.name}: leader en échec, calcul relancé")
+            return await func(*args, **kwargs)
+
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException:
+            self.finish(key, call, failed=True)
+            raise
+        self.finish(key, call, result)
+        return result
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            in_flight = len(self._calls)
+        total = self.leaders + self.shared
+        return {
+            'leaders': self.leaders,
+            'shared': self.shared,
+            'in_flight': in_flight,
+            'shared_rate': round(self.shared / total, 4) if total else 0.0
+        }
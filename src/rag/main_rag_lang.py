@@ -1,4 +1,6 @@
+import os
 import sys
+import json
 from pathlib import Path
 
 # Importer les classes de la nouvelle structure
@@ -7,16 +9,44 @@ from src.rag.vectorstore.vector_store_lang import VectorStoreManager # <-- Nouve
 
 # --- Paramètres globaux de l'index FAISS ---
 FAISS_DIR = "vector_store_faiss"
+# Type d'index: flat (exact), ivf_flat, hnsw, ivf_pq — paramètres en JSON (ex: '{"nprobe": 16}')
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_INDEX_PARAMS = json.loads(os.getenv("FAISS_INDEX_PARAMS", "{}"))
+# Ouverture de l'index mappé en mémoire (lecture seule, pages partagées entre processus)
+FAISS_MMAP = os.getenv("FAISS_MMAP", "0") == "1"
+# Processus d'indexation (1 = séquentiel, 0 = un par cœur) et taille des lots d'embedding
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", "1"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+# Seuil de similarité des quasi-doublons écartés à l'indexation ("off" = pas de déduplication)
+DEDUP_THRESHOLD = os.getenv("DEDUP_THRESHOLD", "0.85")
+DEDUP_THRESHOLD = None if DEDUP_THRESHOLD == "off" else float(DEDUP_THRESHOLD)
+# Découpage: "chars" (estimation caractères/4) ou "tokens" (tokenizer du modèle d'embedding),
+# avec en mode tokens des spans de contexte séparés pour le LLM (CONTEXT_TOKENS, 0 = non)
+CHUNKING = os.getenv("CHUNKING", "chars")
+CONTEXT_TOKENS = int(os.getenv("CONTEXT_TOKENS", "0")) or None
+# Extracteur PDF: pypdf, pypdf-layout, pdfplumber, pymupdf, pdfminer (cf. bench-pdf)
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pypdf")
 # -------------------------------------------
 
-def index_documents(pdf_directory: str, web_directory: str ):
-    """Indexe tous les PDFs en utilisant l'IndexingPipeline FAISS."""
+def index_documents(pdf_directory: str, web_directory: str, full: bool = False):
+    """Indexe les PDFs et pages web (incrémental, ou complet avec full=True)."""
     print("\n INDEXATION DES DOCUMENTS")
     print("="*60)
     
     # 1. L'IndexingPipeline utilise maintenant VectorStoreManager (FAISS)
-    pipeline = IndexingPipeline(pdf_directory=pdf_directory, web_data_directory=web_directory)
-    pipeline.run_indexing()
+    pipeline = IndexingPipeline(
+        pdf_directory=pdf_directory,
+        web_data_directory=web_directory,
+        index_type=FAISS_INDEX_TYPE,
+        index_params=FAISS_INDEX_PARAMS,
+        workers=INDEX_WORKERS,
+        embedding_batch_size=EMBEDDING_BATCH_SIZE,
+        dedup_threshold=DEDUP_THRESHOLD,
+        token_chunking=CHUNKING == "tokens",
+        context_tokens=CONTEXT_TOKENS,
+        pdf_backend=PDF_BACKEND
+    )
+    pipeline.run_indexing(full=full)
     
     print("\n Indexation terminée et sauvegardée localement!")
 
@@ -72,7 +102,7 @@ def show_index_stats():
     print("="*60)
     
     # 1. Utilisation de VectorStoreManager (FAISS)
-    vector_store_manager = VectorStoreManager(index_directory=FAISS_DIR)
+    vector_store_manager = VectorStoreManager(index_directory=FAISS_DIR, mmap=FAISS_MMAP)
     
     if not vector_store_manager.load_index():
         print(f"\n❌ Erreur: Index FAISS non trouvé dans '{FAISS_DIR}'.")
@@ -84,17 +114,17 @@ def show_index_stats():
     # Nombre total de chunks (taille de la base FAISS)
     total_chunks = faiss_index.ntotal
     print(f" Total de chunks indexés: {total_chunks}")
+    metadata = vector_store_manager.index_metadata
+    print(f" Type d'index: {metadata.get('index_type', 'flat')} {metadata.get('index_params', {})}")
+    memory = vector_store_manager.memory_report()
+    print(f" Mémoire index.faiss ({'mmap' if memory['mmap'] else 'tas'}): "
+          f"fichier {memory['file_bytes'] / 1e6:.1f} Mo, mappé {(memory['mapped_bytes'] or 0) / 1e6:.1f} Mo, "
+          f"résident {(memory['resident_bytes'] or 0) / 1e6:.1f} Mo, chargé en {memory['load_seconds']:.3f}s")
     
     # Lister les sources (Extraction des métadonnées du DocumentStore de FAISS)
     try:
-        # FAISS stocke les documents dans un DocumentStore séparé
-        docstore_keys = vector_store_manager.vectorstore.docstore._dict.keys()
-        
-        # Le nombre de métadonnées extraites sera égal au nombre de chunks
-        doc_metadatas = [
-            doc.metadata 
-            for doc in vector_store_manager.vectorstore.docstore._dict.values()
-        ]
+        # Métadonnées de chaque chunk (stockage compact ou ancien docstore picklé)
+        doc_metadatas = vector_store_manager.chunk_metadatas()
         
         if doc_metadatas:
             sources = set(meta.get('source', 'Unknown') for meta in doc_metadatas)
@@ -109,30 +139,200 @@ def show_index_stats():
     print(f"\n Localisation: ./{FAISS_DIR}/")
 
 
+def build_lexical_index():
+    """Construit l'index lexical d'un index FAISS existant (sans ré-embedding)."""
+    print("\n CONSTRUCTION DE L'INDEX LEXICAL")
+    print("="*60)
+    
+    vector_store_manager = VectorStoreManager(index_directory=FAISS_DIR)
+    if not vector_store_manager.load_index():
+        print(f"\n❌ Erreur: Index FAISS non trouvé dans '{FAISS_DIR}'.")
+        return
+    
+    lexical_index = vector_store_manager.rebuild_lexical_index()
+    print(f" {len(lexical_index)} chunks, {len(lexical_index.vocab)} tokens distincts")
+    print(f" Version publiée: {vector_store_manager.version}")
+    print(f"\n Localisation: {vector_store_manager.index_directory}/")
+
+
+def migrate_chunk_store():
+    """Convertit le docstore picklé (index.pkl) d'un index existant en stockage compact."""
+    print("\n MIGRATION DU DOCSTORE")
+    print("="*60)
+    
+    vector_store_manager = VectorStoreManager(index_directory=FAISS_DIR)
+    if not vector_store_manager.load_index():
+        print(f"\n❌ Erreur: Index FAISS non trouvé dans '{FAISS_DIR}'.")
+        return
+    if vector_store_manager.chunk_store is not None:
+        print(" L'index utilise déjà le stockage compact des chunks.")
+        return
+    
+    chunk_store = vector_store_manager.save_chunk_store()
+    print(f" {len(chunk_store)} chunks, {len(chunk_store.texts) / 1e6:.1f} Mo de texte, "
+          f"{len(chunk_store.columns)} colonnes de métadonnées")
+    print(f" Version publiée: {vector_store_manager.version}")
+    print(f"\n Localisation: {vector_store_manager.index_directory}/chunk_store/")
+
+
+def benchmark_index(k: int = 10, n_queries: int = 200):
+    """Compare les types d'index FAISS (recall@k vs index exact, latences p50/p99)."""
+    import numpy as np
+    from src.rag.vectorstore.faiss_indexes import benchmark_index_types
+    
+    print("\n BENCHMARK DES INDEX FAISS")
+    print("="*60)
+    
+    vector_store_manager = VectorStoreManager(index_directory=FAISS_DIR)
+    if not vector_store_manager.load_index():
+        print(f"\n❌ Erreur: Index FAISS non trouvé dans '{FAISS_DIR}'.")
+        return
+    
+    index = vector_store_manager.vectorstore.index
+    vectors = index.reconstruct_n(0, index.ntotal)
+    
+    # Requêtes: vecteurs du corpus légèrement bruités (proches d'une vraie question)
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)]
+    noise_scale = 0.1 * np.linalg.norm(vectors, axis=1).mean() / np.sqrt(vectors.shape[1])
+    queries = sample + rng.normal(scale=noise_scale, size=sample.shape).astype(np.float32)
+    
+    configs = [
+        ("flat", None),
+        ("ivf_flat", {"nprobe": 4}),
+        ("ivf_flat", {"nprobe": 16}),
+        ("hnsw", {"efSearch": 32}),
+        ("hnsw", {"efSearch": 128}),
+        ("ivf_pq", {"nprobe": 16}),
+    ]
+    report = benchmark_index_types(vectors, queries, configs, k=k)
+    
+    print(f" {len(vectors)} vecteurs, {len(queries)} requêtes, k={k}\n")
+    print(f" {'type':<10} {'recall@' + str(k):>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'build (s)':>10}  params")
+    for row in report:
+        print(f" {row['index_type']:<10} {row[f'recall@{k}']:>10} {row['p50_ms']:>10} "
+              f"{row['p99_ms']:>10} {row['build_s']:>10}  {row['params']}")
+
+
+def benchmark_pdf(pdf_directory: str = "data/pdf", output_dir: str = None):
+    """Compare les extracteurs PDF installés (pages/s, mémoire, caractères, lignes en colonnes)."""
+    from src.rag.document_processing.pdf_loader_lang import PDFLoader
+    from src.rag.document_processing.pdf_backends import benchmark_pdf_backends
+    
+    print("\n BENCHMARK DES EXTRACTEURS PDF")
+    print("="*60)
+    
+    paths = PDFLoader(directory_path=pdf_directory).list_pdfs()
+    if not paths:
+        print(f"\n❌ Erreur: aucun PDF dans '{pdf_directory}'.")
+        return
+    size_mb = sum(os.path.getsize(path) for path in paths) / 1e6
+    print(f" {len(paths)} PDFs ({size_mb:.1f} Mo)\n")
+    
+    report = benchmark_pdf_backends(paths, output_dir=output_dir)
+    if not report:
+        print(" Aucun extracteur PDF installé (pip install pypdf pdfplumber pymupdf pdfminer.six).")
+        return
+    print(f" {'extracteur':<14} {'pages':>6} {'pages/s':>9} {'caractères':>11} {'colonnes':>9} {'pic (Mo)':>9} {'+Mo':>7}")
+    for row in report:
+        if 'pages' in row:
+            print(f" {row['backend']:<14} {row['pages']:>6} {row['pages_per_s']:>9} {row['chars']:>11} "
+                  f"{row['column_lines']:>9} {row['peak_mb']:>9} {row['extra_mb']:>7}")
+        for error in row['errors']:
+            print(f"   ⚠️ {row['backend']}: {error}")
+    print("\n colonnes: lignes d'au moins 3 cellules séparées par plusieurs espaces (tableaux restés alignés)")
+    if output_dir:
+        print(f" Texte extrait: {os.path.join(output_dir, '<extracteur>')}/")
+
+
+def benchmark_cleaner(web_directory: str = "data/scraping", repeat: int = 5):
+    """Compare le TextCleaner compilé au nettoyage historique sur le corpus web (durée, identité)."""
+    from src.rag.document_processing.web_scrapper_loader import WebScraperLoader
+    from src.rag.document_processing.text_cleaner import benchmark_text_cleaner
+    
+    print("\n BENCHMARK DU NETTOYAGE")
+    print("="*60)
+    
+    texts = [doc.page_content for doc in WebScraperLoader(data_folder=web_directory).load_all_scraped_data()]
+    if not texts:
+        print(f"\n❌ Erreur: aucune page web dans '{web_directory}'.")
+        return
+    
+    report = benchmark_text_cleaner(texts, repeat=repeat)
+    print(f"\n {report['texts']} textes, {report['chars'] / 1e6:.1f} M caractères (meilleur de {repeat})")
+    print(f"   - Nettoyage historique: {report['reference_s'] * 1000:.1f} ms")
+    print(f"   - clean():              {report['clean_s'] * 1000:.1f} ms")
+    print(f"   - clean_many():         {report['clean_many_s'] * 1000:.1f} ms  (x{report['speedup']})")
+    print(f"   - Résultats différents: {report['mismatches']}")
+
+
+def list_versions():
+    """Affiche les versions publiées de l'index (la version servie est marquée *)."""
+    from src.rag.vectorstore.index_versions import IndexVersions
+    
+    print("\n VERSIONS DE L'INDEX")
+    print("="*60)
+    
+    versions = IndexVersions(FAISS_DIR)
+    current = versions.current()
+    entries = versions.list()
+    if not entries:
+        print(f"\n Aucune version publiée dans '{FAISS_DIR}' (index non versionné ou absent).")
+        return
+    for entry in entries:
+        marker = "*" if entry['version'] == current else " "
+        print(f" {marker} {entry['version']}  {entry['published_at'][:19]}  "
+              f"{entry.get('chunks', '?'):>6} chunks  {entry.get('index_type', '')}")
+
+
+def rollback_index(version: str):
+    """Republie une version précédente de l'index (chargée à chaud par les serveurs)."""
+    from src.rag.vectorstore.index_versions import IndexVersions
+    
+    versions = IndexVersions(FAISS_DIR)
+    entry = next((entry for entry in versions.list() if entry['version'] == version), None)
+    if entry is None or not os.path.isdir(versions.path(version)):
+        print(f"\n❌ Erreur: version inconnue ou supprimée: {version}")
+        return
+    versions.publish(version, {k: v for k, v in entry.items() if k not in ('version', 'published_at')})
+    print(f"\n Version {version} publiée ({entry.get('chunks', '?')} chunks).")
+
+
 def main():
     """Point d'entrée principal"""
     
     if len(sys.argv) < 2:
         print("Usage:")
-        print(" python -m src.rag.main_rag index <pdf_directory> # Indexer les PDFs")
+        print(" python -m src.rag.main_rag index <pdf_directory> [--full] # Indexer (incrémental, --full = tout reconstruire)")
         print(" python -m src.rag.main_rag chat # Lancer le chatbot")
         print(" python -m src.rag.main_rag stats # Voir les stats") 
+        print(" python -m src.rag.main_rag lexical # Construire l'index lexical") 
+        print(" python -m src.rag.main_rag bench-index # Comparer les types d'index FAISS") 
+        print(" python -m src.rag.main_rag chunkstore # Migrer index.pkl vers le stockage compact") 
+        print(" python -m src.rag.main_rag bench-pdf [pdf_directory] [--dump <dir>] # Comparer les extracteurs PDF") 
+        print(" python -m src.rag.main_rag bench-clean [web_directory] # Mesurer le nettoyage du texte") 
+        print(" python -m src.rag.main_rag versions # Lister les versions publiées de l'index") 
+        print(" python -m src.rag.main_rag rollback <version> # Republier une version précédente") 
         sys.exit(1)
     
     command = sys.argv[1]
     
     if command == "index":
+        full = "--full" in sys.argv
+        args = [arg for arg in sys.argv[2:] if arg != "--full"]
+        
         # Dossier PDF optionnel (défaut: data/pdf)
-        pdf_directory = sys.argv[2] if len(sys.argv) > 2 else "data/pdf"
+        pdf_directory = args[0] if len(args) > 0 else "data/pdf"
         
         # Dossier web optionnel (défaut: data/autres)
-        web_directory = sys.argv[3] if len(sys.argv) > 3 else "data/scraping"
+        web_directory = args[1] if len(args) > 1 else "data/scraping"
         
         print(f"> Indexation:")
         print(f"   - PDFs: {pdf_directory}")
         print(f"   - Web: {web_directory}")
+        print(f"   - Mode: {'complet' if full else 'incrémental'}")
         
-        index_documents(pdf_directory, web_directory=web_directory)
+        index_documents(pdf_directory, web_directory=web_directory, full=full)
     
     elif command == "chat":
         run_chat()
@@ -140,6 +340,36 @@ def main():
     elif command == "stats": 
         show_index_stats()
     
+    elif command == "lexical":
+        build_lexical_index()
+    
+    elif command == "bench-index":
+        benchmark_index()
+    
+    elif command == "chunkstore":
+        migrate_chunk_store()
+    
+    elif command == "bench-pdf":
+        args = sys.argv[2:]
+        output_dir = None
+        if "--dump" in args:
+            position = args.index("--dump")
+            output_dir = args[position + 1] if position + 1 < len(args) else "data/cache/pdf_benchmark"
+            del args[position:position + 2]
+        benchmark_pdf(args[0] if args else "data/pdf", output_dir=output_dir)
+    
+    elif command == "bench-clean":
+        benchmark_cleaner(sys.argv[2] if len(sys.argv) > 2 else "data/scraping")
+    
+    elif command == "versions":
+        list_versions()
+    
+    elif command == "rollback":
+        if len(sys.argv) < 3:
+            print(" Usage: python -m src.rag.main_rag rollback <version>")
+            sys.exit(1)
+        rollback_index(sys.argv[2])
+    
     else:
         print(f" Commande inconnue: {command}")
         sys.exit(1)
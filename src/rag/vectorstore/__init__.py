@@ -2,4 +2,4 @@
 
 Avoid importing heavy submodules at package import time. Import submodules explicitly.
 """
-__all__ = ["VectorStoreManager"]
+__all__ = ["VectorStoreManager", "LexicalIndex", "BM25Index", "ChunkStore", "IndexVersions"]
@@ -0,0 +1,81 @@
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src.rag.generation.reranker import split_words
+from src.rag.vectorstore.lexical_index import LexicalIndex
+
+logger = logging.getLogger(__name__)
+
+# Mots vides ignorés dans les requêtes BM25 (l'IDF pénalise déjà les mots fréquents)
+STOPWORDS = {
+    'le', 'la', 'les', 'l', 'un', 'une', 'des', 'de', 'du', 'd',
+    'et', 'ou', 'mais', 'dans', 'pour', 'avec', 'sur', 'par', 'en', 'au', 'aux',
+    'est', 'sont', 'a', 'ont', 'ce', 'cet', 'cette', 'ces', 'qui', 'que', 'qu',
+    'the', 'is', 'are', 'to', 'of', 'and', 'in'
+}
+
+
+class BM25Index:
+    """
+    Index inversé BM25 sur les chunks de l'index FAISS.
+
+    Construit en mémoire à partir des tokens de l'index lexical (aucune re-tokenisation):
+    pour chaque token du vocabulaire, la liste des chunks qui le contiennent et sa fréquence.
+    """
+
+    def __init__(self, lexical_index: LexicalIndex, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = lexical_index.doc_ids
+        self.token_of: Dict[str, int] = {token: i for i, token in enumerate(lexical_index.vocab)}
+
+        n_docs = len(lexical_index)
+        n_vocab = len(lexical_index.vocab)
+        doc_lengths = np.diff(lexical_index.token_offsets)
+        rows = np.repeat(np.arange(n_docs, dtype=np.int64), doc_lengths)
+
+        # Paires (token, chunk) uniques avec leur fréquence, triées par token
+        keys, tfs = np.unique(lexical_index.token_ids.astype(np.int64) * n_docs + rows, return_counts=True)
+        self.posting_rows = keys % n_docs
+        self.posting_tfs = tfs.astype(np.float32)
+        self.posting_offsets = np.searchsorted(keys // n_docs, np.arange(n_vocab + 1))
+
+        doc_freqs = np.diff(self.posting_offsets)
+        self.idf = np.log(1.0 + (n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+        avg_length = doc_lengths.mean() if n_docs else 0.0
+        self.length_norm = k1 * (1.0 - b + b * doc_lengths / max(avg_length, 1e-9))
+
+        logger.info(f"Index BM25 construit: {n_docs} chunks, {len(keys)} postings")
+
+    def query_tokens(self, query: str) -> List[int]:
+        """Identifiants des tokens de la requête présents dans le vocabulaire"""
+        tokens = [t for part in split_words(query.lower().split()) for t in part]
+        return sorted({self.token_of[t] for t in tokens if t not in STOPWORDS and t in self.token_of})
+
+    def search(self, query: str, top_k: int = 20) -> List[Tuple[str, float]]:
+        """
+        Args:
+            query: Requête utilisateur
+            top_k: Nombre de chunks à retourner
+
+        Returns:
+            Liste (id du docstore, score BM25) triée par score décroissant
+        """
+        token_ids = self.query_tokens(query)
+        if not token_ids or top_k <= 0:
+            return []
+
+        scores = np.zeros(len(self.doc_ids), dtype=np.float64)
+        for token_id in token_ids:
+            start, end = self.posting_offsets[token_id], self.posting_offsets[token_id + 1]
+            rows = self.posting_rows[start:end]
+            tfs = self.posting_tfs[start:end]
+            scores[rows] += self.idf[token_id] * tfs * (self.k1 + 1.0) / (tfs + self.length_norm[rows])
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(self.doc_ids[row], float(scores[row])) for row in candidates]
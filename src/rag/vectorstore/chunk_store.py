@@ -0,0 +1,221 @@
+import os
+import json
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document as LCDocument
+
+logger = logging.getLogger(__name__)
+
+CHUNK_STORE_DIRNAME = "chunk_store"
+CHUNK_STORE_FORMAT = 1
+
+
+class ChunkStore:
+    """
+    Stockage compact des chunks de l'index FAISS (remplace le docstore picklé `index.pkl`).
+
+    - `texts.bin`: tous les textes concaténés en UTF-8, `offsets.npy` les bornes de chaque chunk
+    - métadonnées en colonnes "internées": chaque colonne garde ses valeurs distinctes une
+      seule fois et `codes.npy` (chunks × colonnes) l'indice de la valeur (-1 = absente)
+    - `layouts`: ordre des clés de métadonnées de chaque chunk (lui aussi interné)
+
+    Les tableaux sont mappés en mémoire: seuls les chunks lus (résultats de recherche)
+    sont décodés, et les pages sont partagées entre processus.
+    Écriture: cf. ChunkStoreWriter.
+    """
+
+    def __init__(
+        self,
+        doc_ids: List[str],
+        texts: np.ndarray,
+        offsets: np.ndarray,
+        columns: List[str],
+        values: List[List[Any]],
+        codes: np.ndarray,
+        layouts: List[List[int]],
+        layout_codes: np.ndarray
+    ):
+        self.doc_ids = doc_ids
+        self.texts = texts
+        self.offsets = offsets
+        self.columns = columns
+        self.values = values
+        self.codes = codes
+        self.layouts = layouts
+        self.layout_codes = layout_codes
+
+        self.row_of: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(doc_ids)}
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, CHUNK_STORE_DIRNAME, "meta.json"))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> Optional["ChunkStore"]:
+        """Charge le stockage s'il existe (tableaux mappés en lecture seule si `mmap`)"""
+        path = os.path.join(directory, CHUNK_STORE_DIRNAME)
+        if not cls.exists(directory):
+            return None
+
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != CHUNK_STORE_FORMAT:
+            logger.warning(f"Format du stockage des chunks obsolète ignoré: {path}")
+            return None
+
+        mmap_mode = "r" if mmap else None
+        texts_path = os.path.join(path, "texts.bin")
+        if os.path.getsize(texts_path) == 0:
+            texts = np.zeros(0, dtype=np.uint8)
+        elif mmap:
+            texts = np.memmap(texts_path, dtype=np.uint8, mode="r")
+        else:
+            texts = np.fromfile(texts_path, dtype=np.uint8)
+
+        return cls(
+            doc_ids=meta["doc_ids"],
+            texts=texts,
+            offsets=np.load(os.path.join(path, "offsets.npy"), mmap_mode=mmap_mode),
+            columns=meta["columns"],
+            values=meta["values"],
+            codes=np.load(os.path.join(path, "codes.npy"), mmap_mode=mmap_mode),
+            layouts=meta["layouts"],
+            layout_codes=np.load(os.path.join(path, "layout_codes.npy"), mmap_mode=mmap_mode)
+        )
+
+    def text(self, row: int) -> str:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self.texts[start:end].tobytes().decode("utf-8")
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        codes = self.codes[row]
+        return {
+            self.columns[column]: self.values[column][codes[column]]
+            for column in self.layouts[self.layout_codes[row]]
+        }
+
+    def document(self, row: int) -> LCDocument:
+        return LCDocument(id=self.doc_ids[row], page_content=self.text(row), metadata=self.metadata(row))
+
+    def get(self, doc_id: str) -> Optional[LCDocument]:
+        row = self.row_of.get(doc_id)
+        return None if row is None else self.document(row)
+
+    def column(self, name: str, default: Any = None) -> List[Any]:
+        """Valeurs d'une colonne de métadonnées pour tous les chunks (sans décoder les textes)"""
+        if name not in self.columns:
+            return [default] * len(self)
+        column = self.columns.index(name)
+        table = self.values[column]
+        return [table[code] if code >= 0 else default for code in self.codes[:, column]]
+
+
+class ChunkStoreWriter:
+    """
+    Écriture en flux d'un ChunkStore: les textes sont ajoutés au fichier au fur et à
+    mesure, seuls les codes de métadonnées (entiers) restent en mémoire.
+
+    Tous les fichiers sont écrits sous un nom temporaire puis renommés par `close()`
+    (meta.json en dernier): les processus qui ont mappé l'ancienne version continuent
+    de lire des données cohérentes.
+    """
+
+    FILES = ("texts.bin", "offsets.npy", "codes.npy", "layout_codes.npy", "meta.json")
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, CHUNK_STORE_DIRNAME)
+        os.makedirs(self.path, exist_ok=True)
+
+        self.doc_ids: List[str] = []
+        self._offsets: List[int] = [0]
+        self._column_of: Dict[str, int] = {}
+        self._value_codes: List[Dict[str, int]] = []
+        self._values: List[List[Any]] = []
+        self._layout_of: Dict[tuple, int] = {}
+        self._rows: List[Dict[int, int]] = []
+        self._layout_codes: List[int] = []
+        self._texts = open(self._tmp("texts.bin"), "wb")
+
+    def _tmp(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.tmp")
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, doc_id: str, document: LCDocument):
+        encoded = document.page_content.encode("utf-8")
+        self._texts.write(encoded)
+        self._offsets.append(self._offsets[-1] + len(encoded))
+        self.doc_ids.append(doc_id)
+
+        row = {}
+        for key, value in document.metadata.items():
+            if key not in self._column_of:
+                self._column_of[key] = len(self._column_of)
+                self._value_codes.append({})
+                self._values.append([])
+            column = self._column_of[key]
+            # Clé JSON: distingue 1 / 1.0 / "1" / True tout en acceptant les listes
+            value_key = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+            code = self._value_codes[column].get(value_key)
+            if code is None:
+                code = self._value_codes[column][value_key] = len(self._values[column])
+                self._values[column].append(value)
+            row[column] = code
+        self._rows.append(row)
+        layout = tuple(self._column_of[key] for key in document.metadata)
+        self._layout_codes.append(self._layout_of.setdefault(layout, len(self._layout_of)))
+
+    def close(self) -> str:
+        """Finalise l'écriture et publie la nouvelle version"""
+        self._texts.close()
+
+        codes = np.full((len(self._rows), len(self._column_of)), -1, dtype=np.int32)
+        for i, row in enumerate(self._rows):
+            codes[i, list(row)] = list(row.values())
+
+        with open(self._tmp("offsets.npy"), "wb") as f:
+            np.save(f, np.asarray(self._offsets, dtype=np.int64))
+        with open(self._tmp("codes.npy"), "wb") as f:
+            np.save(f, codes)
+        with open(self._tmp("layout_codes.npy"), "wb") as f:
+            np.save(f, np.asarray(self._layout_codes, dtype=np.int32))
+        with open(self._tmp("meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "format_version": CHUNK_STORE_FORMAT,
+                "doc_ids": self.doc_ids,
+                "columns": list(self._column_of),
+                "values": self._values,
+                "layouts": [list(layout) for layout in self._layout_of]
+            }, f, ensure_ascii=False, default=str)
+
+        for name in self.FILES:
+            os.replace(self._tmp(name), os.path.join(self.path, name))
+
+        logger.info(f"Stockage des chunks sauvegardé: {self.path} ({len(self)} chunks, {self._offsets[-1]} octets de texte)")
+        return self.path
+
+    def abort(self):
+        self._texts.close()
+        for name in self.FILES:
+            if os.path.exists(self._tmp(name)):
+                os.remove(self._tmp(name))
+
+
+class ChunkDocstore(Docstore):
+    """Docstore LangChain en lecture seule adossé à un ChunkStore (Documents construits à la demande)"""
+
+    def __init__(self, store: ChunkStore):
+        self.store = store
+
+    def search(self, search: str) -> Union[str, LCDocument]:
+        document = self.store.get(search)
+        if document is None:
+            return f"ID {search} not found."
+        return document
@@ -0,0 +1,142 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 32  # sha256 du texte du chunk
+
+
+class EmbeddingCache:
+    """
+    Cache disque des embeddings de chunks, clé = (modèle, sha256 du texte).
+
+    Un sous-dossier par modèle contient:
+    - `vectors.f32`: matrice float32 (n × d) en ajout seul, lue via mmap
+    - `keys.bin`: les n empreintes (32 octets) dans le même ordre, qui servent d'index
+    - `meta.json`: nom du modèle et dimension
+
+    Les vecteurs sont écrits avant les clés: après une interruption, les lignes
+    sans clé sont retirées au chargement.
+    """
+
+    def __init__(self, directory: str, model_name: str):
+        self.model_name = model_name
+        self.path = os.path.join(directory, hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:16])
+        self.dimension: Optional[int] = None
+
+        self._row_of: Dict[bytes, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+
+        self._load()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        meta_path = self._file("meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model_name") != self.model_name:
+            logger.warning(f"Cache d'embeddings d'un autre modèle ignoré: {self.path}")
+            return
+
+        self.dimension = meta["dimension"]
+        keys_path, vectors_path = self._file("keys.bin"), self._file("vectors.f32")
+        keys = np.fromfile(keys_path, dtype=np.uint8) if os.path.exists(keys_path) else np.zeros(0, dtype=np.uint8)
+        row_bytes = 4 * self.dimension
+        n_vectors = os.path.getsize(vectors_path) // row_bytes if os.path.exists(vectors_path) else 0
+        n_rows = min(len(keys) // KEY_BYTES, n_vectors)
+
+        # Écriture interrompue: on retire les lignes incomplètes pour garder les deux fichiers alignés
+        for path, size in ((keys_path, n_rows * KEY_BYTES), (vectors_path, n_rows * row_bytes)):
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                os.truncate(path, size)
+
+        keys = keys[:n_rows * KEY_BYTES].reshape(-1, KEY_BYTES)
+        self._row_of = {key.tobytes(): row for row, key in enumerate(keys)}
+        logger.info(f"Cache d'embeddings chargé: {len(self._row_of)} vecteurs ({self.path})")
+
+    def _matrix(self) -> np.ndarray:
+        """Matrice des vecteurs mappée en lecture seule (re-mappée après chaque ajout)"""
+        if self._vectors is None or len(self._vectors) < len(self._row_of):
+            self._vectors = np.memmap(
+                self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(len(self._row_of), self.dimension)
+            )
+        return self._vectors
+
+    def get_many(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """
+        Returns:
+            (vecteur ou None pour chaque texte, indices des textes absents du cache)
+        """
+        rows = [self._row_of.get(self.key(text)) for text in texts]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        found = [i for i, row in enumerate(rows) if row is not None]
+        if found:
+            matrix = self._matrix()
+            block = np.asarray(matrix[np.asarray([rows[i] for i in found])], dtype=np.float32)
+            for i, vector in zip(found, block):
+                vectors[i] = vector
+        return vectors, missing
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Ajoute les embeddings des textes qui ne sont pas encore en cache"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._file("meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"model_name": self.model_name, "dimension": self.dimension}, f)
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Dimension {vectors.shape[1]} incompatible avec le cache ({self.dimension})")
+
+        new_keys, new_rows = [], []
+        seen = set()
+        for i, text in enumerate(texts):
+            key = self.key(text)
+            if key not in self._row_of and key not in seen:
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(i)
+        if not new_keys:
+            return
+
+        with open(self._file("vectors.f32"), "ab") as f:
+            f.write(np.ascontiguousarray(vectors[new_rows]).tobytes())
+        with open(self._file("keys.bin"), "ab") as f:
+            f.write(b"".join(new_keys))
+
+        start = len(self._row_of)
+        for offset, key in enumerate(new_keys):
+            self._row_of[key] = start + offset
+
+    def get_stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._row_of),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_METADATA_FILENAME = "index_metadata.json"
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# Paramètres par défaut de chaque type d'index (nlist=None => choisi selon la taille du corpus)
+DEFAULT_INDEX_PARAMS = {
+    "flat": {},
+    "ivf_flat": {"nlist": None, "nprobe": 8},
+    "hnsw": {"M": 32, "efConstruction": 200, "efSearch": 64},
+    "ivf_pq": {"nlist": None, "nprobe": 16, "m": 48, "nbits": 8},
+}
+
+# Paramètres modifiables au chargement (sans reconstruire l'index)
+SEARCH_PARAMS = ("nprobe", "efSearch")
+
+
+def resolve_index_params(index_type: str, params: Optional[Dict], n_vectors: int) -> Dict:
+    """Complète les paramètres avec les valeurs par défaut du type d'index"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Type d'index inconnu: {index_type} (attendus: {', '.join(INDEX_TYPES)})")
+
+    resolved = dict(DEFAULT_INDEX_PARAMS[index_type])
+    resolved.update(params or {})
+    if "nlist" in resolved and not resolved["nlist"]:
+        # Règle usuelle: ~4·sqrt(n) listes, au moins 39 vecteurs d'entraînement par liste
+        resolved["nlist"] = int(max(1, min(4 * np.sqrt(n_vectors), n_vectors // 39)))
+    return resolved
+
+
+def build_faiss_index(vectors: np.ndarray, index_type: str = "flat", params: Optional[Dict] = None) -> Tuple[faiss.Index, Dict]:
+    """
+    Construit (entraîne + remplit) un index FAISS L2 du type demandé.
+
+    Returns:
+        (index, paramètres effectivement utilisés)
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n_vectors, dimension = vectors.shape
+    params = resolve_index_params(index_type, params, n_vectors)
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, params["M"])
+        index.hnsw.efConstruction = params["efConstruction"]
+    elif index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, params["nlist"])
+    else:
+        if dimension % params["m"] != 0:
+            raise ValueError(f"ivf_pq: m={params['m']} doit diviser la dimension {dimension}")
+        index = faiss.IndexIVFPQ(
+            faiss.IndexFlatL2(dimension), dimension, params["nlist"], params["m"], params["nbits"]
+        )
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    apply_search_params(index, params)
+    return index, params
+
+
+def apply_search_params(index: faiss.Index, params: Dict):
+    """
+    Applique nprobe / efSearch et active la table d'accès direct des index IVF
+    (nécessaire pour reconstruire les vecteurs et calculer la similarité cosinus)
+    """
+    space = faiss.ParameterSpace()
+    for name in SEARCH_PARAMS:
+        if params.get(name) is not None:
+            try:
+                space.set_index_parameter(index, name, params[name])
+            except RuntimeError:
+                pass  # Paramètre sans objet pour ce type d'index
+
+    try:
+        faiss.extract_index_ivf(index).make_direct_map()
+    except RuntimeError:
+        pass  # Pas un index IVF
+
+
+# Mapping mémoire de tous les types d'index (absent de faiss 1.7.x: IO_FLAG_MMAP n'y
+# concerne que les listes inversées sur disque)
+IO_FLAG_MMAP_IFC = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+
+
+def read_index_mmap(path: str) -> faiss.Index:
+    """
+    Ouvre un index FAISS en lecture seule et mappé en mémoire: les vecteurs restent
+    dans le cache de pages du système, partagé par tous les processus de la machine.
+    Version de faiss sans IO_FLAG_MMAP_IFC: lecture classique (index copié en mémoire).
+    """
+    if IO_FLAG_MMAP_IFC is None:
+        logger.warning(
+            f"faiss {faiss.__version__} ne permet pas de mapper l'index en mémoire "
+            f"(IO_FLAG_MMAP_IFC absent): lecture classique de {path}"
+        )
+        return faiss.read_index(path)
+    return faiss.read_index(path, IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+
+
+def mapped_file_usage(path: str) -> Dict:
+    """
+    Taille mappée et taille résidente (octets) des mappings du fichier dans le
+    processus courant, lues dans /proc/self/smaps (Linux uniquement)
+    """
+    usage = {"mapped_bytes": 0, "resident_bytes": 0}
+    real_path = os.path.realpath(path)
+    try:
+        with open("/proc/self/smaps", "r") as f:
+            in_mapping = False
+            for line in f:
+                fields = line.split()
+                if "-" in fields[0] and len(fields) >= 5:
+                    # En-tête d'un mapping: "adresse perms offset dev inode [chemin]"
+                    in_mapping = len(fields) >= 6 and fields[5] == real_path
+                elif in_mapping and fields[0] in ("Size:", "Rss:"):
+                    key = "mapped_bytes" if fields[0] == "Size:" else "resident_bytes"
+                    usage[key] += int(fields[1]) * 1024
+    except OSError:
+        return {"mapped_bytes": None, "resident_bytes": None}
+    return usage
+
+
+def save_index_metadata(directory: str, metadata: Dict):
+    path = os.path.join(directory, INDEX_METADATA_FILENAME)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+
+def load_index_metadata(directory: str) -> Dict:
+    """Métadonnées de l'index (un index sans métadonnées est un index 'flat')"""
+    path = os.path.join(directory, INDEX_METADATA_FILENAME)
+    if not os.path.exists(path):
+        return {"index_type": "flat", "index_params": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def index_metadata(index: faiss.Index, index_type: str, params: Dict, embedding_model: str) -> Dict:
+    return {
+        "index_type": index_type,
+        "index_params": params,
+        "embedding_model": embedding_model,
+        "dimension": index.d,
+        "ntotal": index.ntotal,
+        "created_at": datetime.now().isoformat(),
+    }
+
+
+def benchmark_index_types(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    configs: List[Tuple[str, Optional[Dict]]],
+    k: int = 10
+) -> List[Dict]:
+    """
+    Compare des types d'index à l'index exact (flat): recall@k et latence par requête.
+
+    Args:
+        vectors: Vecteurs du corpus
+        queries: Vecteurs de requêtes
+        configs: Liste (type d'index, paramètres)
+        k: Nombre de voisins
+
+    Returns:
+        Une ligne de rapport par configuration
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    exact, _ = build_faiss_index(vectors, "flat")
+    _, truth = exact.search(queries, k)
+
+    report = []
+    for index_type, params in configs:
+        start = time.perf_counter()
+        index, resolved = build_faiss_index(vectors, index_type, params)
+        build_seconds = time.perf_counter() - start
+
+        latencies = []
+        found = np.empty_like(truth)
+        for i in range(len(queries)):
+            t0 = time.perf_counter()
+            _, found[i:i + 1] = index.search(queries[i:i + 1], k)
+            latencies.append(time.perf_counter() - t0)
+
+        hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+        latencies_ms = np.array(latencies) * 1000
+        report.append({
+            "index_type": index_type,
+            "params": resolved,
+            f"recall@{k}": round(hits / truth.size, 4),
+            "p50_ms": round(float(np.percentile(latencies_ms, 50)), 4),
+            "p99_ms": round(float(np.percentile(latencies_ms, 99)), 4),
+            "build_s": round(build_seconds, 3),
+        })
+    return report
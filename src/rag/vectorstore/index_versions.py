@@ -0,0 +1,188 @@
+import os
+import json
+import shutil
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILENAME = "CURRENT"
+VERSIONS_DIRNAME = "versions"
+VERSIONS_MANIFEST_FILENAME = "versions.json"
+
+
+def _link_or_copy(source: str, destination: str):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+class IndexVersions:
+    """
+    Versions de l'index dans le dossier racine (ex: vector_store_faiss/):
+
+    - `versions/<version>/`: un index complet par construction (index.faiss, chunk_store/,
+      index_meta.json, lexical_index.npz, manifest.json), jamais modifié une fois publié
+    - `versions.json`: historique des versions publiées (date, nombre de chunks, type d'index...)
+    - `CURRENT`: nom de la version servie, remplacé atomiquement (écriture puis renommage)
+
+    Sans fichier CURRENT, l'index est lu à la racine (ancienne disposition, non versionnée).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def path(self, version: str) -> str:
+        return os.path.join(self.root, VERSIONS_DIRNAME, version)
+
+    def current(self) -> Optional[str]:
+        """Version publiée, ou None (pas encore de version: index à la racine)"""
+        try:
+            with open(self._file(CURRENT_FILENAME), "r", encoding="utf-8") as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version if version and os.path.isdir(self.path(version)) else None
+
+    def current_path(self) -> str:
+        version = self.current()
+        return self.path(version) if version else self.root
+
+    def create(self) -> Tuple[str, str]:
+        """Crée le dossier d'une nouvelle version (non publiée)"""
+        version = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        path = self.path(version)
+        os.makedirs(path)
+        return version, path
+
+    def derive(self, source: str, exclude: Tuple[str, ...] = ()) -> Tuple[str, str]:
+        """
+        Crée une nouvelle version (non publiée) à partir des fichiers de `source` (version
+        servie ou index à la racine), sauf `exclude`: liens physiques quand c'est possible
+        (aucune copie de index.faiss), copie sinon. Les fichiers à remplacer sont exclus et
+        écrits à neuf dans la nouvelle version: `source` n'est jamais modifiée.
+        """
+        skipped = {VERSIONS_DIRNAME, CURRENT_FILENAME, VERSIONS_MANIFEST_FILENAME, *exclude}
+        version, path = self.create()
+        for name in os.listdir(source):
+            if name in skipped or name.endswith(".tmp"):
+                continue
+            source_path = os.path.join(source, name)
+            if os.path.isdir(source_path):
+                shutil.copytree(source_path, os.path.join(path, name), copy_function=_link_or_copy)
+            else:
+                _link_or_copy(source_path, os.path.join(path, name))
+        return version, path
+
+    def discard(self, version: str):
+        """Supprime une version non publiée (construction abandonnée)"""
+        if version != self.current():
+            shutil.rmtree(self.path(version), ignore_errors=True)
+
+    def list(self) -> List[Dict]:
+        """Versions publiées, de la plus ancienne à la plus récente"""
+        try:
+            with open(self._file(VERSIONS_MANIFEST_FILENAME), "r", encoding="utf-8") as f:
+                return json.load(f)["versions"]
+        except FileNotFoundError:
+            return []
+
+    def _write_json(self, name: str, content: str):
+        path = self._file(name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def publish(self, version: str, info: Optional[Dict] = None):
+        """
+        Rend `version` courante: historique mis à jour, puis bascule atomique du pointeur
+        (les processus qui surveillent CURRENT chargent alors la nouvelle version)
+        """
+        if not os.path.isdir(self.path(version)):
+            raise ValueError(f"Version d'index inconnue: {version}")
+
+        versions = [entry for entry in self.list() if entry["version"] != version]
+        versions.append({"version": version, "published_at": datetime.now().isoformat(), **(info or {})})
+        self._write_json(VERSIONS_MANIFEST_FILENAME, json.dumps({"versions": versions}, ensure_ascii=False, indent=1))
+        self._write_json(CURRENT_FILENAME, version + "\n")
+        logger.info(f"Version d'index publiée: {version}")
+
+    def prune(self, keep: int) -> List[str]:
+        """
+        Supprime les dossiers des versions publiées au-delà des `keep` plus récentes
+        (jamais la version courante). Un processus qui aurait encore une ancienne version
+        mappée garde un accès valide à ses fichiers jusqu'à leur fermeture.
+        """
+        current = self.current()
+        versions = self.list()
+        removed = [entry["version"] for entry in versions[:-keep] if entry["version"] != current] if keep > 0 else []
+        for version in removed:
+            shutil.rmtree(self.path(version), ignore_errors=True)
+        if removed:
+            versions = [entry for entry in versions if entry["version"] not in removed]
+            self._write_json(VERSIONS_MANIFEST_FILENAME, json.dumps({"versions": versions}, ensure_ascii=False, indent=1))
+            logger.info(f"Anciennes versions d'index supprimées: {', '.join(removed)}")
+        return removed
+
+
+class DrainLock:
+    """
+    Verrou lecteurs / écrivain pour le changement de version à chaud.
+
+    Chaque requête lit l'index sous `reading()` (réentrant dans un même thread); `exclusive()`
+    bloque les nouvelles requêtes, attend la fin de celles en cours (drainage) puis rend la
+    main: le remplacement de l'index ne dure que le temps de quelques affectations.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._exclusive = False
+        self._local = threading.local()
+
+    @property
+    def active_readers(self) -> int:
+        return self._readers
+
+    @contextmanager
+    def reading(self) -> Iterator[None]:
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            with self._condition:
+                while self._exclusive:
+                    self._condition.wait()
+                self._readers += 1
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                with self._condition:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        with self._condition:
+            while self._exclusive:
+                self._condition.wait()
+            self._exclusive = True
+            while self._readers:
+                self._condition.wait()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
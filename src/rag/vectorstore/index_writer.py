@@ -0,0 +1,108 @@
+import os
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document as LCDocument
+
+from src.rag.vectorstore.chunk_store import ChunkStore, ChunkStoreWriter
+from src.rag.vectorstore.faiss_indexes import build_faiss_index, index_metadata, save_index_metadata
+
+if TYPE_CHECKING:
+    from src.rag.vectorstore.vector_store_lang import VectorStoreManager
+
+logger = logging.getLogger(__name__)
+
+
+class IndexWriter:
+    """
+    Écriture en flux d'un nouvel index: les chunks arrivent par lots (texte écrit
+    directement dans le stockage des chunks, seuls les vecteurs restent en mémoire),
+    puis `commit()` construit l'index FAISS et publie la nouvelle version.
+
+    Les fichiers sont écrits dans `directory` (dossier d'une nouvelle version, cf.
+    IndexVersions): l'index servi n'est pas modifié, la version n'est visible des autres
+    processus qu'une fois publiée (VectorStoreManager.publish).
+    """
+
+    def __init__(
+        self,
+        manager: "VectorStoreManager",
+        index_type: str = "flat",
+        index_params: Optional[Dict] = None,
+        directory: Optional[str] = None,
+        version: Optional[str] = None
+    ):
+        self.manager = manager
+        self.index_type = index_type
+        self.index_params = index_params
+        self.directory = directory or manager.index_directory
+        self.version = version
+        self.chunk_writer = ChunkStoreWriter(self.directory)
+        self._vectors: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.chunk_writer)
+
+    def add(self, documents: List[LCDocument], vectors: np.ndarray):
+        """Ajoute des chunks (avec id) et leurs embeddings"""
+        if len(documents) != len(vectors):
+            raise ValueError(f"{len(documents)} chunks pour {len(vectors)} vecteurs")
+        for doc in documents:
+            self.chunk_writer.add(doc.id, doc)
+        if len(documents):
+            self._vectors.append(np.asarray(vectors, dtype=np.float32))
+
+    def add_existing(self, doc_ids: List[str], metadata_updates: Optional[Dict[str, Dict]] = None, batch_size: int = 1024):
+        """
+        Recopie des chunks de l'index actuellement chargé (vecteurs relus dans FAISS,
+        sans ré-embedding), avec éventuellement de nouvelles métadonnées
+        """
+        metadata_updates = metadata_updates or {}
+        vectorstore = self.manager.vectorstore
+        for offset in range(0, len(doc_ids), batch_size):
+            batch_ids = doc_ids[offset:offset + batch_size]
+            documents = []
+            for doc_id in batch_ids:
+                doc = vectorstore.docstore.search(doc_id)
+                metadata = metadata_updates.get(doc_id, doc.metadata)
+                documents.append(LCDocument(id=doc_id, page_content=doc.page_content, metadata=metadata))
+            positions = np.asarray([self.manager._position_of[doc_id] for doc_id in batch_ids], dtype=np.int64)
+            self.add(documents, vectorstore.index.reconstruct_batch(positions))
+
+    def commit(self) -> faiss.Index:
+        """Construit l'index FAISS, écrit tous les fichiers et recharge le manager"""
+        if not len(self):
+            self.abort()
+            raise ValueError("Aucun chunk à indexer")
+
+        vectors = np.vstack(self._vectors)
+        self._vectors = []
+        index, params = build_faiss_index(vectors, self.index_type, self.index_params)
+        del vectors
+
+        # Écriture puis renommage: un index.faiss déjà mappé par un autre processus reste valide
+        directory = self.directory
+        faiss_path = os.path.join(directory, "index.faiss")
+        faiss.write_index(index, f"{faiss_path}.tmp")
+        os.replace(f"{faiss_path}.tmp", faiss_path)
+        self.chunk_writer.close()
+
+        pickle_path = os.path.join(directory, "index.pkl")
+        if os.path.exists(pickle_path):
+            os.remove(pickle_path)
+
+        metadata = index_metadata(index, self.index_type, params, self.manager.embedding_model_name)
+        save_index_metadata(directory, metadata)
+        logger.info(f"FAISS index successfully saved to: {directory}")
+
+        # Le manager sert désormais la nouvelle version (chunks lus à la demande)
+        self.manager.attach(index, ChunkStore.load(directory), directory, self.version)
+        return index
+
+    def abort(self):
+        self._vectors = []
+        self.chunk_writer.abort()
+        if self.version is not None:
+            self.manager.versions.discard(self.version)
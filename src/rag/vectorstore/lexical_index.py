@@ -0,0 +1,171 @@
+import os
+import logging
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.rag.generation.reranker import CandidateBatch, ragged_gather
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_INDEX_FILENAME = "lexical_index.npz"
+LEXICAL_INDEX_FORMAT = 1
+
+
+def _encode_strings(values: Sequence[str]) -> np.ndarray:
+    """Encode une liste de chaînes (sans saut de ligne) en un blob UTF-8"""
+    return np.frombuffer("\n".join(values).encode("utf-8"), dtype=np.uint8)
+
+
+def _decode_strings(blob: np.ndarray) -> List[str]:
+    text = blob.tobytes().decode("utf-8")
+    return text.split("\n") if text else []
+
+
+class LexicalIndex:
+    """
+    Index lexical persisté à côté de `index.faiss`, construit une seule fois à l'indexation.
+
+    Pour chaque chunk (clé = id du docstore FAISS) il conserve les tokens normalisés
+    et le découpage en mots, afin que le reranking ne re-tokenise plus le texte brut.
+    Une table de suffixes triée sur le vocabulaire permet de trouver en O(log n)
+    tous les tokens contenant un terme de requête.
+    """
+
+    def __init__(
+        self,
+        doc_ids: List[str],
+        vocab: List[str],
+        token_ids: np.ndarray,
+        token_offsets: np.ndarray,
+        word_lengths: np.ndarray,
+        word_offsets: np.ndarray,
+        suffix_tokens: np.ndarray,
+        suffix_starts: np.ndarray
+    ):
+        self.doc_ids = doc_ids
+        self.vocab = vocab
+        self.token_ids = token_ids
+        self.token_offsets = token_offsets
+        self.word_lengths = word_lengths
+        self.word_offsets = word_offsets
+        self.suffix_tokens = suffix_tokens
+        self.suffix_starts = suffix_starts
+
+        self.row_of: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(doc_ids)}
+        self._term_cache: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @classmethod
+    def build(cls, doc_ids: List[str], texts: List[str]) -> "LexicalIndex":
+        """Tokenise tout le corpus et construit la table de suffixes du vocabulaire"""
+        batch = CandidateBatch.from_texts(texts)
+
+        suffixes = sorted(
+            (token[start:], token_id, start)
+            for token_id, token in enumerate(batch.vocab)
+            for start in range(len(token))
+        )
+
+        return cls(
+            doc_ids=list(doc_ids),
+            vocab=batch.vocab,
+            token_ids=batch.token_ids.astype(np.int32),
+            token_offsets=batch.token_offsets,
+            word_lengths=np.diff(batch.word_bounds).astype(np.int32),
+            word_offsets=batch.word_offsets,
+            suffix_tokens=np.fromiter((s[1] for s in suffixes), dtype=np.int32, count=len(suffixes)),
+            suffix_starts=np.fromiter((s[2] for s in suffixes), dtype=np.int32, count=len(suffixes))
+        )
+
+    def save(self, directory: str) -> str:
+        path = os.path.join(directory, LEXICAL_INDEX_FILENAME)
+        np.savez(
+            path,
+            format_version=np.array(LEXICAL_INDEX_FORMAT),
+            doc_ids=_encode_strings(self.doc_ids),
+            vocab=_encode_strings(self.vocab),
+            token_ids=self.token_ids,
+            token_offsets=self.token_offsets,
+            word_lengths=self.word_lengths,
+            word_offsets=self.word_offsets,
+            suffix_tokens=self.suffix_tokens,
+            suffix_starts=self.suffix_starts
+        )
+        logger.info(f"Index lexical sauvegardé: {path} ({len(self)} chunks, {len(self.vocab)} tokens)")
+        return path
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["LexicalIndex"]:
+        """Charge l'index lexical s'il existe et s'il est au bon format"""
+        path = os.path.join(directory, LEXICAL_INDEX_FILENAME)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            if int(data["format_version"]) != LEXICAL_INDEX_FORMAT:
+                logger.warning(f"Format d'index lexical obsolète ignoré: {path}")
+                return None
+            return cls(
+                doc_ids=_decode_strings(data["doc_ids"]),
+                vocab=_decode_strings(data["vocab"]),
+                token_ids=data["token_ids"],
+                token_offsets=data["token_offsets"],
+                word_lengths=data["word_lengths"],
+                word_offsets=data["word_offsets"],
+                suffix_tokens=data["suffix_tokens"],
+                suffix_starts=data["suffix_starts"]
+            )
+
+    def rows_for(self, doc_ids: Sequence[Optional[str]]) -> Optional[np.ndarray]:
+        """Lignes des chunks demandés, ou None si l'un d'eux est absent de l'index"""
+        rows = [self.row_of.get(doc_id) for doc_id in doc_ids]
+        if any(row is None for row in rows):
+            return None
+        return np.asarray(rows, dtype=np.int64)
+
+    def batch(self, rows: np.ndarray) -> CandidateBatch:
+        """Construit un lot de candidats à partir des tokens précalculés"""
+        word_lengths = ragged_gather(self.word_lengths, self.word_offsets, rows)
+        word_bounds = np.zeros(len(word_lengths) + 1, dtype=np.int64)
+        np.cumsum(word_lengths, out=word_bounds[1:])
+
+        word_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(self.word_offsets[rows + 1] - self.word_offsets[rows], out=word_offsets[1:])
+
+        return CandidateBatch(
+            vocab=self.vocab,
+            token_ids=ragged_gather(self.token_ids, self.token_offsets, rows),
+            word_bounds=word_bounds,
+            word_offsets=word_offsets
+        )
+
+    def tokens_containing(self, term: str) -> np.ndarray:
+        """Identifiants des tokens du vocabulaire qui contiennent `term`"""
+        cached = self._term_cache.get(term)
+        if cached is not None:
+            return cached
+
+        def suffix(k: int) -> str:
+            return self.vocab[self.suffix_tokens[k]][self.suffix_starts[k]:]
+
+        n = len(self.suffix_tokens)
+        lo = bisect_left(range(n), term, key=suffix)
+        hi = bisect_right(range(n), term, lo=lo, key=lambda k: suffix(k)[:len(term)])
+        token_ids = np.unique(self.suffix_tokens[lo:hi])
+
+        if len(self._term_cache) >= 4096:
+            self._term_cache.clear()
+        self._term_cache[term] = token_ids
+        return token_ids
+
+    def term_matches(self, query_terms: Sequence[str]) -> np.ndarray:
+        """Matrice booléenne (vocabulaire × termes) calculée via la table de suffixes"""
+        matches = np.zeros((len(self.vocab), len(query_terms)), dtype=bool)
+        for j, term in enumerate(query_terms):
+            matches[self.tokens_containing(term), j] = True
+        return matches
+
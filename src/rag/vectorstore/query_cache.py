@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU borné (avec expiration TTL) des embeddings de requêtes.
+
+    La clé est le texte normalisé réellement envoyé au modèle. Le cache est associé
+    à un "namespace" (modèle d'embedding + génération de l'index): tout changement
+    de namespace le vide automatiquement.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = 3600):
+        """
+        Args:
+            max_size: Nombre maximum d'embeddings conservés (0 = cache désactivé)
+            ttl_seconds: Durée de vie d'une entrée (None = pas d'expiration)
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.namespace: Optional[Hashable] = None
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def bind(self, namespace: Hashable):
+        """Associe le cache à un modèle/index; le vide si le namespace change"""
+        with self._lock:
+            if namespace != self.namespace:
+                self._entries.clear()
+                self.namespace = namespace
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, vector: np.ndarray):
+        if self.max_size <= 0:
+            return
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+
+        with self._lock:
+            self._entries[key] = (vector, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
@@ -1,13 +1,35 @@
 import os
+import time
+import uuid
+import pickle
+import hashlib
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 import re
+import threading
+from contextlib import contextmanager
 
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document as LCDocument
 
+from src.rag.vectorstore.lexical_index import LEXICAL_INDEX_FILENAME, LexicalIndex
+from src.rag.vectorstore.bm25_index import BM25Index
+from src.rag.vectorstore.query_cache import QueryEmbeddingCache
+from src.rag.vectorstore.chunk_store import ChunkDocstore, ChunkStore, ChunkStoreWriter
+from src.rag.vectorstore.index_writer import IndexWriter
+from src.rag.vectorstore.embedding_cache import EmbeddingCache
+from src.rag.vectorstore.index_versions import DrainLock, IndexVersions
+from src.rag.vectorstore.faiss_indexes import (
+    apply_search_params,
+    load_index_metadata,
+    mapped_file_usage,
+    read_index_mmap,
+)
+
 logger = logging.getLogger(__name__)
 
 EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
@@ -17,65 +39,635 @@ class VectorStoreManager:
     Gère l'index FAISS de LangChain
     """
     
-    def __init__(self, index_directory: str = "vector_store_faiss"):
-        """Initialise le manager et charge le modèle d'embeddings."""
-        self.index_directory = index_directory
+    def __init__(
+        self,
+        index_directory: str = "vector_store_faiss",
+        query_cache_size: int = 1024,
+        query_cache_ttl: Optional[float] = 3600,
+        search_params: Optional[Dict] = None,
+        mmap: bool = False,
+        embedding_batch_size: int = 256,
+        embedding_cache_dir: Optional[str] = None
+    ):
+        """
+        Initialise le manager et charge le modèle d'embeddings.
+        
+        Args:
+            index_directory: Dossier racine de l'index FAISS (versions publiées, cf. IndexVersions)
+            query_cache_size: Nombre d'embeddings de requêtes gardés en cache (0 = désactivé)
+            query_cache_ttl: Durée de vie (secondes) d'un embedding en cache
+            search_params: Surcharge des paramètres de recherche (nprobe, efSearch) au chargement
+            mmap: Ouvrir index.faiss mappé en mémoire et en lecture seule (pages partagées
+                entre processus, chargement indépendant de la taille de l'index)
+            embedding_batch_size: Taille des lots de chunks encodés à l'indexation
+            embedding_cache_dir: Cache disque des embeddings de chunks (None = désactivé)
+        """
+        # Le dossier lu est celui de la version publiée; chaque construction crée une version
+        self.root_directory = index_directory
+        self.versions = IndexVersions(index_directory)
+        self.index_directory = self.versions.current_path()
+        self.version: Optional[str] = self.versions.current()
+        self._drain = DrainLock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        self.search_params = search_params or {}
+        self.mmap = mmap
+        self.load_seconds: Optional[float] = None
+        self.embedding_batch_size = embedding_batch_size
+        self.last_embedding_stats: Optional[Dict] = None
         self.vectorstore: Optional[FAISS] = None
-        self.embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+        self.index_metadata: Dict = {}
+        self.chunk_store: Optional[ChunkStore] = None
+        self.lexical_index: Optional[LexicalIndex] = None
+        self.bm25_index: Optional[BM25Index] = None
+        self._position_of: Dict[str, int] = {}
+        
+        # Cache des embeddings de requêtes, vidé à chaque changement d'index ou de modèle
+        self.query_cache = QueryEmbeddingCache(max_size=query_cache_size, ttl_seconds=query_cache_ttl)
+        self._index_generation = 0
+        self.index_version: Optional[str] = None
+        self.embeddings = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL_NAME,
+            encode_kwargs={"batch_size": embedding_batch_size}
+        )
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        if embedding_cache_dir:
+            self.embedding_cache = EmbeddingCache(embedding_cache_dir, self.embedding_model_name)
 
         # On ne crée le dossier QUE s'il n'existe pas du tout
-        if not os.path.exists(self.index_directory):
-            os.makedirs(self.index_directory, exist_ok=True)
-            logger.info(f"Dossier créé : {os.path.abspath(self.index_directory)}")
+        if not os.path.exists(self.root_directory):
+            os.makedirs(self.root_directory, exist_ok=True)
+            logger.info(f"Dossier créé : {os.path.abspath(self.root_directory)}")
     
     
-    def create_and_save_index(self, chunks: List[LCDocument]):
+    def create_and_save_index(
+        self,
+        chunks: List[LCDocument],
+        index_type: str = "flat",
+        index_params: Optional[Dict] = None
+    ):
         """
         Crée l'index FAISS à partir des chunks (Documents LangChain) et le sauvegarde.
+        
+        Args:
+            chunks: Chunks à indexer
+            index_type: 'flat' (exact), 'ivf_flat', 'hnsw' ou 'ivf_pq' (approximatifs)
+            index_params: Paramètres du type d'index (nlist, nprobe, M, efSearch, m, nbits...)
         """
         if not chunks:
             logger.warning("No chunks provided to create the index.")
             return
 
-        logger.info(f"Creating FAISS index from {len(chunks)} documents...")
-        self.vectorstore = FAISS.from_documents(chunks, self.embeddings)
+        logger.info(f"Creating FAISS index ({index_type}) from {len(chunks)} documents...")
+        documents = self.with_ids(chunks)
+        writer = self.index_writer(index_type, index_params)
+        try:
+            writer.add(documents, self.embed_documents([doc.page_content for doc in documents]))
+            writer.commit()
+            # Fichiers annexes écrits avant la publication: une version publiée est complète
+            self.build_lexical_index()
+            self.publish()
+        except BaseException:
+            # Version en construction supprimée (jamais une version déjà publiée)
+            writer.abort()
+            raise
+    
+    def index_writer(self, index_type: str = "flat", index_params: Optional[Dict] = None) -> IndexWriter:
+        """Écriture en flux d'un nouvel index, dans une nouvelle version (cf. IndexWriter, publish)"""
+        version, directory = self.versions.create()
+        return IndexWriter(self, index_type, index_params, directory=directory, version=version)
+    
+    def publish(self, keep_versions: int = 3) -> Optional[str]:
+        """
+        Publie la version construite par ce manager (bascule atomique de CURRENT):
+        les processus qui servent l'index la chargent à chaud (cf. hot_swap).
+        
+        Args:
+            keep_versions: Nombre de versions publiées conservées sur disque (retour arrière)
+        """
+        if not self.vectorstore or self.version is None:
+            logger.error("Aucune version construite à publier.")
+            return None
+        self.versions.publish(self.version, {
+            'chunks': self.vectorstore.index.ntotal,
+            'index_type': self.index_metadata.get('index_type', 'flat'),
+            'embedding_model': self.embedding_model_name,
+            'index_version': self.index_version
+        })
+        self.versions.prune(keep_versions)
+        return self.version
+    
+    @property
+    def embedding_model_name(self) -> str:
+        return getattr(self.embeddings, 'model_name', EMBEDDING_MODEL_NAME)
+
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        """Longueur maximale (tokens) au-delà de laquelle le modèle tronque le texte embeddé"""
+        client = getattr(self.embeddings, '_client', None)
+        return getattr(client, 'max_seq_length', None)
+    
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeddings des chunks (matrice n × d), par lots de `embedding_batch_size`.
+        Les textes déjà présents dans le cache disque ne repassent pas par le modèle.
+        Le débit est conservé dans `last_embedding_stats`.
+        """
+        start = time.perf_counter()
+        if self.embedding_cache is not None:
+            vectors, missing = self.embedding_cache.get_many(texts)
+        else:
+            vectors, missing = [None] * len(texts), list(range(len(texts)))
+        
+        # Un texte présent plusieurs fois n'est encodé qu'une fois
+        positions_of: Dict[str, List[int]] = {}
+        for i in missing:
+            positions_of.setdefault(texts[i], []).append(i)
+        unique_texts = list(positions_of)
         
-        # Sauvegarde
-        self.vectorstore.save_local(self.index_directory)
-        logger.info(f"FAISS index successfully saved to: {self.index_directory}")
+        for offset in range(0, len(unique_texts), self.embedding_batch_size):
+            batch_texts = unique_texts[offset:offset + self.embedding_batch_size]
+            computed = np.asarray(self.embeddings.embed_documents(batch_texts), dtype=np.float32)
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many(batch_texts, computed)
+            for text, vector in zip(batch_texts, computed):
+                for i in positions_of[text]:
+                    vectors[i] = vector
+            logger.info(f"Embeddings: {offset + len(batch_texts)}/{len(unique_texts)} chunks")
         
+        seconds = time.perf_counter() - start
+        self.last_embedding_stats = {
+            'chunks': len(texts),
+            'embedded': len(unique_texts),
+            'cached': len(texts) - len(missing),
+            'seconds': round(seconds, 3)
+        }
+        if not texts:
+            return np.zeros((0, self.vectorstore.index.d if self.vectorstore else 0), dtype=np.float32)
+        return np.vstack(vectors)
     
-    def load_index(self) -> bool:
-        # Vérification robuste des fichiers attendus par FAISS
-        faiss_path = os.path.join(self.index_directory, "index.faiss")
-        if not os.path.exists(faiss_path):
-            logger.error(f"Fichier index.faiss introuvable dans : {self.index_directory}")
-            return False
+    @staticmethod
+    def with_ids(chunks: List[LCDocument]) -> List[LCDocument]:
+        """Copie des chunks avec un id de docstore (conservé s'il est renseigné)"""
+        return [
+            LCDocument(id=chunk.id or str(uuid.uuid4()), page_content=chunk.page_content, metadata=chunk.metadata)
+            for chunk in chunks
+        ]
+    
+    def attach(self, index: faiss.Index, chunk_store: ChunkStore, directory: str, version: Optional[str] = None):
+        """Sert l'index et le stockage des chunks donnés (vecteur i = chunk i), écrits dans `directory`"""
+        self._apply(self._with_lookups({
+            'directory': directory,
+            'version': version,
+            'chunk_store': chunk_store,
+            'vectorstore': FAISS(
+                embedding_function=self.embeddings,
+                index=index,
+                docstore=ChunkDocstore(chunk_store),
+                index_to_docstore_id=dict(enumerate(chunk_store.doc_ids))
+            ),
+            'index_metadata': load_index_metadata(directory),
+            'lexical_index': None,
+            'load_seconds': None
+        }))
+    
+    def update_index(
+        self,
+        new_chunks: List[LCDocument],
+        delete_ids: List[str],
+        metadata_updates: Optional[Dict[str, Dict]] = None
+    ) -> Dict:
+        """
+        Met à jour l'index chargé sans tout ré-embedder: seuls `new_chunks` passent
+        par le modèle d'embedding, les autres vecteurs sont relus depuis l'index.
+        
+        Args:
+            new_chunks: Chunks à ajouter (id conservé s'il est renseigné)
+            delete_ids: Ids du docstore à supprimer
+            metadata_updates: Nouvelles métadonnées de chunks conservés (texte inchangé)
+        
+        Returns:
+            Nombre de chunks conservés, ajoutés et supprimés
+        """
+        if not self.vectorstore:
+            raise RuntimeError("Vector store not loaded/initialized.")
+        
+        index_type = self.index_metadata.get("index_type", "flat")
+        params = self.index_metadata.get("index_params", {})
+        if index_type == "ivf_pq":
+            # Les vecteurs compressés ne sont pas reconstructibles à l'identique
+            raise ValueError("Mise à jour incrémentale impossible pour un index ivf_pq (reconstruction requise)")
+        
+        deleted = set(delete_ids)
+        kept_ids = [doc_id for doc_id in self._ordered_doc_ids() if doc_id not in deleted]
+        n_deleted = len(self._position_of) - len(kept_ids)
+        if not kept_ids and not new_chunks:
+            raise ValueError("La mise à jour supprimerait tous les chunks de l'index")
+        
+        writer = self.index_writer(index_type, params)
+        new_documents = self.with_ids(new_chunks)
+        try:
+            logger.info(f"Embedding de {len(new_documents)} nouveaux chunks...")
+            writer.add(new_documents, self.embed_documents([doc.page_content for doc in new_documents]))
+            writer.add_existing(kept_ids, metadata_updates)
+            writer.commit()
+            self.build_lexical_index()
+            self.publish()
+        except BaseException:
+            writer.abort()
+            raise
+        
+        return {
+            'kept': len(kept_ids),
+            'added': len(new_documents),
+            'deleted': n_deleted
+        }
+    
+    def save_chunk_store(self) -> Optional[ChunkStore]:
+        """
+        Convertit le docstore picklé (index.pkl) de l'index servi en stockage compact
+        (chunk_store/), dans une nouvelle version publiée: la version servie n'est pas
+        modifiée et les serveurs basculent sur la nouvelle à chaud.
+        """
+        if not self.vectorstore:
+            logger.error("Vector store not loaded/initialized.")
+            return None
+        
+        version, directory = self.versions.derive(self.index_directory, exclude=("index.pkl", "chunk_store"))
+        try:
+            writer = ChunkStoreWriter(directory)
+            for doc_id in self._ordered_doc_ids():
+                writer.add(doc_id, self.vectorstore.docstore.search(doc_id))
+            writer.close()
             
+            # Les Documents sont désormais lus à la demande depuis les fichiers mappés
+            self._apply(self._read_version(directory, version))
+            self.publish()
+        except BaseException:
+            self.versions.discard(version)
+            raise
+        return self.chunk_store
+    
+    def rebuild_lexical_index(self) -> Optional[LexicalIndex]:
+        """
+        Reconstruit l'index lexical de l'index servi dans une nouvelle version publiée
+        (mêmes fichiers FAISS et chunks, liés sans copie; la version servie n'est pas modifiée)
+        """
+        if not self.vectorstore:
+            logger.error("Vector store not loaded/initialized.")
+            return None
+        
+        version, directory = self.versions.derive(self.index_directory, exclude=(LEXICAL_INDEX_FILENAME,))
+        try:
+            self._apply(self._read_version(directory, version))
+            lexical_index = self.build_lexical_index()
+            self.publish()
+        except BaseException:
+            self.versions.discard(version)
+            raise
+        return lexical_index
+    
+    def _ordered_doc_ids(self) -> List[str]:
+        return [
+            self.vectorstore.index_to_docstore_id[i]
+            for i in range(len(self.vectorstore.index_to_docstore_id))
+        ]
+    
+    def chunk_metadatas(self) -> List[Dict]:
+        """Métadonnées de tous les chunks, dans l'ordre de l'index FAISS"""
+        if not self.vectorstore:
+            return []
+        if self.chunk_store is not None:
+            return [self.chunk_store.metadata(row) for row in range(len(self.chunk_store))]
+        return [self.vectorstore.docstore.search(doc_id).metadata for doc_id in self._ordered_doc_ids()]
+    
+    def build_lexical_index(self) -> Optional[LexicalIndex]:
+        """
+        Construit et sauvegarde l'index lexical des chunks de l'index FAISS courant
+        (clé = id du docstore), à côté de index.faiss. À n'appeler que sur une version en
+        construction (cf. rebuild_lexical_index pour l'index servi).
+        """
+        if not self.vectorstore:
+            logger.error("Vector store not loaded/initialized.")
+            return None
+        
+        doc_ids = self._ordered_doc_ids()
+        if self.chunk_store is not None:
+            texts = [self.chunk_store.text(row) for row in range(len(self.chunk_store))]
+        else:
+            texts = [self.vectorstore.docstore.search(doc_id).page_content for doc_id in doc_ids]
+        
+        self.lexical_index = LexicalIndex.build(doc_ids, texts)
+        self.lexical_index.save(self.index_directory)
+        self.bm25_index = BM25Index(self.lexical_index)
+        return self.lexical_index
+    
+    def load_index(self) -> bool:
+        """Charge la version publiée de l'index (ou l'index à la racine, ancienne disposition)"""
         try:
-            self.vectorstore = FAISS.load_local(
-                self.index_directory, 
-                self.embeddings, 
-                allow_dangerous_deserialization=True
+            self._apply(self._read_version(self.versions.current_path(), self.versions.current()))
+            logger.info(
+                f"Index FAISS chargé avec succès ({self.index_metadata.get('index_type', 'flat')}"
+                f"{', mmap' if self.mmap else ''}{', version ' + self.version if self.version else ''}) "
+                f"en {self.load_seconds:.3f}s."
             )
-            logger.info("Index FAISS chargé avec succès.")
+            if self.lexical_index is None:
+                logger.info("Pas d'index lexical: reranking à la volée, recherche BM25 désactivée.")
             return True
+        except FileNotFoundError as e:
+            logger.error(str(e))
+            return False
         except Exception as e:
             logger.error(f"Erreur chargement FAISS : {e}")
             return False
-            
     
-    def search(self, query: str, top_k: int = 4) -> List[LCDocument]:
+    def _read_version(self, directory: str, version: Optional[str]) -> Dict:
+        """Ouvre un index sur disque sans toucher à celui qui est servi"""
+        # Vérification robuste des fichiers attendus par FAISS
+        faiss_path = os.path.join(directory, "index.faiss")
+        if not os.path.exists(faiss_path):
+            raise FileNotFoundError(f"Fichier index.faiss introuvable dans : {directory}")
+        
+        start = time.perf_counter()
+        chunk_store = ChunkStore.load(directory, mmap=True)
+        if chunk_store is not None:
+            docstore = ChunkDocstore(chunk_store)
+            index_to_docstore_id = dict(enumerate(chunk_store.doc_ids))
+        else:
+            # Ancien format: docstore LangChain picklé (cf. commande 'chunkstore' pour migrer)
+            logger.warning("Pas de stockage des chunks: chargement du docstore picklé index.pkl.")
+            with open(os.path.join(directory, "index.pkl"), "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+        
+        index = read_index_mmap(faiss_path) if self.mmap else faiss.read_index(faiss_path)
+        if index.ntotal != len(index_to_docstore_id):
+            raise ValueError(
+                f"index.faiss ({index.ntotal} vecteurs) et chunks ({len(index_to_docstore_id)}) incohérents"
+            )
+        index_metadata = load_index_metadata(directory)
+        apply_search_params(index, {**index_metadata.get("index_params", {}), **self.search_params})
+        
+        state = self._with_lookups({
+            'directory': directory,
+            'version': version,
+            'chunk_store': chunk_store,
+            'vectorstore': FAISS(
+                embedding_function=self.embeddings,
+                index=index,
+                docstore=docstore,
+                index_to_docstore_id=index_to_docstore_id
+            ),
+            'index_metadata': index_metadata,
+            # Index lexical précalculé (optionnel, sinon tokenisation à la volée)
+            'lexical_index': LexicalIndex.load(directory)
+        })
+        state['load_seconds'] = time.perf_counter() - start
+        return state
+    
+    @staticmethod
+    def _with_lookups(state: Dict) -> Dict:
         """
-        Effectue une recherche par similarité (Retrieval) en utilisant l'objet d'embedding.
+        Complète l'état d'un index chargé avec ses tables dérivées, en O(N): index BM25, table
+        id du docstore -> position et empreinte de version. Calculées avant _apply, hors du
+        verrou exclusif: la bascule ne bloque les requêtes que le temps des affectations.
+        """
+        index_to_docstore_id = state['vectorstore'].index_to_docstore_id
+        lexical_index = state['lexical_index']
+        state['bm25_index'] = BM25Index(lexical_index) if lexical_index is not None else None
+        state['position_of'] = {doc_id: position for position, doc_id in index_to_docstore_id.items()}
+        
+        # Version stable entre processus: empreinte des ids du docstore (uuid par build)
+        doc_ids = (index_to_docstore_id[i] for i in range(len(index_to_docstore_id)))
+        state['index_version'] = hashlib.sha1("\n".join(doc_ids).encode("utf-8")).hexdigest()[:16]
+        return state
+    
+    def _apply(self, state: Dict):
+        """
+        Remplace l'index servi, une fois les requêtes en cours sur l'ancien terminées
+        (`state` complet, cf. _with_lookups: aucun calcul sous le verrou)
+        """
+        with self._drain.exclusive():
+            self.index_directory = state['directory']
+            self.version = state['version']
+            self.chunk_store = state['chunk_store']
+            self.vectorstore = state['vectorstore']
+            self.index_metadata = state['index_metadata']
+            self.lexical_index = state['lexical_index']
+            self.bm25_index = state['bm25_index']
+            self.load_seconds = state['load_seconds']
+            self._position_of = state['position_of']
+            self.index_version = state['index_version']
+            # Nouvel espace de noms du cache des requêtes (vidé au prochain embed_query)
+            self._index_generation += 1
+    
+    @contextmanager
+    def reading(self):
+        """
+        Bail de lecture d'une requête: la version servie ne change pas tant qu'il est tenu
+        (les Documents renvoyés sont des copies, utilisables après)
+        """
+        with self._drain.reading():
+            yield
+    
+    def hot_swap(self) -> Dict:
+        """
+        Charge la version publiée si elle a changé, en arrière-plan du service: l'ancienne
+        version répond jusqu'à la bascule, puis est libérée quand ses requêtes sont terminées.
+        
+        Returns:
+            Versions avant/après, durée de chargement et d'attente des requêtes en cours
+        """
+        target = self.versions.current()
+        report = {'previous': self.version, 'current': target, 'swapped': False}
+        if target is None or target == self.version:
+            return report
+        
+        state = self._read_version(self.versions.path(target), target)
+        in_flight = self._drain.active_readers
+        start = time.perf_counter()
+        self._apply(state)
+        del state
+        report.update({
+            'swapped': True,
+            'load_seconds': round(self.load_seconds, 3),
+            'drain_seconds': round(time.perf_counter() - start, 3),
+            'in_flight': in_flight,
+            'chunks': self.vectorstore.index.ntotal
+        })
+        logger.info(
+            f"Index basculé à chaud: {report['previous']} → {target} "
+            f"({report['chunks']} chunks, {in_flight} requêtes drainées en {report['drain_seconds']}s)"
+        )
+        return report
+    
+    def watch_versions(self, interval: float = 10.0):
+        """Surveille CURRENT dans un thread et bascule à chaud à chaque nouvelle version publiée"""
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        
+        def watch():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.hot_swap()
+                except Exception as e:
+                    logger.error(f"Échec du chargement de la nouvelle version de l'index: {e}")
+        
+        self._watcher = threading.Thread(target=watch, name="index-version-watcher", daemon=True)
+        self._watcher.start()
+    
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
+    
+    def memory_report(self) -> Dict:
+        """
+        Occupation mémoire de index.faiss: taille du fichier, taille mappée et
+        taille réellement résidente (en octets). Sans mmap, l'index est entièrement
+        copié dans le tas du processus.
         """
+        faiss_path = os.path.join(self.index_directory, "index.faiss")
+        file_bytes = os.path.getsize(faiss_path) if os.path.exists(faiss_path) else 0
         if not self.vectorstore:
-            logger.error("Vector store not loaded/initialized.")
-            return []
+            return {'mmap': self.mmap, 'file_bytes': file_bytes, 'mapped_bytes': 0, 'resident_bytes': 0}
         
-        # Normalisation de la requête
+        if self.mmap:
+            usage = mapped_file_usage(faiss_path)
+        else:
+            usage = {'mapped_bytes': 0, 'resident_bytes': file_bytes}
+        return {'mmap': self.mmap, 'file_bytes': file_bytes, **usage, 'load_seconds': self.load_seconds}
+    
+    def _cache_namespace(self) -> tuple:
+        return (self.embedding_model_name, self._index_generation)
+    
+    def _normalize_query(self, query: str) -> str:
         normalized_query = re.sub(r'[?!.,;:\'\"]+', ' ', query)
-        normalized_query = re.sub(r'\s+', ' ', normalized_query).strip()
+        return re.sub(r'\s+', ' ', normalized_query).strip()
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embedding de la requête (après normalisation de la ponctuation), mis en cache"""
+        normalized_query = self._normalize_query(query)
+        self.query_cache.bind(self._cache_namespace())
+        
+        vector = self.query_cache.get(normalized_query)
+        if vector is None:
+            vector = np.asarray(self.embeddings.embed_query(normalized_query), dtype=np.float32)
+            self.query_cache.put(normalized_query, vector)
+        return vector
+    
+    def _cosine_similarities(self, query_vector: np.ndarray, positions: List[int]) -> List[float]:
+        """Similarité cosinus exacte entre la requête et les vecteurs stockés dans FAISS"""
+        if not positions:
+            return []
+        stored = self.vectorstore.index.reconstruct_batch(np.asarray(positions, dtype=np.int64))
+        norms = np.linalg.norm(stored, axis=1) * np.linalg.norm(query_vector)
+        return (stored @ query_vector / np.maximum(norms, 1e-12)).tolist()
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embeddings de plusieurs requêtes (matrice n × d): les requêtes absentes
+        du cache sont encodées en un seul passage du modèle
+        """
+        normalized_queries = [self._normalize_query(query) for query in queries]
+        self.query_cache.bind(self._cache_namespace())
+        
+        vectors = [self.query_cache.get(query) for query in normalized_queries]
+        missing = list(dict.fromkeys(q for q, v in zip(normalized_queries, vectors) if v is None))
+        if missing:
+            computed = dict(zip(missing, np.asarray(self.embeddings.embed_documents(missing), dtype=np.float32)))
+            for query, vector in computed.items():
+                self.query_cache.put(query, vector)
+            vectors = [computed[q] if v is None else v for q, v in zip(normalized_queries, vectors)]
+        return np.asarray(vectors, dtype=np.float32)
+    
+    def search_by_vectors(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = 4
+    ) -> List[List[Tuple[LCDocument, float]]]:
+        """
+        Recherche FAISS groupée (une seule recherche avec nq = nombre de requêtes).
         
-        results = self.vectorstore.similarity_search(normalized_query, k=top_k)
+        Returns:
+            Pour chaque requête, liste (Document, similarité cosinus) dans l'ordre FAISS
+        """
+        if not self.vectorstore:
+            logger.error("Vector store not loaded/initialized.")
+            return [[] for _ in range(len(query_vectors))]
+        
+        vectors = np.array(query_vectors, dtype=np.float32).reshape(-1, self.vectorstore.index.d)
+        if self.vectorstore._normalize_L2:
+            faiss.normalize_L2(vectors)
+        _, indices = self.vectorstore.index.search(vectors, top_k)
+        
+        results = []
+        for query_vector, row in zip(query_vectors, indices):
+            positions = [int(i) for i in row if i != -1]
+            documents = [
+                self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[i])
+                for i in positions
+            ]
+            results.append(list(zip(documents, self._cosine_similarities(query_vector, positions))))
         return results
+    
+    def search_by_vector(self, query_vector: np.ndarray, top_k: int = 4) -> List[Tuple[LCDocument, float]]:
+        """
+        Recherche FAISS à partir d'un embedding de requête.
+        
+        Returns:
+            Liste (Document, similarité cosinus) dans l'ordre FAISS
+        """
+        return self.search_by_vectors(np.asarray([query_vector]), top_k=top_k)[0]
+    
+    def search_with_scores(self, query: str, top_k: int = 4) -> List[Tuple[LCDocument, float]]:
+        """
+        Recherche par similarité retournant la similarité cosinus (-1 à 1) de chaque chunk.
+        """
+        if not self.vectorstore:
+            logger.error("Vector store not loaded/initialized.")
+            return []
+        
+        return self.search_by_vector(self.embed_query(query), top_k=top_k)
+    
+    def search_many_with_scores(self, queries: List[str], top_k: int = 4) -> List[List[Tuple[LCDocument, float]]]:
+        """
+        Recherche groupée: un seul passage du modèle d'embedding et une seule recherche FAISS.
+        """
+        if not self.vectorstore:
+            logger.error("Vector store not loaded/initialized.")
+            return [[] for _ in queries]
+        if not queries:
+            return []
+        
+        return self.search_by_vectors(self.embed_queries(queries), top_k=top_k)
+    
+    def search_many(self, queries: List[str], top_k: int = 4) -> List[List[LCDocument]]:
+        """Version groupée de search(): une liste de Documents par requête"""
+        return [
+            [doc for doc, _ in results]
+            for results in self.search_many_with_scores(queries, top_k=top_k)
+        ]
+    
+    def similarities(self, query_vector: np.ndarray, documents: List[LCDocument]) -> List[float]:
+        """Similarité cosinus entre la requête et des chunks de l'index (ex: résultats BM25)"""
+        positions = [self._position_of[doc.id] for doc in documents]
+        return self._cosine_similarities(query_vector, positions)
+    
+    def search(self, query: str, top_k: int = 4) -> List[LCDocument]:
+        """
+        Effectue une recherche par similarité (Retrieval) en utilisant l'objet d'embedding.
+        """
+        return [doc for doc, _ in self.search_with_scores(query, top_k=top_k)]
+    
+    def search_bm25(self, query: str, top_k: int = 4) -> List[LCDocument]:
+        """
+        Recherche lexicale BM25 sur les mêmes chunks que l'index FAISS.
+        Retourne une liste vide si l'index lexical n'est pas disponible.
+        """
+        if not self.vectorstore or not self.bm25_index:
+            return []
+        
+        results = self.bm25_index.search(query, top_k=top_k)
+        return [self.vectorstore.docstore.search(doc_id) for doc_id, _ in results]
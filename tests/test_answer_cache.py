@@ -0,0 +1,78 @@
+"""SemanticAnswerCache: recherche par similarité, éviction et persistance partagée"""
+import os
+
+import numpy as np
+
+from src.rag.generation.answer_cache import SemanticAnswerCache
+
+
+def _vector(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_lookup_by_distance_and_index_version():
+    cache = SemanticAnswerCache(max_distance=0.05)
+    cache.store("frais ?", _vector(1, 0, 0), {'answer': "9 850 €"}, "v1")
+
+    hit = cache.lookup(_vector(1, 0.1, 0), "v1")
+    assert hit == {'answer': "9 850 €", 'cached_question': "frais ?"}
+    assert cache.lookup(_vector(0, 1, 0), "v1") is None
+    assert cache.lookup(_vector(1, 0, 0), "v2") is None
+
+
+def test_store_evicts_other_versions_and_least_recently_used():
+    cache = SemanticAnswerCache(max_size=2)
+    cache.store("ancienne", _vector(0, 0, 1), {}, "v1")
+    cache.store("a", _vector(1, 0, 0), {}, "v2")
+    cache.store("b", _vector(0, 1, 0), {}, "v2")
+    assert len(cache) == 2
+
+    cache.lookup(_vector(1, 0, 0), "v2")
+    cache.store("c", _vector(1, 1, 0), {}, "v2")
+    assert cache.lookup(_vector(0, 1, 0), "v2") is None
+    assert cache.lookup(_vector(1, 0, 0), "v2") is not None
+
+
+def test_store_does_not_write_synchronously(tmp_path):
+    path = str(tmp_path / "answers.npz")
+    cache = SemanticAnswerCache(path, save_interval=3600)
+    cache.store("frais", _vector(1, 0, 0), {'answer': "9 850 €"}, "v1")
+    assert not os.path.exists(path)
+
+    cache.flush()
+    reloaded = SemanticAnswerCache(path)
+    assert reloaded.lookup(_vector(1, 0, 0), "v1")['answer'] == "9 850 €"
+
+
+def test_flush_merges_entries_of_other_processes(tmp_path):
+    path = str(tmp_path / "answers.npz")
+    first = SemanticAnswerCache(path, save_interval=3600)
+    second = SemanticAnswerCache(path, save_interval=3600)
+    first.store("frais", _vector(1, 0, 0), {'answer': "frais"}, "v1")
+    second.store("campus", _vector(0, 1, 0), {'answer': "campus"}, "v1")
+    first.store("commune", _vector(0, 0, 1), {'answer': "premier"}, "v1")
+    second.store("commune", _vector(0, 0, 1), {'answer': "second"}, "v1")
+
+    first.flush()
+    second.flush()
+
+    # second adopte aussi les entrées écrites par first
+    assert second.lookup(_vector(1, 0, 0), "v1")['answer'] == "frais"
+    reloaded = SemanticAnswerCache(path)
+    assert len(reloaded) == 3
+    assert reloaded.lookup(_vector(0, 1, 0), "v1")['answer'] == "campus"
+    assert reloaded.lookup(_vector(0, 0, 1), "v1") is not None
+
+
+def test_merge_applies_size_limit(tmp_path):
+    path = str(tmp_path / "answers.npz")
+    writer = SemanticAnswerCache(path, save_interval=3600)
+    for i in range(5):
+        writer.store(f"q{i}", _vector(1, i, 0), {}, "v1")
+    writer.flush()
+
+    small = SemanticAnswerCache(path, max_size=3, save_interval=3600)
+    small.store("nouvelle", _vector(0, 0, 1), {}, "v1")
+    small.flush()
+    assert len(SemanticAnswerCache(path)) == 3
+    assert SemanticAnswerCache(path).lookup(_vector(0, 0, 1), "v1") is not None
@@ -0,0 +1,114 @@
+"""BM25Index (classement lexical) et fusion RRF avec les résultats FAISS"""
+import math
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document as LCDocument
+
+from src.rag.generation.retriever_lang import Retriever
+from src.rag.vectorstore.bm25_index import STOPWORDS, BM25Index
+from src.rag.vectorstore.lexical_index import LexicalIndex
+
+TEXTS = [
+    "Les frais de scolarité du cycle ingénieur sont de 9 850 euros par an.",
+    "La scolarité en alternance est gratuite: les frais sont pris en charge par l'entreprise.",
+    "Le campus de la Défense accueille les étudiants du cycle préparatoire.",
+    "Frais frais frais: frais de dossier, frais d'inscription et frais de scolarité.",
+    "Les associations étudiantes organisent le gala et le week-end d'intégration.",
+]
+DOC_IDS = [f"doc-{i}" for i in range(len(TEXTS))]
+
+
+def _reference_scores(query_tokens, k1=1.5, b=0.75):
+    """BM25 calculé naïvement, document par document"""
+    batch = LexicalIndex.build(DOC_IDS, TEXTS)
+    documents = [
+        [batch.vocab[t] for t in batch.token_ids[batch.token_offsets[i]:batch.token_offsets[i + 1]]]
+        for i in range(len(TEXTS))
+    ]
+    avg_length = sum(map(len, documents)) / len(documents)
+    scores = []
+    for tokens in documents:
+        score = 0.0
+        for term in query_tokens:
+            df = sum(1 for other in documents if term in other)
+            tf = tokens.count(term)
+            if df and tf:
+                idf = math.log(1.0 + (len(documents) - df + 0.5) / (df + 0.5))
+                score += idf * tf * (k1 + 1.0) / (tf + k1 * (1.0 - b + b * len(tokens) / avg_length))
+        scores.append(score)
+    return scores
+
+
+@pytest.fixture(scope="module")
+def bm25():
+    return BM25Index(LexicalIndex.build(DOC_IDS, TEXTS))
+
+
+@pytest.mark.parametrize("query", ["frais de scolarité", "cycle ingénieur", "Gala étudiant ?", "campus"])
+def test_scores_match_reference(bm25, query):
+    query_tokens = [t for t in query.lower().replace("?", " ").split() if t not in STOPWORDS]
+    expected = _reference_scores(query_tokens)
+
+    results = bm25.search(query, top_k=len(TEXTS))
+
+    assert {doc_id: pytest.approx(expected[DOC_IDS.index(doc_id)]) for doc_id, _ in results} == dict(results)
+    assert len(results) == sum(1 for score in expected if score > 0)
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_term_frequency_ranks_first(bm25):
+    assert bm25.search("frais", top_k=1)[0][0] == "doc-3"
+
+
+def test_top_k(bm25):
+    assert len(bm25.search("frais scolarité", top_k=2)) == 2
+    assert bm25.search("frais", top_k=0) == []
+
+
+def test_stopwords_and_unknown_terms(bm25):
+    assert bm25.search("les de la", top_k=5) == []
+    assert bm25.search("inexistant", top_k=5) == []
+
+
+class _VectorStore:
+    """Base vectorielle minimale: similarité des chunks trouvés uniquement par BM25"""
+
+    def __init__(self, similarity_of):
+        self.similarity_of = similarity_of
+
+    def similarities(self, query_vector, documents):
+        return [self.similarity_of[doc.page_content] for doc in documents]
+
+
+def _doc(text, doc_id=None):
+    return LCDocument(page_content=text, id=doc_id)
+
+
+def test_reciprocal_rank_fusion():
+    retriever = Retriever(_VectorStore({}), hybrid=False, rrf_k=60)
+    a, b, c = _doc("a", "1"), _doc("b", "2"), _doc("c", "3")
+
+    fused = retriever._reciprocal_rank_fusion([[a, b, c], [c, _doc("b (copie)", "2")]])
+
+    # c: 1/63 + 1/61 > b: 1/62 + 1/62 > a: 1/61; la première occurrence d'un id est gardée
+    assert [doc.page_content for doc in fused] == ["c", "b", "a"]
+
+
+def test_fuse_keeps_similarity_of_each_chunk():
+    retriever = Retriever(_VectorStore({"bm25 seul": 0.2}), hybrid=False, top_k=10)
+    vector_results = [(_doc("vecteur", "1"), 0.9), (_doc("commun", "2"), 0.7)]
+    bm25_documents = [_doc("commun", "2"), _doc("bm25 seul", "3")]
+
+    fused = retriever._fuse(np.zeros(3), vector_results, bm25_documents)
+
+    assert [(doc.id, similarity) for doc, similarity in fused] == [("2", 0.7), ("1", 0.9), ("3", 0.2)]
+
+
+def test_fuse_without_docstore_ids():
+    """Chunks sans id: la clé de fusion et de similarité est le texte"""
+    retriever = Retriever(_VectorStore({"bm25 seul": 0.2}), hybrid=False, top_k=10)
+
+    fused = retriever._fuse(np.zeros(3), [(_doc("commun"), 0.7)], [_doc("commun"), _doc("bm25 seul")])
+
+    assert [(doc.page_content, similarity) for doc, similarity in fused] == [("commun", 0.7), ("bm25 seul", 0.2)]
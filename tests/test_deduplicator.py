@@ -0,0 +1,72 @@
+"""ChunkDeduplicator: doublons exacts et quasi-doublons (MinHash + LSH)"""
+import pytest
+
+from src.rag.document_processing.deduplicator import ChunkDeduplicator
+
+TEXT = (
+    "Les frais de scolarité du cycle ingénieur de l'ESILV s'élèvent à 9 850 euros par an. "
+    "Des bourses sur critères sociaux et des facilités de paiement en plusieurs fois sont "
+    "proposées aux étudiants, et l'alternance permet une prise en charge par l'entreprise "
+    "à partir de la quatrième année du cursus ingénieur."
+)
+NEAR = TEXT.replace("9 850", "9 950")
+OTHER = (
+    "Le campus de la Défense accueille les associations étudiantes, le bureau des sports "
+    "et les laboratoires de recherche en intelligence artificielle et en finance quantitative."
+)
+
+
+def test_exact_duplicate_ignores_case_and_spaces():
+    deduplicator = ChunkDeduplicator()
+    assert deduplicator.check("1", TEXT) == (None, None)
+    assert deduplicator.check("2", "  " + TEXT.upper().replace(" ", "   ")) == ("1", "exact")
+    assert deduplicator.dropped == {'exact': 1, 'near': 0}
+    assert len(deduplicator) == 1
+
+
+def test_near_duplicate():
+    deduplicator = ChunkDeduplicator(threshold=0.7)
+    deduplicator.add("1", TEXT)
+
+    assert deduplicator.find(NEAR) == ("1", "near")
+    assert deduplicator.find(OTHER) == (None, None)
+
+
+def test_threshold():
+    signature = ChunkDeduplicator().signature
+    similarity = (signature(TEXT) == signature(NEAR)).mean()
+
+    strict = ChunkDeduplicator(threshold=min(similarity + 0.05, 1.0))
+    strict.add("1", TEXT)
+    assert strict.find(NEAR) == (None, None)
+
+
+def test_signatures_are_stable():
+    """Même graine: mêmes signatures d'un processus (ou d'une exécution) à l'autre"""
+    assert (ChunkDeduplicator().signature(TEXT) == ChunkDeduplicator().signature(TEXT)).all()
+    assert not (ChunkDeduplicator(seed=2).signature(TEXT) == ChunkDeduplicator().signature(TEXT)).all()
+
+
+def test_exclude_and_remove():
+    deduplicator = ChunkDeduplicator(threshold=0.7)
+    deduplicator.add("1", TEXT)
+
+    assert deduplicator.find(TEXT, exclude={"1"}) == (None, None)
+    assert deduplicator.find(NEAR, exclude={"1"}) == (None, None)
+
+    deduplicator.remove("1")
+    assert len(deduplicator) == 0
+    assert deduplicator.check("2", TEXT) == (None, None)
+    assert deduplicator.check("3", NEAR) == ("2", "near")
+
+
+def test_short_text_has_a_signature():
+    deduplicator = ChunkDeduplicator()
+    deduplicator.add("1", "Frais")
+    assert deduplicator.find("frais") == ("1", "exact")
+    assert deduplicator.signature("").shape == (deduplicator.num_perm,)
+
+
+def test_bands_must_divide_num_perm():
+    with pytest.raises(ValueError):
+        ChunkDeduplicator(num_perm=100, bands=16)
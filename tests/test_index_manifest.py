@@ -0,0 +1,124 @@
+"""IndexManifest: détection des documents modifiés et réutilisation des chunks"""
+import json
+
+from langchain_core.documents import Document as LCDocument
+
+from src.rag.document_processing.pdf_loader_lang import PDFLoader
+from src.rag.document_processing.web_scrapper_loader import WebScraperLoader
+from src.rag.generation.index_manifest import IndexManifest, hash_chunk, hash_documents, hash_file
+from src.rag.generation.indexing_pipeline_lang import IndexingPipeline
+
+CONFIG = {'embedding_model': "modele", 'chunk_size': 500}
+
+
+def _chunk(text, doc_id):
+    return LCDocument(page_content=text, id=doc_id)
+
+
+def _page(url, content, scraped_at="2025-01-01"):
+    return {'url': url, 'title': "Titre", 'section': "", 'content': content, 'scraped_at': scraped_at}
+
+
+def _pipeline(tmp_path):
+    """Pipeline réduit aux chargeurs: le parcours des sources ne charge aucun modèle"""
+    pipeline = IndexingPipeline.__new__(IndexingPipeline)
+    pipeline.pdf_loader = PDFLoader(str(tmp_path / "pdf"), cache_dir=None)
+    pipeline.web_loader = WebScraperLoader(str(tmp_path / "web"))
+    (tmp_path / "pdf").mkdir()
+    (tmp_path / "web").mkdir()
+    return pipeline
+
+
+def _changed(pipeline, manifest):
+    current_keys = set()
+    changed = {key: document_hash for key, document_hash, _, _ in pipeline._iter_sources(manifest, current_keys)}
+    return changed, current_keys
+
+
+def test_document_hash_ignores_volatile_metadata():
+    page = LCDocument(page_content="Frais", metadata={'source': "u", 'scraped_at': "hier"})
+    rescraped = LCDocument(page_content="Frais", metadata={'source': "u", 'scraped_at': "aujourd'hui"})
+    edited = LCDocument(page_content="Frais modifiés", metadata={'source': "u", 'scraped_at': "hier"})
+
+    assert hash_documents([page]) == hash_documents([rescraped])
+    assert hash_documents([page]) != hash_documents([edited])
+
+
+def test_chunk_bookkeeping():
+    manifest = IndexManifest(CONFIG)
+    manifest.set_document(
+        "pdf:a.pdf", "h1",
+        [_chunk("intro", "1"), _chunk("frais", "2"), _chunk("intro", "3")],
+        duplicates=[_chunk("campus", "9")]
+    )
+    manifest.set_document("web:u", "h2", [_chunk("campus", "9")])
+
+    assert manifest.document_hash("pdf:a.pdf") == "h1"
+    assert manifest.document_hash("pdf:absent.pdf") is None
+    assert manifest.chunks_by_hash("pdf:a.pdf") == {hash_chunk("intro"): ["1", "3"], hash_chunk("frais"): ["2"]}
+    assert manifest.owned_ids("pdf:a.pdf") == ["1", "2", "3"]
+
+    # Le chunk 9 reste dans l'index tant que le PDF y fait référence (comme doublon)
+    manifest.remove_document("web:u")
+    assert manifest.live_ids() == {"1", "2", "3", "9"}
+    manifest.remove_document("pdf:a.pdf")
+    assert manifest.live_ids() == set()
+
+
+def test_save_and_load(tmp_path):
+    manifest = IndexManifest(CONFIG)
+    manifest.set_document("pdf:a.pdf", "h1", [_chunk("frais", "1")])
+    manifest.save(str(tmp_path))
+
+    loaded = IndexManifest.load(str(tmp_path))
+    assert loaded.config == CONFIG
+    assert loaded.documents == manifest.documents
+
+
+def test_load_rejects_other_format(tmp_path):
+    (tmp_path / "manifest.json").write_text(json.dumps({'format_version': 0, 'config': {}, 'documents': {}}))
+    assert IndexManifest.load(str(tmp_path)) is None
+    assert IndexManifest.load(str(tmp_path / "absent")) is None
+
+
+def test_only_new_or_modified_sources_are_processed(tmp_path):
+    pipeline = _pipeline(tmp_path)
+    pdf_path = tmp_path / "pdf" / "brochure.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 version 1")
+    web_file = tmp_path / "web" / "export.json"
+    web_file.write_text(json.dumps([_page("https://a", "Frais"), _page("https://b", "Campus")]))
+
+    # Premier passage: tout est nouveau
+    manifest = IndexManifest(CONFIG)
+    changed, current_keys = _changed(pipeline, manifest)
+    assert set(changed) == current_keys == {f"pdf:{pdf_path}", "web:https://a", "web:https://b"}
+    for key, document_hash in changed.items():
+        manifest.set_document(key, document_hash, [])
+    assert manifest.document_hash(f"pdf:{pdf_path}") == hash_file(str(pdf_path))
+
+    # Nouveau scraping identique (seule la date change): rien à refaire
+    web_file.write_text(json.dumps([
+        _page("https://a", "Frais", scraped_at="2025-02-01"), _page("https://b", "Campus", scraped_at="2025-02-01")
+    ]))
+    assert _changed(pipeline, manifest)[0] == {}
+
+    # Une page modifiée, une page supprimée, le PDF remplacé
+    web_file.write_text(json.dumps([_page("https://a", "Frais 2025")]))
+    pdf_path.write_bytes(b"%PDF-1.4 version 2")
+    changed, current_keys = _changed(pipeline, manifest)
+    assert set(changed) == {f"pdf:{pdf_path}", "web:https://a"}
+    assert "web:https://b" not in current_keys
+
+
+def test_most_recent_export_wins(tmp_path):
+    pipeline = _pipeline(tmp_path)
+    (tmp_path / "web" / "export_2025-01.json").write_text(json.dumps([_page("https://a", "Ancien")]))
+    (tmp_path / "web" / "export_2025-02.json").write_text(json.dumps([_page("https://a", "Récent")]))
+
+    changed, _ = _changed(pipeline, IndexManifest(CONFIG))
+
+    recent = LCDocument(page_content="Récent", metadata={
+        'source': "https://a", 'title': "Titre", 'section': "", 'scraped_at': "2025-01-01",
+        'word_count': 0, 'type': 'web_scraped'
+    })
+    assert changed == {"web:https://a": hash_documents([recent])}
@@ -0,0 +1,165 @@
+"""IndexVersions (publication, retour arrière, dérivation) et DrainLock"""
+import os
+import threading
+import time
+
+import pytest
+
+from src.rag.vectorstore.index_versions import DrainLock, IndexVersions
+
+
+def _build(versions, content):
+    version, path = versions.create()
+    with open(os.path.join(path, "index.faiss"), "w") as f:
+        f.write(content)
+    return version, path
+
+
+def _read(path, name="index.faiss"):
+    with open(os.path.join(path, name)) as f:
+        return f.read()
+
+
+def test_unpublished_root_layout(tmp_path):
+    versions = IndexVersions(str(tmp_path))
+    assert versions.current() is None
+    assert versions.current_path() == str(tmp_path)
+
+    _build(versions, "v1")
+    assert versions.current() is None
+
+
+def test_publish_and_rollback(tmp_path):
+    versions = IndexVersions(str(tmp_path))
+    first, _ = _build(versions, "premier")
+    versions.publish(first, {'chunks': 10})
+    second, _ = _build(versions, "second")
+    versions.publish(second, {'chunks': 12})
+
+    assert versions.current() == second
+    assert _read(versions.current_path()) == "second"
+    assert [(entry['version'], entry['chunks']) for entry in versions.list()] == [(first, 10), (second, 12)]
+
+    # Retour arrière: la version republiée devient la plus récente de l'historique
+    versions.publish(first, {'chunks': 10})
+    assert versions.current() == first
+    assert _read(versions.current_path()) == "premier"
+    assert [entry['version'] for entry in versions.list()] == [second, first]
+
+
+def test_publish_unknown_version(tmp_path):
+    versions = IndexVersions(str(tmp_path))
+    with pytest.raises(ValueError):
+        versions.publish("inconnue")
+    assert versions.current() is None
+
+
+def test_current_ignores_deleted_version(tmp_path):
+    versions = IndexVersions(str(tmp_path))
+    version, _ = _build(versions, "v1")
+    versions.publish(version)
+    versions.discard(version)
+    assert versions.current() == version
+
+    (tmp_path / "versions" / version / "index.faiss").unlink()
+    (tmp_path / "versions" / version).rmdir()
+    assert versions.current() is None
+    assert versions.current_path() == str(tmp_path)
+
+
+def test_derive_links_files_and_leaves_source_untouched(tmp_path):
+    versions = IndexVersions(str(tmp_path))
+    source, source_path = _build(versions, "vecteurs")
+    os.makedirs(os.path.join(source_path, "chunk_store"))
+    with open(os.path.join(source_path, "chunk_store", "texts.bin"), "w") as f:
+        f.write("textes")
+    with open(os.path.join(source_path, "lexical_index.npz"), "w") as f:
+        f.write("ancien")
+    versions.publish(source)
+
+    derived, derived_path = versions.derive(source_path, exclude=("lexical_index.npz",))
+    with open(os.path.join(derived_path, "lexical_index.npz"), "w") as f:
+        f.write("nouveau")
+
+    assert sorted(os.listdir(derived_path)) == ["chunk_store", "index.faiss", "lexical_index.npz"]
+    assert os.path.samefile(os.path.join(source_path, "index.faiss"), os.path.join(derived_path, "index.faiss"))
+    assert _read(derived_path, os.path.join("chunk_store", "texts.bin")) == "textes"
+    assert _read(source_path, "lexical_index.npz") == "ancien"
+    assert versions.current() == source
+
+
+def test_derive_from_root_layout(tmp_path):
+    """Ancienne disposition (index à la racine): ni versions/ ni les pointeurs ne sont copiés"""
+    (tmp_path / "index.faiss").write_text("racine")
+    (tmp_path / "index.faiss.tmp").write_text("écriture interrompue")
+    versions = IndexVersions(str(tmp_path))
+    previous, _ = _build(versions, "ancienne")
+    versions.publish(previous)
+
+    _, derived_path = versions.derive(str(tmp_path))
+    assert os.listdir(derived_path) == ["index.faiss"]
+    assert _read(derived_path) == "racine"
+
+
+def test_prune_keeps_recent_and_current_versions(tmp_path):
+    versions = IndexVersions(str(tmp_path))
+    published = []
+    for i in range(4):
+        version, _ = _build(versions, f"v{i}")
+        versions.publish(version)
+        published.append(version)
+    versions.publish(published[0])  # retour arrière sur la plus ancienne
+
+    removed = versions.prune(keep=2)
+
+    assert removed == [published[1], published[2]]
+    assert [entry['version'] for entry in versions.list()] == [published[3], published[0]]
+    assert not os.path.exists(versions.path(published[1]))
+    assert os.path.isdir(versions.path(published[0]))
+    assert versions.current() == published[0]
+
+
+def test_discard_never_removes_current_version(tmp_path):
+    versions = IndexVersions(str(tmp_path))
+    current, _ = _build(versions, "servie")
+    versions.publish(current)
+    abandoned, _ = _build(versions, "abandonnée")
+
+    versions.discard(abandoned)
+    versions.discard(current)
+
+    assert not os.path.exists(versions.path(abandoned))
+    assert os.path.isdir(versions.path(current))
+
+
+def test_drain_lock_waits_for_readers():
+    lock = DrainLock()
+    events = []
+    reading = threading.Event()
+    release = threading.Event()
+
+    def reader():
+        with lock.reading():
+            with lock.reading():  # réentrant
+                reading.set()
+                release.wait()
+                events.append("lecture terminée")
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    reading.wait()
+
+    def writer():
+        with lock.exclusive():
+            events.append("remplacement")
+
+    swap = threading.Thread(target=writer)
+    swap.start()
+    time.sleep(0.05)
+    assert events == [] and lock.active_readers == 1
+
+    release.set()
+    thread.join()
+    swap.join()
+    assert events == ["lecture terminée", "remplacement"]
+    assert lock.active_readers == 0
@@ -0,0 +1,57 @@
+"""LexicalIndex: tokens précalculés équivalents à une re-tokenisation du texte brut"""
+import numpy as np
+import pytest
+
+from src.rag.generation.reranker import BatchReranker, CandidateBatch
+from src.rag.vectorstore.lexical_index import LexicalIndex
+
+from tests.test_reranker import TEXTS, WEIGHTS
+
+DOC_IDS = [f"doc-{i}" for i in range(len(TEXTS))]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return LexicalIndex.build(DOC_IDS, TEXTS)
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    index.save(str(tmp_path))
+    loaded = LexicalIndex.load(str(tmp_path))
+
+    assert loaded.doc_ids == index.doc_ids
+    assert loaded.vocab == index.vocab
+    for name in ("token_ids", "token_offsets", "word_lengths", "word_offsets", "suffix_tokens", "suffix_starts"):
+        assert np.array_equal(getattr(loaded, name), getattr(index, name))
+
+
+def test_load_missing_index(tmp_path):
+    assert LexicalIndex.load(str(tmp_path)) is None
+
+
+def test_rows_for(index):
+    assert index.rows_for(["doc-3", "doc-0"]).tolist() == [3, 0]
+    assert index.rows_for(["doc-0", "inconnu"]) is None
+
+
+@pytest.mark.parametrize("term", ["frais", "scolarit", "a", "data", "xyz", "é"])
+def test_tokens_containing_matches_substring_search(index, term):
+    expected = [i for i, token in enumerate(index.vocab) if term in token]
+    assert index.tokens_containing(term).tolist() == expected
+
+
+def test_batch_scores_match_tokenized_texts(index):
+    rows = np.array([5, 1, 1, 3, 7, 2])
+    query_terms = ["frais", "scolarité", "alternance"]
+    vector_scores = np.linspace(0.9, 0.4, len(rows))
+    reranker = BatchReranker(WEIGHTS)
+
+    from_index = reranker.score(
+        query_terms, 7, index.batch(rows), vector_scores, index.term_matches(query_terms)
+    )
+    from_texts = reranker.score(
+        query_terms, 7, CandidateBatch.from_texts([TEXTS[r] for r in rows]), vector_scores
+    )
+
+    for name in ("lexical", "density", "length", "final"):
+        assert np.allclose(from_index[name], from_texts[name])
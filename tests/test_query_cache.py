@@ -0,0 +1,55 @@
+"""QueryEmbeddingCache: LRU borné, expiration et changement de namespace"""
+import numpy as np
+
+from src.rag.vectorstore.query_cache import QueryEmbeddingCache
+
+
+def test_lru_eviction():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("a", np.ones(3))
+    cache.put("b", np.ones(3))
+    cache.get("a")
+    cache.put("c", np.ones(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_cached_vectors_are_read_only():
+    cache = QueryEmbeddingCache()
+    source = np.ones(3)
+    cache.put("a", source)
+    source[0] = 5.0
+
+    vector = cache.get("a")
+    assert vector.tolist() == [1.0, 1.0, 1.0]
+    assert not vector.flags.writeable
+
+
+def test_ttl_expiration(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.rag.vectorstore.query_cache.time.monotonic", lambda: now[0])
+    cache = QueryEmbeddingCache(ttl_seconds=10)
+    cache.put("a", np.ones(3))
+
+    now[0] = 109.0
+    assert cache.get("a") is not None
+    now[0] = 111.0
+    assert cache.get("a") is None
+    assert cache.get_stats()['hits'] == 1 and cache.get_stats()['misses'] == 1
+
+
+def test_namespace_change_clears_cache():
+    cache = QueryEmbeddingCache()
+    cache.bind(("modele", "v1"))
+    cache.put("a", np.ones(3))
+    cache.bind(("modele", "v1"))
+    assert len(cache) == 1
+    cache.bind(("modele", "v2"))
+    assert len(cache) == 0
+
+
+def test_disabled_cache():
+    cache = QueryEmbeddingCache(max_size=0)
+    cache.put("a", np.ones(3))
+    assert cache.get("a") is None
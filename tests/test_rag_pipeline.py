@@ -0,0 +1,94 @@
+"""RAGPipeline: contexte numéroté et sources alignés, disposition du prompt"""
+import re
+from types import SimpleNamespace
+
+from src.rag.generation.rag_pipeline import RAGPipeline
+
+
+def _chunk(content, source, page=1, score=0.5, context=None):
+    metadata = {'source': source, 'page': page}
+    if context is not None:
+        metadata['context'] = context
+    return {
+        'content': content,
+        'metadata': metadata,
+        'scores': {'final': score, 'vector': score, 'lexical': 0.0}
+    }
+
+
+class _Retriever:
+    """Retriever minimal: chunks déjà rerankés, aucune base vectorielle"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.vector_store = SimpleNamespace(index_version="v1")
+
+    def retrieve_with_reranking(self, query, debug=False):
+        return [dict(chunk) for chunk in self.chunks]
+
+
+def _pipeline(chunks, **kwargs):
+    return RAGPipeline(_Retriever(chunks), llm=None, **kwargs)
+
+
+def _documents(prompt):
+    """(numéro, source) de chaque document du contexte, dans l'ordre"""
+    return [(int(n), source) for n, source in re.findall(r"--- DOCUMENT (\d+) ---\nSource: (\S+)", prompt)]
+
+
+def test_citation_numbers_match_sources_after_deduplication():
+    chunks = [
+        _chunk("frais 1", "a.pdf", score=0.9, context="Span frais"),
+        _chunk("frais 2", "b.pdf", score=0.8, context="Span frais"),
+        _chunk("campus", "c.pdf", score=0.7),
+        _chunk("  campus ", "d.pdf", score=0.6),
+        _chunk("bourses", "e.pdf", score=0.5),
+    ]
+    pipeline = _pipeline(chunks)
+
+    prepared = pipeline._prepare("Frais ?", return_sources=True, debug=False)
+    response = pipeline._finalize("Frais ?", "Réponse [3]", prepared, return_sources=True)
+
+    assert _documents(prepared['prompt']) == [(1, "a.pdf"), (2, "c.pdf"), (3, "e.pdf")]
+    assert [source['source'] for source in response['sources']] == ["a.pdf", "c.pdf", "e.pdf"]
+    assert response['num_chunks_used'] == 3
+
+
+def test_prefix_layout_builds_the_same_prompt_as_classic():
+    chunks = [_chunk("frais", "a.pdf", score=0.9), _chunk("campus", "b.pdf", score=0.4)]
+    prefix = _pipeline(chunks, prompt_layout="prefix")
+    classic = _pipeline(chunks, prompt_layout="classic")
+
+    prompt = prefix._prepare("Frais ?", return_sources=False, debug=False)['prompt']
+
+    assert prompt == classic._prepare("Frais ?", return_sources=False, debug=False)['prompt']
+    assert prompt.startswith(prefix.prompt_prefix)
+    assert prefix.prompt_prefix.endswith("CONTEXTE:\n")
+    assert classic.prompt_prefix == ""
+
+
+def test_no_static_prefix_when_query_comes_first():
+    pipeline = _pipeline([], system_prompt="Question: {query}\nContexte: {context}")
+    assert pipeline.prompt_prefix == ""
+
+
+def test_relevance_order_and_scores_kept_by_default():
+    chunks = [_chunk("frais", "b.pdf", score=0.9), _chunk("campus", "a.pdf", score=0.4)]
+
+    prompt = _pipeline(chunks)._prepare("Frais ?", return_sources=False, debug=False)['prompt']
+
+    assert _documents(prompt) == [(1, "b.pdf"), (2, "a.pdf")]
+    assert "Pertinence: 0.90" in prompt
+
+
+def test_stable_document_order():
+    chunks = [_chunk("frais", "b.pdf", score=0.9), _chunk("campus", "a.pdf", score=0.4)]
+    reordered = [_chunk("campus", "a.pdf", score=0.8), _chunk("frais", "b.pdf", score=0.3)]
+
+    first = _pipeline(chunks, stable_document_order=True)._prepare("Frais ?", False, False)
+    second = _pipeline(reordered, stable_document_order=True)._prepare("Campus ?", False, False)
+
+    assert _documents(first['prompt']) == [(1, "a.pdf"), (2, "b.pdf")]
+    assert "Pertinence" not in first['prompt']
+    # Même contexte quelle que soit la question: seul le texte de la question diffère
+    assert first['prompt'].replace("Frais ?", "Campus ?") == second['prompt']
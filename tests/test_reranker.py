@@ -0,0 +1,117 @@
+"""
+BatchReranker: mêmes scores que l'ancien scoring scalaire (une boucle Python par chunk),
+conservé ici comme référence.
+"""
+import re
+
+import numpy as np
+import pytest
+
+from src.rag.generation.reranker import BatchReranker, CandidateBatch
+
+WEIGHTS = {'vector': 0.4, 'lexical': 0.3, 'density': 0.15, 'length': 0.15}
+
+
+# --- Référence: formules scalaires historiques du Retriever ---
+
+def _normalize_text(text):
+    text = re.sub(r'[?!.,;:\'\"]+', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip().lower()
+
+
+def _lexical_score(query_terms, content):
+    content_words = content.lower().split()
+    matches = 0
+    for term in query_terms:
+        term_count = sum(1 for word in content_words if term in word)
+        matches += min(term_count, 3)
+    max_score = len(query_terms) * 3
+    return matches / max_score if max_score > 0 else 0
+
+
+def _density_score(query_terms, content):
+    content_words = _normalize_text(content).split()
+    term_positions = [i for i, word in enumerate(content_words) if any(term in word for term in query_terms)]
+    if len(term_positions) < 2:
+        return len(term_positions)
+    span = term_positions[-1] - term_positions[0] + 1
+    return min(len(term_positions) / span, 1.0)
+
+
+def _length_score(chunk_length, query_length):
+    ideal_min = max(40, query_length * 8)
+    ideal_max = max(100, query_length * 15)
+    if chunk_length < 15:
+        return 0.3
+    elif ideal_min <= chunk_length <= ideal_max:
+        return 1.0
+    elif chunk_length < ideal_min:
+        return 0.5 + (chunk_length / ideal_min) * 0.5
+    else:
+        excess = chunk_length - ideal_max
+        return max(0.5, 1.0 - (excess / ideal_max) * 0.5)
+
+
+def _reference_final(query_terms, query_length, content, vector_score):
+    final = (
+        vector_score * WEIGHTS['vector'] +
+        _lexical_score(query_terms, content) * WEIGHTS['lexical'] +
+        _density_score(query_terms, content) * WEIGHTS['density'] +
+        _length_score(len(content.split()), query_length) * WEIGHTS['length']
+    )
+    if query_terms and all(
+        any(kw in word for word in _normalize_text(content).split())
+        for kw in query_terms
+    ):
+        final *= 1.1
+    return final
+
+
+TEXTS = [
+    "Les frais de scolarité du cycle ingénieur s'élèvent à 9 850 € par an.",
+    "Frais, frais; FRAIS... et encore des frais: la scolarité (frais annuels) est payable en 3 fois.",
+    "L'ESILV propose des majeures en data science, fintech et ingénierie financière. " * 6,
+    "",
+    "scolarité",
+    "Contact: admissions@esilv.fr — tél. 01 41 16 70 00\n\nAdmissions post-bac sur Parcoursup.",
+    " ".join(["mot"] * 130) + " frais scolarité",
+    "«Apprentissage» : l'alternance est possible dès la 4e année, rythme 3 semaines / 3 semaines.",
+]
+
+QUERIES = [
+    (["frais", "scolarité"], 6),
+    (["alternance", "apprentissage", "rythme"], 12),
+    (["data"], 2),
+    ([], 3),
+    (["inexistant"], 25),
+]
+
+
+@pytest.mark.parametrize("query_terms, query_length", QUERIES)
+def test_scores_match_scalar_reference(query_terms, query_length):
+    reranker = BatchReranker(WEIGHTS)
+    batch = CandidateBatch.from_texts(TEXTS)
+    vector_scores = np.linspace(1.0, 0.3, len(TEXTS))
+
+    scores = reranker.score(query_terms, query_length, batch, vector_scores)
+
+    for i, text in enumerate(TEXTS):
+        assert scores['lexical'][i] == pytest.approx(_lexical_score(query_terms, text))
+        assert scores['density'][i] == pytest.approx(_density_score(query_terms, text))
+        assert scores['length'][i] == pytest.approx(_length_score(len(text.split()), query_length))
+        assert scores['final'][i] == pytest.approx(
+            _reference_final(query_terms, query_length, text, vector_scores[i])
+        )
+
+
+def test_word_counts_match_split():
+    batch = CandidateBatch.from_texts(TEXTS)
+    assert batch.word_counts.tolist() == [len(text.split()) for text in TEXTS]
+
+
+def test_empty_batch():
+    batch = CandidateBatch.from_texts([])
+    scores = BatchReranker(WEIGHTS).score(["frais"], 3, batch, np.zeros(0))
+    assert len(batch) == 0
+    assert scores['final'].shape == (0,)
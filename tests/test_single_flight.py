@@ -0,0 +1,136 @@
+"""SingleFlight: un seul calcul par clé pour les appels simultanés"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.rag.generation.single_flight import SingleFlight, normalize_text
+
+
+def test_normalize_text():
+    assert normalize_text("  Quels sont les FRAIS   de scolarité ?! ") == "quels sont les frais de scolarité"
+    assert normalize_text("ﬁnance  ESILV.") == normalize_text("Finance ESILV")
+
+
+def _concurrently(n, target):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'answer': "9 850 €", 'sources': []}
+
+    _concurrently(10, lambda: results.append(flight.run("frais", compute)))
+
+    assert len(calls) == 1
+    assert results == [{'answer': "9 850 €", 'sources': []}] * 10
+    # Chaque appelant reçoit sa propre copie
+    results[0]['sources'].append("modifié")
+    assert all(result['sources'] == [] for result in results[1:])
+    assert flight.get_stats() == {'leaders': 1, 'shared': 9, 'in_flight': 0, 'shared_rate': 0.9}
+
+
+def test_sequential_calls_are_not_shared():
+    flight = SingleFlight()
+    calls = []
+
+    for _ in range(3):
+        flight.run("frais", lambda: calls.append(1))
+
+    assert len(calls) == 3
+    assert flight.get_stats()['shared'] == 0
+
+
+def test_distinct_keys_run_separately():
+    flight = SingleFlight()
+    started = threading.Barrier(2, timeout=5)
+
+    def compute(key):
+        started.wait()  # les deux calculs sont en cours en même temps
+        return key
+
+    results = []
+    threads = [threading.Thread(target=lambda k=k: results.append(flight.run(k, compute, k))) for k in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == ["a", "b"]
+
+
+def test_leader_failure_is_not_shared():
+    flight = SingleFlight()
+    call, leader = flight.join("frais")
+    assert leader
+    results = []
+    follower = threading.Thread(target=lambda: results.append(flight.run("frais", lambda: "recalculé")))
+    follower.start()
+    time.sleep(0.05)
+
+    flight.finish("frais", call, failed=True)
+    follower.join()
+
+    assert results == ["recalculé"]
+    assert flight.get_stats()['shared'] == 0
+
+
+def test_leader_exception_propagates_and_releases_key():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("Ollama indisponible")
+
+    with pytest.raises(RuntimeError):
+        flight.run("frais", fail)
+    assert flight.get_stats()['in_flight'] == 0
+    assert flight.run("frais", lambda: "ok") == "ok"
+
+
+def test_async_callers_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'answer': "ok"}
+
+    async def main():
+        return await asyncio.gather(*(flight.arun("frais", compute) for _ in range(20)))
+
+    results = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert results == [{'answer': "ok"}] * 20
+
+
+def test_async_follower_of_thread_leader():
+    """Une coroutine (ASGI) peut attendre un calcul lancé par un thread (Flask)"""
+    flight = SingleFlight()
+    call, _ = flight.join("frais")
+
+    async def follower():
+        return await flight.arun("frais", asyncio.sleep, 0, "recalculé")
+
+    def leader():
+        time.sleep(0.05)
+        flight.finish("frais", call, {'answer': "partagé"})
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    result = asyncio.run(follower())
+    thread.join()
+
+    assert result == {'answer': "partagé"}
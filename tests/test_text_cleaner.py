@@ -0,0 +1,47 @@
+"""TextCleaner: résultat identique au nettoyage historique (_reference_clean)"""
+import pickle
+import random
+
+import pytest
+
+from src.rag.document_processing.text_cleaner import TextCleaner, _reference_clean, benchmark_text_cleaner
+
+CASES = [
+    "",
+    "Texte simple.",
+    "  espaces   multiples  \n\n\n\n et sauts de ligne\n\n\n",
+    "tab\tulations\t\t et  espaces",
+    " \t \t ",
+    "tirets – demi et — cadratin",
+    "contrôle\x00\x07\x0b\x0c\x1f\x7f\x85\x9f fin",
+    "espaces \x00 autour d'un caractère de contrôle",
+    "\n\n\x01\n\nsauts séparés par un contrôle",
+    "retours\r\n\r\n\r\n\r\nWindows",
+    " espace insécable  conservé",
+    "ligne\n \n \n \nblanche",
+]
+
+
+@pytest.mark.parametrize("text", CASES)
+def test_clean_matches_reference(text):
+    assert TextCleaner().clean(text) == _reference_clean(text)
+
+
+def test_random_texts_match_reference():
+    alphabet = ["a", "é", " ", "  ", "\n", "\n\n\n", "\t", "–", "—", "\x00", "\x0b", "\x85", "\r", " "]
+    generator = random.Random(0)
+    texts = ["".join(generator.choices(alphabet, k=generator.randint(0, 40))) for _ in range(2000)]
+
+    assert TextCleaner().clean_many(texts) == [_reference_clean(text) for text in texts]
+
+
+def test_benchmark_reports_no_mismatch():
+    report = benchmark_text_cleaner(CASES, repeat=1)
+    assert report['texts'] == len(CASES)
+    assert report['mismatches'] == 0
+
+
+def test_cleaner_can_be_pickled():
+    """Transmis tel quel aux processus de l'indexation parallèle"""
+    cleaner = pickle.loads(pickle.dumps(TextCleaner()))
+    assert cleaner.clean("a  b") == "a b"